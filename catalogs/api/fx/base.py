@@ -1,16 +1,24 @@
+from datetime import datetime
 from typing import List
 
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from ninja import Router
+from ninja import Router, Query
 from ninja_extra import paginate
 from ninja_extra.schemas import NinjaPaginationResponseSchema
 from pydantic_extra_types.currency_code import Currency
 
 from fx.models import ExchangeRatesManual
+from fx.services.history import get_rate_at, list_rates_as_of
+from fx.services.live import read_live_rates, force_refresh_live_rates, get_live_rates_status
+from fx.services.manual import upload_manual_rates, MANUAL_SHEET_CSV, MANUAL_SHEET_JSONL
+from fx.services.rates import bump_rates_version, get_conversion_table
 from catalogs.schemas import (
-    ManualFXOut, ManualFXInList, LiveFXOut, RefreshLiveFXIn, CacheStatusOut,
+    ManualFXOut, ManualFXInList, LiveFXOut, RefreshLiveFXIn, CacheStatusOut, ConversionMatrixOut, ManualFXUploadOut,
+    FXHistoryRateOut, FXRatesAsOfOut,
 )
+from pricing.schemas import FXMode
 
 router = Router(tags=['C4. FX'])
 
@@ -28,6 +36,8 @@ def list_manual_rates(request):
 def upsert_manual_rates(request, payload: ManualFXInList):
     """
     Upserts (update + insert) a batch of manual rates in one action.
+
+    Note: the in-process rate matrices of every worker are reloaded on their next conversion.
     """
     now = timezone.now()
 
@@ -43,10 +53,32 @@ def upsert_manual_rates(request, payload: ManualFXInList):
         update_fields=['rate', 'updated_at'],
         unique_fields=['base', 'quote']
     )
+    bump_rates_version(FXMode.MANUAL)
 
     return upsert_pairs
 
 
+@router.post('/manual-rates/upload', response=ManualFXUploadOut, openapi_extra={
+    'requestBody': {
+        'required': True,
+        'content': {
+            MANUAL_SHEET_CSV: {'schema': {'type': 'string'}},
+            MANUAL_SHEET_JSONL: {'schema': {'type': 'string'}},
+        },
+    },
+})
+def upload_manual_rate_sheet(request):
+    """
+    Upserts a full sheet of manual rates sent as the request body, either CSV (`text/csv`, with a base,quote,rate
+    header) or JSON lines (`application/x-ndjson`, one {"base", "quote", "rate"} object per line).
+
+    Note: the body is streamed into the database and merged in one statement, only the rates that changed get a new
+    `updated_at`. A pair given several times takes its last rate, and the sheet is rejected as a whole if any row is
+    invalid. Returns counts rather than the rates.
+    """
+    return upload_manual_rates(request, request.content_type)
+
+
 @router.get('/manual-rates/{base}/{quote}', response=ManualFXOut)
 def get_manual_rate(request, base: Currency, quote: Currency):
     """
@@ -56,20 +88,62 @@ def get_manual_rate(request, base: Currency, quote: Currency):
     return pair
 
 
-@router.get('/live-rates', response=List[LiveFXOut])
-def get_live_rates(request, base: Currency, quotes: List[Currency]):
+@router.get('/matrix', response=ConversionMatrixOut)
+def get_fx_matrix(request, fx_mode: FXMode = FXMode.MANUAL, currencies: List[Currency] = Query(None)):
     """
-    Returns specific cached live rates for a base currency and a set of quote currencies.
+    Returns the conversion rate of every pair of currencies (all the currencies used by ships unless `currencies` is
+    given), including the pairs that are not stored.
+
+    Note: a missing pair is converted with the inverse of the stored opposite pair, else triangulated through USD then
+    EUR (`route` tells which). Pairs that cannot be converted have no rate.
+    """
+    return get_conversion_table(fx_mode, currencies)
+
+
+@router.get('/history', response=FXRatesAsOfOut)
+def get_rates_as_of(request, at: datetime, fx_mode: FXMode = FXMode.MANUAL, currencies: List[Currency] = Query(None)):
+    """
+    Returns every stored rate as it was at a point in time (only the pairs of `currencies` if given).
+
+    Note: live rates are the ones of the current provider. Pairs that are not stored are not triangulated.
     """
+    return list_rates_as_of(at, fx_mode, currencies)
+
 
+@router.get('/history/{base}/{quote}', response=FXHistoryRateOut)
+def get_historical_rate(request, base: Currency, quote: Currency, at: datetime, fx_mode: FXMode = FXMode.MANUAL):
+    """
+    Returns the rate of a pair at a point in time, with the period during which it applied.
 
+    Note: falls back to the inverse of the opposite pair (`route` tells which).
+    """
+    rate = get_rate_at(base, quote, at, fx_mode)
+    if rate is None:
+        raise Http404(f'No rate for {base}/{quote} at {at.isoformat()}')
+
+    return rate
+
+
+@router.get('/live-rates', response=List[LiveFXOut])
+def get_live_rates(request, base: Currency, quotes: List[Currency] = Query(...)):
+    """
+    Returns specific cached live rates for a base currency and a set of quote currencies.
+
+    Note: quotes never fetched are fetched right away. Rates older than the refresh interval are returned as is while
+    they are refreshed in the background, `is_stale` flags rates past the staleness threshold.
+    """
+    return read_live_rates(base, quotes)
 
 
 @router.post('/live-rates/refresh', response=List[LiveFXOut])
 def refresh_live_rates(request, payload: RefreshLiveFXIn):
     """
     Returns force-refreshed live rates.
+
+    Note: every quote of the base is fetched in a single provider call. Concurrent refreshes of the same base share
+    that call.
     """
+    return force_refresh_live_rates(payload.base, payload.quotes)
 
 
 @router.get('/status', response=CacheStatusOut)
@@ -77,3 +151,4 @@ def get_fx_status(request):
     """
     Returns health/staleness info for the FX provider/cache.
     """
+    return get_live_rates_status()
@@ -1,7 +1,9 @@
+from django.http import Http404
 from ninja import Router
+from ninja_jwt.authentication import JWTAuth
 
-from selling.models import ReserveSetting
 from catalogs.schemas import ReserveSettingsIn, ReserveSettingsOut
+from selling.services.reserve import get_active_reserve_setting, set_reserve_setting
 
 router = Router(tags=['C5. Reserve Settings'])
 
@@ -10,19 +12,18 @@ def get_reserve_settings(request):
     """
     Returns the active global reservation ruleset configuration.
     """
-    settings = ReserveSetting.objects.order_by('-created_at').first()
+    settings = get_active_reserve_setting()
+    if settings is None:
+        raise Http404('No reserve settings were set')
     return settings
 
 
-@router.put('', response=ReserveSettingsOut)
+@router.put('', response=ReserveSettingsOut, auth=JWTAuth())
 def set_reserve_settings(request, payload: ReserveSettingsIn):
     """
     Sets a new active global reservation ruleset configuration.
-    """
-    settings = ReserveSetting.objects.order_by('-created_at').first()
-
-    for attr, value in payload.dict(exclude_unset=True).items():
-        setattr(settings, attr, value)
 
-    settings.save()
-    return settings
\ No newline at end of file
+    Note: staff only. The previous configurations are kept, omitted fields are carried over from the active one.
+    Every process picks up the new configuration on its next hold.
+    """
+    return set_reserve_setting(payload.dict(exclude_none=True), request.auth)
\ No newline at end of file
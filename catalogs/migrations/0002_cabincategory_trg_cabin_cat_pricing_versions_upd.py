@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-17 04:00
+
+import pgtrigger.compiler
+import pgtrigger.migrations
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogs', '0001_initial'),
+        ('pricing', '0006_pricingversion_and_more'),
+    ]
+
+    operations = [
+        pgtrigger.migrations.AddTrigger(
+            model_name='cabincategory',
+            trigger=pgtrigger.compiler.Trigger(name='trg_cabin_cat_pricing_versions_upd', sql=pgtrigger.compiler.UpsertTriggerSql(func="\n            BEGIN\n                INSERT INTO pricing_versions (key, stamp, updated_at)\n                SELECT changed_keys.key, gen_random_uuid(), NOW()\n                FROM (SELECT DISTINCT k.key FROM (SELECT 'ship:' || cb.ship_id AS key\n                FROM (SELECT * FROM new_values UNION ALL SELECT * FROM old_values) AS changed\n                JOIN cabins cb ON cb.category_id = changed.id) AS k) AS changed_keys\n                ORDER BY changed_keys.key\n                ON CONFLICT (key) DO UPDATE SET stamp = EXCLUDED.stamp, updated_at = EXCLUDED.updated_at;\n                RETURN NULL;\n            END;\n            ", hash='2d7a58b3490bf570de88157946d65226451f85d2', level='STATEMENT', operation='UPDATE', pgid='pgtrigger_trg_cabin_cat_pricing_versions_upd_d711f', referencing='REFERENCING OLD TABLE AS old_values  NEW TABLE AS new_values ', table='cabin_categories', when='AFTER')),
+        ),
+    ]
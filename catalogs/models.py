@@ -1,8 +1,10 @@
+import pgtrigger
 from django.db import models
 from django.contrib.postgres.functions import RandomUUID
 
 from common.functions import TxNow
-from common.triggers import set_updated_at_trg
+from common.triggers import set_updated_at_trg, transition_trgs
+from pricing.triggers import BUMP_CATEGORY_SHIP_VERSIONS_SQL
 
 class Amenity(models.Model):
     id = models.UUIDField(primary_key=True, db_default=RandomUUID())
@@ -41,6 +43,8 @@ class CabinCategory(models.Model):
         ]
         triggers = [
             set_updated_at_trg('trg_cabin_cat_updated'),
+            *transition_trgs('trg_cabin_cat_pricing_versions', BUMP_CATEGORY_SHIP_VERSIONS_SQL,
+                             operations=(pgtrigger.Update,)),
         ]
 
 class Setting(models.Model):
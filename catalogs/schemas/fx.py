@@ -1,7 +1,7 @@
 from enum import Enum
 from decimal import Decimal
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 
 from ninja import Schema, ModelSchema
 from pydantic_extra_types.currency_code import Currency
@@ -39,7 +39,7 @@ class QuoteOut(ModelSchema):
 
     class Meta:
         model = FXRatesCache
-        fields = ['rate', 'fetched_at']
+        fields = ['quote', 'rate', 'fetched_at']
 
 
 class LiveFXOut(ModelSchema):
@@ -51,13 +51,52 @@ class LiveFXOut(ModelSchema):
 
 
 class RefreshLiveFXIn(Schema):
-    base: str
-    quotes: List[str]
+    base: Currency
+    quotes: List[Currency]
 
 
 class CacheStatusOut(Schema):
     provider: str
-    last_refresh_at: datetime
+    last_refresh_at: Optional[datetime] = None
+    last_failure_at: Optional[datetime] = None
+    consecutive_failures: int
+    latency_ms: Optional[float] = None
+    breaker: str
     stale_after_hours: int
+    stale_fallback: str
     status: Status
 
+
+class ConversionRateOut(Schema):
+    base: str
+    quote: str
+    rate: Optional[Decimal] = None
+    route: Optional[str] = None
+
+
+class ConversionMatrixOut(Schema):
+    currencies: List[str]
+    rates: List[ConversionRateOut]
+
+
+class ManualFXUploadOut(Schema):
+    rows: int
+    pairs: int
+    inserted: int
+    updated: int
+    unchanged: int
+
+
+class FXHistoryRateOut(Schema):
+    base: str
+    quote: str
+    rate: Decimal
+    route: str
+    valid_from: datetime
+    valid_to: Optional[datetime] = None
+
+
+class FXRatesAsOfOut(Schema):
+    at: datetime
+    source: str
+    rates: List[FXHistoryRateOut]
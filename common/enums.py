@@ -51,4 +51,15 @@ class CustomCostAppliesTo(models.TextChoices):
 class CancellationChargeType(models.TextChoices):
     PERCENT_TOTAL = "percent_total", _("Percent Total")
     PERCENT_COS = "percent_cos", _("Percent COS")
-    FIXED_AMOUNT = "fixed_amount", _("Fixed Amount")
\ No newline at end of file
+    FIXED_AMOUNT = "fixed_amount", _("Fixed Amount")
+
+class EffectiveSource(models.TextChoices):
+    DEFAULT = "default", _("Default")
+    OVERRIDE = "override", _("Override")
+
+class JobStatus(models.TextChoices):
+    QUEUED = "queued", _("Queued")
+    RUNNING = "running", _("Running")
+    SUCCEEDED = "succeeded", _("Succeeded")
+    FAILED = "failed", _("Failed")
+    CANCELLED = "cancelled", _("Cancelled")
\ No newline at end of file
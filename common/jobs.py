@@ -0,0 +1,195 @@
+import logging
+import uuid
+from datetime import timedelta
+from typing import Optional, Dict, Any
+
+from django.db import transaction, IntegrityError
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from ninja_extra import status
+
+from common.enums import JobStatus
+from common.exceptions import APIBaseError
+from common.models import Job
+
+logger = logging.getLogger(__name__)
+
+# Job kinds and the dotted path of the function running them. A handler receives the claimed Job, reports progress
+# with report_progress() and returns a JSON serializable result.
+JOB_HANDLERS = {
+    'pricing.bulk': 'pricing.services.bulk.run_pricing_bulk_job',
+    'fx.refresh': 'fx.services.live.run_fx_refresh_job',
+}
+
+JOB_STALE_AFTER = 300  # 5 minutes without heartbeat, the worker running the job is considered lost
+
+
+class JobCancelled(Exception):
+    """
+    Raised by report_progress() when cancellation of the running job was requested, carrying the partial result of
+    the work done so far.
+    """
+
+    def __init__(self, result: Optional[Dict[str, Any]] = None):
+        super().__init__()
+        self.result = result
+
+
+def enqueue_job(kind: str, payload: Dict[str, Any], total: Optional[int] = None, user=None,
+                dedup_key: Optional[str] = None) -> Optional[Job]:
+    """
+    Queues a job to be picked up by a worker (see the run_jobs management command).
+
+    :param kind: The kind of job, one of JOB_HANDLERS
+    :param payload: JSON serializable input of the job
+    :param total: Optional number of work units, for progress reporting
+    :param user: The user queueing the job
+    :param dedup_key: Optional key, the job is not queued while a job with the same key is queued or running
+    :return: The queued job, or None if a job with the same dedup key is pending
+    """
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f'Unknown job kind: {kind}')
+
+    if dedup_key is None:
+        return Job.objects.create(kind=kind, payload=payload, progress_total=total, created_by=user)
+
+    if Job.objects.filter(dedup_key=dedup_key, status__in=[JobStatus.QUEUED, JobStatus.RUNNING]).exists():
+        return None
+    try:
+        # uidx_jobs_pending_dedup_key rejects a job queued concurrently with the same key
+        with transaction.atomic():
+            return Job.objects.create(kind=kind, payload=payload, progress_total=total, created_by=user,
+                                      dedup_key=dedup_key)
+    except IntegrityError:
+        return None
+
+
+def get_job(job_id: uuid.UUID, kind: Optional[str] = None) -> Job:
+    """
+    Gets a job, optionally restricted to a kind.
+
+    :param job_id: The job ID
+    :param kind: Optional kind the job must be of
+    :return: The job
+    """
+    jobs = Job.objects.all()
+    if kind is not None:
+        jobs = jobs.filter(kind=kind)
+
+    return get_object_or_404(jobs, id=job_id)
+
+
+def cancel_job(job_id: uuid.UUID, kind: Optional[str] = None) -> Job:
+    """
+    Cancels a job. A queued job is cancelled right away, a running job stops at its next progress report.
+
+    :param job_id: The job ID
+    :param kind: Optional kind the job must be of
+    :return: The job
+    """
+    job = get_job(job_id, kind)
+
+    # Conditional updates so a worker claiming or finishing the job concurrently is never overridden
+    cancelled = Job.objects.filter(id=job.id, status=JobStatus.QUEUED).update(
+        status=JobStatus.CANCELLED, cancel_requested=True, finished_at=timezone.now()
+    )
+    if not cancelled:
+        cancelled = Job.objects.filter(id=job.id, status=JobStatus.RUNNING).update(cancel_requested=True)
+
+    if not cancelled:
+        raise APIBaseError(
+            title='Job already finished',
+            detail=f'The job has already {job.status}',
+            status=status.HTTP_409_CONFLICT,
+        )
+
+    job.refresh_from_db()
+    return job
+
+
+def report_progress(job: Job, done: int, total: Optional[int] = None, result: Optional[Dict[str, Any]] = None):
+    """
+    Records the progress of a running job (also acting as the worker heartbeat).
+
+    :param job: The running job
+    :param done: The number of work units done
+    :param total: Optional updated number of work units
+    :param result: Optional result of the work done so far, stored as the job result if it is cancelled
+    :raises JobCancelled: If cancellation of the job was requested
+    """
+    job.progress_done = done
+    job.progress_total = total if total is not None else job.progress_total
+    job.heartbeat_at = timezone.now()
+    Job.objects.filter(id=job.id).update(progress_done=job.progress_done, progress_total=job.progress_total,
+                                         heartbeat_at=job.heartbeat_at)
+
+    if Job.objects.filter(id=job.id, cancel_requested=True).exists():
+        raise JobCancelled(result)
+
+
+def claim_job() -> Optional[Job]:
+    """
+    Claims the oldest queued job. Concurrent workers skip the rows locked by each other, so a job is only ever claimed
+    once.
+
+    :return: The claimed job (now running), or None if the queue is empty
+    """
+    with transaction.atomic():
+        job = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status=JobStatus.QUEUED)
+            .order_by('created_at')
+            .first()
+        )
+        if job is None:
+            return None
+
+        job.status = JobStatus.RUNNING
+        job.started_at = job.heartbeat_at = timezone.now()
+        job.save(update_fields=['status', 'started_at', 'heartbeat_at'])
+
+    return job
+
+
+def run_job(job: Job) -> Job:
+    """
+    Runs a claimed job with its handler and records the outcome, unless the job is no longer running (e.g. failed by
+    fail_stale_jobs meanwhile).
+
+    :param job: The claimed job
+    :return: The finished job
+    """
+    try:
+        handler = import_string(JOB_HANDLERS[job.kind])
+        job.result = handler(job)
+        job.status = JobStatus.SUCCEEDED
+    except JobCancelled as exc:
+        job.result = exc.result
+        job.status = JobStatus.CANCELLED
+    except Exception as exc:
+        logger.exception('Job %s (%s) failed', job.id, job.kind)
+        job.status = JobStatus.FAILED
+        job.error = getattr(exc, 'detail', None) or str(exc) or exc.__class__.__name__
+
+    job.finished_at = timezone.now()
+    finished = Job.objects.filter(id=job.id, status=JobStatus.RUNNING).update(
+        status=job.status, result=job.result, error=job.error, finished_at=job.finished_at
+    )
+    if not finished:
+        job.refresh_from_db()
+
+    return job
+
+
+def fail_stale_jobs(stale_after: int = JOB_STALE_AFTER) -> int:
+    """
+    Marks as failed the running jobs whose worker stopped reporting (e.g. the process was killed).
+
+    :param stale_after: Seconds without heartbeat after which a job is considered lost
+    :return: The number of jobs marked as failed
+    """
+    return Job.objects.filter(
+        status=JobStatus.RUNNING,
+        heartbeat_at__lt=timezone.now() - timedelta(seconds=stale_after),
+    ).update(status=JobStatus.FAILED, error='Worker lost', finished_at=timezone.now())
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from common.jobs import claim_job, run_job, fail_stale_jobs, JOB_STALE_AFTER
+
+
+class Command(BaseCommand):
+    help = ('Runs queued background jobs. Several workers can run side by side, each job is claimed by a single '
+            'worker (SELECT ... FOR UPDATE SKIP LOCKED).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--stale-after', type=int, default=JOB_STALE_AFTER,
+                            help='Seconds without heartbeat after which a running job is marked as failed')
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                stale = fail_stale_jobs(options['stale_after'])
+                if stale:
+                    self.stdout.write(self.style.WARNING(f'Marked {stale} stale job(s) as failed'))
+
+                job = claim_job()
+                if job is None:
+                    if options['once']:
+                        return
+                    time.sleep(options['interval'])
+                    continue
+
+                self.stdout.write(f'Running job {job.id} ({job.kind})')
+                job = run_job(job)
+                self.stdout.write(f'Job {job.id} {job.status}')
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping worker')
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.6 on 2026-10-17 03:45
+
+import common.fields
+import common.functions
+import django.contrib.postgres.functions
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0003_seed_data'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # -- Background jobs
+        migrations.RunSQL(
+            """
+            DO $$ BEGIN
+                CREATE TYPE job_status AS ENUM ('queued','running','succeeded','failed','cancelled');
+            EXCEPTION WHEN duplicate_object THEN NULL; END $$;
+            """,
+            reverse_sql="""
+            DROP TYPE IF EXISTS job_status;
+            """
+        ),
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.UUIDField(db_default=django.contrib.postgres.functions.RandomUUID(), primary_key=True, serialize=False)),
+                ('kind', models.TextField()),
+                ('status', common.fields.PostgresEnumField(choices=[('queued', 'Queued'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed'), ('cancelled', 'Cancelled')], db_default='queued', enum_type='job_status')),
+                ('payload', models.JSONField()),
+                ('result', models.JSONField(null=True)),
+                ('error', models.TextField(null=True)),
+                ('progress_done', models.IntegerField(db_default=0)),
+                ('progress_total', models.IntegerField(null=True)),
+                ('cancel_requested', models.BooleanField(db_default=False)),
+                ('created_at', models.DateTimeField(db_default=common.functions.TxNow())),
+                ('started_at', models.DateTimeField(null=True)),
+                ('finished_at', models.DateTimeField(null=True)),
+                ('heartbeat_at', models.DateTimeField(null=True)),
+                ('created_by', models.ForeignKey(db_column='created_by', db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'jobs',
+                'indexes': [models.Index(condition=models.Q(('status', 'queued')), fields=['created_at'], name='idx_jobs_queued')],
+            },
+        ),
+    ]
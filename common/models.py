@@ -0,0 +1,38 @@
+from django.db import models
+from django.contrib.postgres.functions import RandomUUID
+
+from common.enums import JobStatus
+from common.fields import PostgresEnumField
+from common.functions import TxNow
+
+class Job(models.Model):
+    id = models.UUIDField(primary_key=True, db_default=RandomUUID())
+    kind = models.TextField(null=False)  # -- e.g., 'pricing.bulk'
+    status = PostgresEnumField('job_status', db_default=JobStatus.QUEUED, choices=JobStatus.choices, null=False)
+    payload = models.JSONField(null=False)
+    result = models.JSONField(null=True)
+    error = models.TextField(null=True)
+    progress_done = models.IntegerField(db_default=0, null=False)
+    progress_total = models.IntegerField(null=True)
+    cancel_requested = models.BooleanField(db_default=False, null=False)
+    dedup_key = models.TextField(null=True)  # -- at most one queued or running job per key
+    created_at = models.DateTimeField(db_default=TxNow(), null=False)
+    started_at = models.DateTimeField(null=True)
+    finished_at = models.DateTimeField(null=True)
+    heartbeat_at = models.DateTimeField(null=True)
+
+    created_by = models.ForeignKey('myauth.User', on_delete=models.SET_NULL, null=True,
+                                   db_index=False, db_column='created_by')
+
+    class Meta:
+        db_table = 'jobs'
+        indexes = [
+            models.Index(fields=['created_at'], condition=models.Q(status=JobStatus.QUEUED), name='idx_jobs_queued'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dedup_key'],
+                condition=models.Q(status__in=[JobStatus.QUEUED, JobStatus.RUNNING]),
+                name='uidx_jobs_pending_dedup_key',
+            ),
+        ]
@@ -1,3 +1,6 @@
+import uuid
+from datetime import datetime
+from enum import Enum
 from typing import Optional, List, Dict, Any
 from ninja import Schema
 
@@ -9,3 +12,22 @@ class ErrorModel(Schema):
     instance: Optional[str] = None
     errors: Optional[List[Dict[str, Any]]] = None
 
+class JobStatus(str, Enum):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+
+class JobOut(Schema):
+    id: uuid.UUID
+    kind: str
+    status: JobStatus
+    progress_done: int
+    progress_total: Optional[int] = None
+    cancel_requested: bool
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
\ No newline at end of file
@@ -20,4 +20,52 @@ def set_updated_at_trg(trg_name, timestamp_func="NOW()"):
             END;
             """
         )
-    )
\ No newline at end of file
+    )
+
+# Transition table names exposed to statement-level triggers and the relation each operation can read changed rows from
+TRANSITION_CHANGED_ROWS = {
+    'INSERT': '(SELECT * FROM new_values)',
+    'UPDATE': '(SELECT * FROM new_values UNION ALL SELECT * FROM old_values)',
+    'DELETE': '(SELECT * FROM old_values)',
+}
+
+
+def transition_trgs(trg_name, sql, operations=(pgtrigger.Insert, pgtrigger.Update, pgtrigger.Delete)):
+    """
+    Definitions for statement-level triggers that run the given SQL once per statement (rather than once per row).
+
+    Postgres only allows transition tables on single-event triggers, hence one trigger is defined per operation. Every
+    row touched by the statement (old and new versions for updates) is available to the SQL through the `{changed}`
+    placeholder, which is substituted by a sub-query over the transition tables.
+
+    :param trg_name: The base name of the triggers, suffixed by the operation (e.g. "_ins").
+    :param sql: The PL/pgSQL statements to run, referencing `{changed}`.
+    :param operations: The operations to define triggers for. Default is insert, update and delete.
+    :return: List of trigger definitions.
+    """
+    triggers = []
+
+    for operation in operations:
+        referencing = pgtrigger.Referencing(
+            old='old_values' if operation != pgtrigger.Insert else None,
+            new='new_values' if operation != pgtrigger.Delete else None,
+        )
+        body = sql.replace('{changed}', TRANSITION_CHANGED_ROWS[str(operation)]).strip()
+
+        triggers.append(pgtrigger.Trigger(
+            name=f'{trg_name}_{str(operation)[:3].lower()}',
+            when=pgtrigger.After,
+            operation=operation,
+            level=pgtrigger.Statement,
+            referencing=referencing,
+            func=pgtrigger.Func(
+                f"""
+            BEGIN
+                {body}
+                RETURN NULL;
+            END;
+            """
+            )
+        ))
+
+    return triggers
@@ -185,6 +185,12 @@ NINJA_JWT = {
 REFRESH_COOKIE_KEY = 'cscas-refresh'
 REFRESH_IDLE_TIMEOUT = timedelta(days=7)
 
+# Live FX rates (see fx.services.live)
+FX_PROVIDER = 'fx.services.providers.FrankfurterProvider'
+FX_REFRESH_AFTER = timedelta(hours=1)  # cached live rates are refreshed in the background past this age
+FX_STALE_AFTER_HOURS = 24
+FX_STALE_FALLBACK = 'manual'  # pricing in live mode with stale rates: 'manual' rates or 'fail' (FXRatesStaleError)
+
 # Internationalization
 # https://docs.djangoproject.com/en/6.0/topics/i18n/
 
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-17 03:07
+
+import pgtrigger.compiler
+import pgtrigger.migrations
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fx', '0001_initial'),
+    ]
+
+    operations = [
+        pgtrigger.migrations.AddTrigger(
+            model_name='exchangeratesmanual',
+            trigger=pgtrigger.compiler.Trigger(name='trg_fx_manual_effective_prices_ins', sql=pgtrigger.compiler.UpsertTriggerSql(func='\n            BEGIN\n                PERFORM refresh_effective_prices(array_agg(ep.sailing_id), array_agg(ep.cabin_id))\n                FROM effective_prices ep\n                WHERE ep.has_custom_costs AND EXISTS (\n                    SELECT 1\n                    FROM cabin_cost_customs ccc\n                    JOIN (SELECT * FROM new_values) AS changed\n                      ON (changed.base = ccc.currency AND changed.quote = ep.currency)\n                      OR (changed.base = ep.currency AND changed.quote = ccc.currency)\n                    WHERE ccc.sailing_id = ep.sailing_id AND ccc.cabin_id = ep.cabin_id\n                );\n                RETURN NULL;\n            END;\n            ', hash='d8e707f2e035625fec909b919635bcd3d30d0319', level='STATEMENT', operation='INSERT', pgid='pgtrigger_trg_fx_manual_effective_prices_ins_1dcf7', referencing='REFERENCING NEW TABLE AS new_values ', table='exchange_rates_manual', when='AFTER')),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='exchangeratesmanual',
+            trigger=pgtrigger.compiler.Trigger(name='trg_fx_manual_effective_prices_upd', sql=pgtrigger.compiler.UpsertTriggerSql(func='\n            BEGIN\n                PERFORM refresh_effective_prices(array_agg(ep.sailing_id), array_agg(ep.cabin_id))\n                FROM effective_prices ep\n                WHERE ep.has_custom_costs AND EXISTS (\n                    SELECT 1\n                    FROM cabin_cost_customs ccc\n                    JOIN (SELECT * FROM new_values UNION ALL SELECT * FROM old_values) AS changed\n                      ON (changed.base = ccc.currency AND changed.quote = ep.currency)\n                      OR (changed.base = ep.currency AND changed.quote = ccc.currency)\n                    WHERE ccc.sailing_id = ep.sailing_id AND ccc.cabin_id = ep.cabin_id\n                );\n                RETURN NULL;\n            END;\n            ', hash='17b99056e068bbc5cc334f20b1cf6ff5fc329683', level='STATEMENT', operation='UPDATE', pgid='pgtrigger_trg_fx_manual_effective_prices_upd_1bf01', referencing='REFERENCING OLD TABLE AS old_values  NEW TABLE AS new_values ', table='exchange_rates_manual', when='AFTER')),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='exchangeratesmanual',
+            trigger=pgtrigger.compiler.Trigger(name='trg_fx_manual_effective_prices_del', sql=pgtrigger.compiler.UpsertTriggerSql(func='\n            BEGIN\n                PERFORM refresh_effective_prices(array_agg(ep.sailing_id), array_agg(ep.cabin_id))\n                FROM effective_prices ep\n                WHERE ep.has_custom_costs AND EXISTS (\n                    SELECT 1\n                    FROM cabin_cost_customs ccc\n                    JOIN (SELECT * FROM old_values) AS changed\n                      ON (changed.base = ccc.currency AND changed.quote = ep.currency)\n                      OR (changed.base = ep.currency AND changed.quote = ccc.currency)\n                    WHERE ccc.sailing_id = ep.sailing_id AND ccc.cabin_id = ep.cabin_id\n                );\n                RETURN NULL;\n            END;\n            ', hash='636d70d1ace445b08547045ed56a58caf8d372b9', level='STATEMENT', operation='DELETE', pgid='pgtrigger_trg_fx_manual_effective_prices_del_21c54', referencing='REFERENCING OLD TABLE AS old_values ', table='exchange_rates_manual', when='AFTER')),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.6 on 2026-10-17 04:00
+
+import pgtrigger.compiler
+import pgtrigger.migrations
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fx', '0002_exchangeratesmanual_trg_fx_manual_effective_prices_ins_and_more'),
+        ('pricing', '0006_pricingversion_and_more'),
+    ]
+
+    operations = [
+        pgtrigger.migrations.AddTrigger(
+            model_name='exchangeratesmanual',
+            trigger=pgtrigger.compiler.Trigger(name='trg_fx_manual_pricing_versions_ins', sql=pgtrigger.compiler.UpsertTriggerSql(func="\n            BEGIN\n                INSERT INTO pricing_versions (key, stamp, updated_at)\n                SELECT changed_keys.key, gen_random_uuid(), NOW()\n                FROM (SELECT DISTINCT k.key FROM (SELECT 'fx:manual' AS key FROM (SELECT * FROM new_values) AS changed) AS k) AS changed_keys\n                ORDER BY changed_keys.key\n                ON CONFLICT (key) DO UPDATE SET stamp = EXCLUDED.stamp, updated_at = EXCLUDED.updated_at;\n                RETURN NULL;\n            END;\n            ", hash='9d3792b69ff72aa5674b74b6fd23bd26d3127089', level='STATEMENT', operation='INSERT', pgid='pgtrigger_trg_fx_manual_pricing_versions_ins_35055', referencing='REFERENCING NEW TABLE AS new_values ', table='exchange_rates_manual', when='AFTER')),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='exchangeratesmanual',
+            trigger=pgtrigger.compiler.Trigger(name='trg_fx_manual_pricing_versions_upd', sql=pgtrigger.compiler.UpsertTriggerSql(func="\n            BEGIN\n                INSERT INTO pricing_versions (key, stamp, updated_at)\n                SELECT changed_keys.key, gen_random_uuid(), NOW()\n                FROM (SELECT DISTINCT k.key FROM (SELECT 'fx:manual' AS key FROM (SELECT * FROM new_values UNION ALL SELECT * FROM old_values) AS changed) AS k) AS changed_keys\n                ORDER BY changed_keys.key\n                ON CONFLICT (key) DO UPDATE SET stamp = EXCLUDED.stamp, updated_at = EXCLUDED.updated_at;\n                RETURN NULL;\n            END;\n            ", hash='d63bce9ea6685e74c6bf015e84e15c78c552d88c', level='STATEMENT', operation='UPDATE', pgid='pgtrigger_trg_fx_manual_pricing_versions_upd_06e02', referencing='REFERENCING OLD TABLE AS old_values  NEW TABLE AS new_values ', table='exchange_rates_manual', when='AFTER')),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='exchangeratesmanual',
+            trigger=pgtrigger.compiler.Trigger(name='trg_fx_manual_pricing_versions_del', sql=pgtrigger.compiler.UpsertTriggerSql(func="\n            BEGIN\n                INSERT INTO pricing_versions (key, stamp, updated_at)\n                SELECT changed_keys.key, gen_random_uuid(), NOW()\n                FROM (SELECT DISTINCT k.key FROM (SELECT 'fx:manual' AS key FROM (SELECT * FROM old_values) AS changed) AS k) AS changed_keys\n                ORDER BY changed_keys.key\n                ON CONFLICT (key) DO UPDATE SET stamp = EXCLUDED.stamp, updated_at = EXCLUDED.updated_at;\n                RETURN NULL;\n            END;\n            ", hash='7b3f7faf7189d06995200a8722345d9dd1c17c68', level='STATEMENT', operation='DELETE', pgid='pgtrigger_trg_fx_manual_pricing_versions_del_44b43', referencing='REFERENCING OLD TABLE AS old_values ', table='exchange_rates_manual', when='AFTER')),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='fxratescache',
+            trigger=pgtrigger.compiler.Trigger(name='trg_fx_rates_cache_pricing_versions_ins', sql=pgtrigger.compiler.UpsertTriggerSql(func="\n            BEGIN\n                INSERT INTO pricing_versions (key, stamp, updated_at)\n                SELECT changed_keys.key, gen_random_uuid(), NOW()\n                FROM (SELECT DISTINCT k.key FROM (SELECT 'fx:live' AS key FROM (SELECT * FROM new_values) AS changed) AS k) AS changed_keys\n                ORDER BY changed_keys.key\n                ON CONFLICT (key) DO UPDATE SET stamp = EXCLUDED.stamp, updated_at = EXCLUDED.updated_at;\n                RETURN NULL;\n            END;\n            ", hash='d281cbb06c411bfd5d560594e2b120ec07d4059e', level='STATEMENT', operation='INSERT', pgid='pgtrigger_trg_fx_rates_cache_pricing_versions_ins_9cde0', referencing='REFERENCING NEW TABLE AS new_values ', table='fx_rates_cache', when='AFTER')),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='fxratescache',
+            trigger=pgtrigger.compiler.Trigger(name='trg_fx_rates_cache_pricing_versions_upd', sql=pgtrigger.compiler.UpsertTriggerSql(func="\n            BEGIN\n                INSERT INTO pricing_versions (key, stamp, updated_at)\n                SELECT changed_keys.key, gen_random_uuid(), NOW()\n                FROM (SELECT DISTINCT k.key FROM (SELECT 'fx:live' AS key FROM (SELECT * FROM new_values UNION ALL SELECT * FROM old_values) AS changed) AS k) AS changed_keys\n                ORDER BY changed_keys.key\n                ON CONFLICT (key) DO UPDATE SET stamp = EXCLUDED.stamp, updated_at = EXCLUDED.updated_at;\n                RETURN NULL;\n            END;\n            ", hash='409916c3e963e569a8db84382b1b4fdd20cd758a', level='STATEMENT', operation='UPDATE', pgid='pgtrigger_trg_fx_rates_cache_pricing_versions_upd_18da2', referencing='REFERENCING OLD TABLE AS old_values  NEW TABLE AS new_values ', table='fx_rates_cache', when='AFTER')),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='fxratescache',
+            trigger=pgtrigger.compiler.Trigger(name='trg_fx_rates_cache_pricing_versions_del', sql=pgtrigger.compiler.UpsertTriggerSql(func="\n            BEGIN\n                INSERT INTO pricing_versions (key, stamp, updated_at)\n                SELECT changed_keys.key, gen_random_uuid(), NOW()\n                FROM (SELECT DISTINCT k.key FROM (SELECT 'fx:live' AS key FROM (SELECT * FROM old_values) AS changed) AS k) AS changed_keys\n                ORDER BY changed_keys.key\n                ON CONFLICT (key) DO UPDATE SET stamp = EXCLUDED.stamp, updated_at = EXCLUDED.updated_at;\n                RETURN NULL;\n            END;\n            ", hash='afa5ad05acfdae8726033e3dc4f586fee94c7763', level='STATEMENT', operation='DELETE', pgid='pgtrigger_trg_fx_rates_cache_pricing_versions_del_1b1d9', referencing='REFERENCING OLD TABLE AS old_values ', table='fx_rates_cache', when='AFTER')),
+        ),
+    ]
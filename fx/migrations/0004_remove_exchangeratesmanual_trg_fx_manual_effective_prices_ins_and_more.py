@@ -0,0 +1,40 @@
+# Generated by Django 5.2.6 on 2026-10-17 04:10
+
+import pgtrigger.compiler
+import pgtrigger.migrations
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fx', '0003_exchangeratesmanual_trg_fx_manual_pricing_versions_ins_and_more'),
+        ('pricing', '0007_manual_fx_rate'),
+    ]
+
+    operations = [
+        pgtrigger.migrations.RemoveTrigger(
+            model_name='exchangeratesmanual',
+            name='trg_fx_manual_effective_prices_ins',
+        ),
+        pgtrigger.migrations.RemoveTrigger(
+            model_name='exchangeratesmanual',
+            name='trg_fx_manual_effective_prices_upd',
+        ),
+        pgtrigger.migrations.RemoveTrigger(
+            model_name='exchangeratesmanual',
+            name='trg_fx_manual_effective_prices_del',
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='exchangeratesmanual',
+            trigger=pgtrigger.compiler.Trigger(name='trg_fx_manual_effective_prices_ins', sql=pgtrigger.compiler.UpsertTriggerSql(func='\n            BEGIN\n                PERFORM refresh_effective_prices(array_agg(ep.sailing_id), array_agg(ep.cabin_id))\n                FROM effective_prices ep\n                WHERE ep.has_custom_costs AND EXISTS (\n                    SELECT 1\n                    FROM cabin_cost_customs ccc\n                    JOIN (SELECT * FROM new_values) AS changed\n                      ON changed.base IN (ccc.currency, ep.currency) OR changed.quote IN (ccc.currency, ep.currency)\n                    WHERE ccc.sailing_id = ep.sailing_id AND ccc.cabin_id = ep.cabin_id\n                      AND ccc.currency <> ep.currency\n                );\n                RETURN NULL;\n            END;\n            ', hash='44ee7a855f95b98f2ba29cdb9de144b068f198d9', level='STATEMENT', operation='INSERT', pgid='pgtrigger_trg_fx_manual_effective_prices_ins_1dcf7', referencing='REFERENCING NEW TABLE AS new_values ', table='exchange_rates_manual', when='AFTER')),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='exchangeratesmanual',
+            trigger=pgtrigger.compiler.Trigger(name='trg_fx_manual_effective_prices_upd', sql=pgtrigger.compiler.UpsertTriggerSql(func='\n            BEGIN\n                PERFORM refresh_effective_prices(array_agg(ep.sailing_id), array_agg(ep.cabin_id))\n                FROM effective_prices ep\n                WHERE ep.has_custom_costs AND EXISTS (\n                    SELECT 1\n                    FROM cabin_cost_customs ccc\n                    JOIN (SELECT * FROM new_values UNION ALL SELECT * FROM old_values) AS changed\n                      ON changed.base IN (ccc.currency, ep.currency) OR changed.quote IN (ccc.currency, ep.currency)\n                    WHERE ccc.sailing_id = ep.sailing_id AND ccc.cabin_id = ep.cabin_id\n                      AND ccc.currency <> ep.currency\n                );\n                RETURN NULL;\n            END;\n            ', hash='bfe5f3a5defaebd67e4b536cd29c7b2d4a9b320f', level='STATEMENT', operation='UPDATE', pgid='pgtrigger_trg_fx_manual_effective_prices_upd_1bf01', referencing='REFERENCING OLD TABLE AS old_values  NEW TABLE AS new_values ', table='exchange_rates_manual', when='AFTER')),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='exchangeratesmanual',
+            trigger=pgtrigger.compiler.Trigger(name='trg_fx_manual_effective_prices_del', sql=pgtrigger.compiler.UpsertTriggerSql(func='\n            BEGIN\n                PERFORM refresh_effective_prices(array_agg(ep.sailing_id), array_agg(ep.cabin_id))\n                FROM effective_prices ep\n                WHERE ep.has_custom_costs AND EXISTS (\n                    SELECT 1\n                    FROM cabin_cost_customs ccc\n                    JOIN (SELECT * FROM old_values) AS changed\n                      ON changed.base IN (ccc.currency, ep.currency) OR changed.quote IN (ccc.currency, ep.currency)\n                    WHERE ccc.sailing_id = ep.sailing_id AND ccc.cabin_id = ep.cabin_id\n                      AND ccc.currency <> ep.currency\n                );\n                RETURN NULL;\n            END;\n            ', hash='e6ace4857e46bbf78498ed9eb4ebcb8abdf7ffff', level='STATEMENT', operation='DELETE', pgid='pgtrigger_trg_fx_manual_effective_prices_del_21c54', referencing='REFERENCING OLD TABLE AS old_values ', table='exchange_rates_manual', when='AFTER')),
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.2.6 on 2026-10-17 04:18
+
+import django.contrib.postgres.constraints
+import django.contrib.postgres.fields.ranges
+import django.contrib.postgres.functions
+import pgtrigger.compiler
+import pgtrigger.migrations
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0001_enable_extensions'),
+        ('fx', '0004_remove_exchangeratesmanual_trg_fx_manual_effective_prices_ins_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FXRateHistory',
+            fields=[
+                ('id', models.UUIDField(db_default=django.contrib.postgres.functions.RandomUUID(), primary_key=True, serialize=False)),
+                ('source', models.TextField()),
+                ('base', models.CharField(max_length=3)),
+                ('quote', models.CharField(max_length=3)),
+                ('rate', models.DecimalField(decimal_places=8, max_digits=18)),
+                ('valid_during', django.contrib.postgres.fields.ranges.DateTimeRangeField()),
+            ],
+            options={
+                'db_table': 'fx_rate_history',
+            },
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='exchangeratesmanual',
+            trigger=pgtrigger.compiler.Trigger(name='trg_fx_manual_rate_history_ins', sql=pgtrigger.compiler.UpsertTriggerSql(func="\n            BEGIN\n                UPDATE fx_rate_history h SET valid_during = tstzrange(lower(h.valid_during), NOW())\n                FROM (SELECT h.id\n                    FROM (SELECT DISTINCT 'manual' AS source, changed.base, changed.quote\n                          FROM (SELECT * FROM new_values) AS changed) AS pairs\n                    JOIN fx_rate_history h\n                      ON h.source = pairs.source AND h.base = pairs.base AND h.quote = pairs.quote\n                     AND h.valid_during @> NOW()\n                    LEFT JOIN exchange_rates_manual rates\n                      ON 'manual' = pairs.source AND rates.base = pairs.base AND rates.quote = pairs.quote\n                    WHERE rates.rate IS DISTINCT FROM h.rate) AS stale\n                WHERE h.id = stale.id AND lower(h.valid_during) < NOW();\n\n                DELETE FROM fx_rate_history h USING (SELECT h.id\n                    FROM (SELECT DISTINCT 'manual' AS source, changed.base, changed.quote\n                          FROM (SELECT * FROM new_values) AS changed) AS pairs\n                    JOIN fx_rate_history h\n                      ON h.source = pairs.source AND h.base = pairs.base AND h.quote = pairs.quote\n                     AND h.valid_during @> NOW()\n                    LEFT JOIN exchange_rates_manual rates\n                      ON 'manual' = pairs.source AND rates.base = pairs.base AND rates.quote = pairs.quote\n                    WHERE rates.rate IS DISTINCT FROM h.rate) AS stale WHERE h.id = stale.id;\n\n                INSERT INTO fx_rate_history (source, base, quote, rate, valid_during)\n                SELECT DISTINCT 'manual', rates.base, rates.quote, rates.rate, tstzrange(NOW(), NULL)\n                FROM (SELECT * FROM new_values) AS changed\n                JOIN exchange_rates_manual rates\n                  ON 'manual' = 'manual' AND rates.base = changed.base AND rates.quote = changed.quote\n                WHERE NOT EXISTS (\n                    SELECT 1\n                    FROM fx_rate_history h\n                    WHERE h.source = 'manual' AND h.base = rates.base AND h.quote = rates.quote\n                      AND h.valid_during @> NOW()\n                );\n                RETURN NULL;\n            END;\n            ", hash='35b2d6464cc546de01f2f09744893372c687dcc1', level='STATEMENT', operation='INSERT', pgid='pgtrigger_trg_fx_manual_rate_history_ins_3cf41', referencing='REFERENCING NEW TABLE AS new_values ', table='exchange_rates_manual', when='AFTER')),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='exchangeratesmanual',
+            trigger=pgtrigger.compiler.Trigger(name='trg_fx_manual_rate_history_upd', sql=pgtrigger.compiler.UpsertTriggerSql(func="\n            BEGIN\n                UPDATE fx_rate_history h SET valid_during = tstzrange(lower(h.valid_during), NOW())\n                FROM (SELECT h.id\n                    FROM (SELECT DISTINCT 'manual' AS source, changed.base, changed.quote\n                          FROM (SELECT * FROM new_values UNION ALL SELECT * FROM old_values) AS changed) AS pairs\n                    JOIN fx_rate_history h\n                      ON h.source = pairs.source AND h.base = pairs.base AND h.quote = pairs.quote\n                     AND h.valid_during @> NOW()\n                    LEFT JOIN exchange_rates_manual rates\n                      ON 'manual' = pairs.source AND rates.base = pairs.base AND rates.quote = pairs.quote\n                    WHERE rates.rate IS DISTINCT FROM h.rate) AS stale\n                WHERE h.id = stale.id AND lower(h.valid_during) < NOW();\n\n                DELETE FROM fx_rate_history h USING (SELECT h.id\n                    FROM (SELECT DISTINCT 'manual' AS source, changed.base, changed.quote\n                          FROM (SELECT * FROM new_values UNION ALL SELECT * FROM old_values) AS changed) AS pairs\n                    JOIN fx_rate_history h\n                      ON h.source = pairs.source AND h.base = pairs.base AND h.quote = pairs.quote\n                     AND h.valid_during @> NOW()\n                    LEFT JOIN exchange_rates_manual rates\n                      ON 'manual' = pairs.source AND rates.base = pairs.base AND rates.quote = pairs.quote\n                    WHERE rates.rate IS DISTINCT FROM h.rate) AS stale WHERE h.id = stale.id;\n\n                INSERT INTO fx_rate_history (source, base, quote, rate, valid_during)\n                SELECT DISTINCT 'manual', rates.base, rates.quote, rates.rate, tstzrange(NOW(), NULL)\n                FROM (SELECT * FROM new_values UNION ALL SELECT * FROM old_values) AS changed\n                JOIN exchange_rates_manual rates\n                  ON 'manual' = 'manual' AND rates.base = changed.base AND rates.quote = changed.quote\n                WHERE NOT EXISTS (\n                    SELECT 1\n                    FROM fx_rate_history h\n                    WHERE h.source = 'manual' AND h.base = rates.base AND h.quote = rates.quote\n                      AND h.valid_during @> NOW()\n                );\n                RETURN NULL;\n            END;\n            ", hash='0a3514e8881f060d26092ae59410b1031d04cf26', level='STATEMENT', operation='UPDATE', pgid='pgtrigger_trg_fx_manual_rate_history_upd_b8462', referencing='REFERENCING OLD TABLE AS old_values  NEW TABLE AS new_values ', table='exchange_rates_manual', when='AFTER')),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='exchangeratesmanual',
+            trigger=pgtrigger.compiler.Trigger(name='trg_fx_manual_rate_history_del', sql=pgtrigger.compiler.UpsertTriggerSql(func="\n            BEGIN\n                UPDATE fx_rate_history h SET valid_during = tstzrange(lower(h.valid_during), NOW())\n                FROM (SELECT h.id\n                    FROM (SELECT DISTINCT 'manual' AS source, changed.base, changed.quote\n                          FROM (SELECT * FROM old_values) AS changed) AS pairs\n                    JOIN fx_rate_history h\n                      ON h.source = pairs.source AND h.base = pairs.base AND h.quote = pairs.quote\n                     AND h.valid_during @> NOW()\n                    LEFT JOIN exchange_rates_manual rates\n                      ON 'manual' = pairs.source AND rates.base = pairs.base AND rates.quote = pairs.quote\n                    WHERE rates.rate IS DISTINCT FROM h.rate) AS stale\n                WHERE h.id = stale.id AND lower(h.valid_during) < NOW();\n\n                DELETE FROM fx_rate_history h USING (SELECT h.id\n                    FROM (SELECT DISTINCT 'manual' AS source, changed.base, changed.quote\n                          FROM (SELECT * FROM old_values) AS changed) AS pairs\n                    JOIN fx_rate_history h\n                      ON h.source = pairs.source AND h.base = pairs.base AND h.quote = pairs.quote\n                     AND h.valid_during @> NOW()\n                    LEFT JOIN exchange_rates_manual rates\n                      ON 'manual' = pairs.source AND rates.base = pairs.base AND rates.quote = pairs.quote\n                    WHERE rates.rate IS DISTINCT FROM h.rate) AS stale WHERE h.id = stale.id;\n\n                INSERT INTO fx_rate_history (source, base, quote, rate, valid_during)\n                SELECT DISTINCT 'manual', rates.base, rates.quote, rates.rate, tstzrange(NOW(), NULL)\n                FROM (SELECT * FROM old_values) AS changed\n                JOIN exchange_rates_manual rates\n                  ON 'manual' = 'manual' AND rates.base = changed.base AND rates.quote = changed.quote\n                WHERE NOT EXISTS (\n                    SELECT 1\n                    FROM fx_rate_history h\n                    WHERE h.source = 'manual' AND h.base = rates.base AND h.quote = rates.quote\n                      AND h.valid_during @> NOW()\n                );\n                RETURN NULL;\n            END;\n            ", hash='819ad449b7a0d19bcda9820a3b8f7165f2b727a2', level='STATEMENT', operation='DELETE', pgid='pgtrigger_trg_fx_manual_rate_history_del_9f51a', referencing='REFERENCING OLD TABLE AS old_values ', table='exchange_rates_manual', when='AFTER')),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='fxratescache',
+            trigger=pgtrigger.compiler.Trigger(name='trg_fx_rates_cache_rate_history_ins', sql=pgtrigger.compiler.UpsertTriggerSql(func='\n            BEGIN\n                UPDATE fx_rate_history h SET valid_during = tstzrange(lower(h.valid_during), NOW())\n                FROM (SELECT h.id\n                    FROM (SELECT DISTINCT changed.provider AS source, changed.base, changed.quote\n                          FROM (SELECT * FROM new_values) AS changed) AS pairs\n                    JOIN fx_rate_history h\n                      ON h.source = pairs.source AND h.base = pairs.base AND h.quote = pairs.quote\n                     AND h.valid_during @> NOW()\n                    LEFT JOIN fx_rates_cache rates\n                      ON rates.provider = pairs.source AND rates.base = pairs.base AND rates.quote = pairs.quote\n                    WHERE rates.rate IS DISTINCT FROM h.rate) AS stale\n                WHERE h.id = stale.id AND lower(h.valid_during) < NOW();\n\n                DELETE FROM fx_rate_history h USING (SELECT h.id\n                    FROM (SELECT DISTINCT changed.provider AS source, changed.base, changed.quote\n                          FROM (SELECT * FROM new_values) AS changed) AS pairs\n                    JOIN fx_rate_history h\n                      ON h.source = pairs.source AND h.base = pairs.base AND h.quote = pairs.quote\n                     AND h.valid_during @> NOW()\n                    LEFT JOIN fx_rates_cache rates\n                      ON rates.provider = pairs.source AND rates.base = pairs.base AND rates.quote = pairs.quote\n                    WHERE rates.rate IS DISTINCT FROM h.rate) AS stale WHERE h.id = stale.id;\n\n                INSERT INTO fx_rate_history (source, base, quote, rate, valid_during)\n                SELECT DISTINCT rates.provider, rates.base, rates.quote, rates.rate, tstzrange(NOW(), NULL)\n                FROM (SELECT * FROM new_values) AS changed\n                JOIN fx_rates_cache rates\n                  ON rates.provider = changed.provider AND rates.base = changed.base AND rates.quote = changed.quote\n                WHERE NOT EXISTS (\n                    SELECT 1\n                    FROM fx_rate_history h\n                    WHERE h.source = rates.provider AND h.base = rates.base AND h.quote = rates.quote\n                      AND h.valid_during @> NOW()\n                );\n                RETURN NULL;\n            END;\n            ', hash='ca3969d1087a6a6530b739717c05afc902875929', level='STATEMENT', operation='INSERT', pgid='pgtrigger_trg_fx_rates_cache_rate_history_ins_4c3ec', referencing='REFERENCING NEW TABLE AS new_values ', table='fx_rates_cache', when='AFTER')),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='fxratescache',
+            trigger=pgtrigger.compiler.Trigger(name='trg_fx_rates_cache_rate_history_upd', sql=pgtrigger.compiler.UpsertTriggerSql(func='\n            BEGIN\n                UPDATE fx_rate_history h SET valid_during = tstzrange(lower(h.valid_during), NOW())\n                FROM (SELECT h.id\n                    FROM (SELECT DISTINCT changed.provider AS source, changed.base, changed.quote\n                          FROM (SELECT * FROM new_values UNION ALL SELECT * FROM old_values) AS changed) AS pairs\n                    JOIN fx_rate_history h\n                      ON h.source = pairs.source AND h.base = pairs.base AND h.quote = pairs.quote\n                     AND h.valid_during @> NOW()\n                    LEFT JOIN fx_rates_cache rates\n                      ON rates.provider = pairs.source AND rates.base = pairs.base AND rates.quote = pairs.quote\n                    WHERE rates.rate IS DISTINCT FROM h.rate) AS stale\n                WHERE h.id = stale.id AND lower(h.valid_during) < NOW();\n\n                DELETE FROM fx_rate_history h USING (SELECT h.id\n                    FROM (SELECT DISTINCT changed.provider AS source, changed.base, changed.quote\n                          FROM (SELECT * FROM new_values UNION ALL SELECT * FROM old_values) AS changed) AS pairs\n                    JOIN fx_rate_history h\n                      ON h.source = pairs.source AND h.base = pairs.base AND h.quote = pairs.quote\n                     AND h.valid_during @> NOW()\n                    LEFT JOIN fx_rates_cache rates\n                      ON rates.provider = pairs.source AND rates.base = pairs.base AND rates.quote = pairs.quote\n                    WHERE rates.rate IS DISTINCT FROM h.rate) AS stale WHERE h.id = stale.id;\n\n                INSERT INTO fx_rate_history (source, base, quote, rate, valid_during)\n                SELECT DISTINCT rates.provider, rates.base, rates.quote, rates.rate, tstzrange(NOW(), NULL)\n                FROM (SELECT * FROM new_values UNION ALL SELECT * FROM old_values) AS changed\n                JOIN fx_rates_cache rates\n                  ON rates.provider = changed.provider AND rates.base = changed.base AND rates.quote = changed.quote\n                WHERE NOT EXISTS (\n                    SELECT 1\n                    FROM fx_rate_history h\n                    WHERE h.source = rates.provider AND h.base = rates.base AND h.quote = rates.quote\n                      AND h.valid_during @> NOW()\n                );\n                RETURN NULL;\n            END;\n            ', hash='6279ea0e2962ce0c200609c95219b57f51b0fae5', level='STATEMENT', operation='UPDATE', pgid='pgtrigger_trg_fx_rates_cache_rate_history_upd_7140f', referencing='REFERENCING OLD TABLE AS old_values  NEW TABLE AS new_values ', table='fx_rates_cache', when='AFTER')),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='fxratescache',
+            trigger=pgtrigger.compiler.Trigger(name='trg_fx_rates_cache_rate_history_del', sql=pgtrigger.compiler.UpsertTriggerSql(func='\n            BEGIN\n                UPDATE fx_rate_history h SET valid_during = tstzrange(lower(h.valid_during), NOW())\n                FROM (SELECT h.id\n                    FROM (SELECT DISTINCT changed.provider AS source, changed.base, changed.quote\n                          FROM (SELECT * FROM old_values) AS changed) AS pairs\n                    JOIN fx_rate_history h\n                      ON h.source = pairs.source AND h.base = pairs.base AND h.quote = pairs.quote\n                     AND h.valid_during @> NOW()\n                    LEFT JOIN fx_rates_cache rates\n                      ON rates.provider = pairs.source AND rates.base = pairs.base AND rates.quote = pairs.quote\n                    WHERE rates.rate IS DISTINCT FROM h.rate) AS stale\n                WHERE h.id = stale.id AND lower(h.valid_during) < NOW();\n\n                DELETE FROM fx_rate_history h USING (SELECT h.id\n                    FROM (SELECT DISTINCT changed.provider AS source, changed.base, changed.quote\n                          FROM (SELECT * FROM old_values) AS changed) AS pairs\n                    JOIN fx_rate_history h\n                      ON h.source = pairs.source AND h.base = pairs.base AND h.quote = pairs.quote\n                     AND h.valid_during @> NOW()\n                    LEFT JOIN fx_rates_cache rates\n                      ON rates.provider = pairs.source AND rates.base = pairs.base AND rates.quote = pairs.quote\n                    WHERE rates.rate IS DISTINCT FROM h.rate) AS stale WHERE h.id = stale.id;\n\n                INSERT INTO fx_rate_history (source, base, quote, rate, valid_during)\n                SELECT DISTINCT rates.provider, rates.base, rates.quote, rates.rate, tstzrange(NOW(), NULL)\n                FROM (SELECT * FROM old_values) AS changed\n                JOIN fx_rates_cache rates\n                  ON rates.provider = changed.provider AND rates.base = changed.base AND rates.quote = changed.quote\n                WHERE NOT EXISTS (\n                    SELECT 1\n                    FROM fx_rate_history h\n                    WHERE h.source = rates.provider AND h.base = rates.base AND h.quote = rates.quote\n                      AND h.valid_during @> NOW()\n                );\n                RETURN NULL;\n            END;\n            ', hash='9c94219f7409ef44f4306af79421994a4f45721f', level='STATEMENT', operation='DELETE', pgid='pgtrigger_trg_fx_rates_cache_rate_history_del_3a745', referencing='REFERENCING OLD TABLE AS old_values ', table='fx_rates_cache', when='AFTER')),
+        ),
+        migrations.AddConstraint(
+            model_name='fxratehistory',
+            constraint=models.CheckConstraint(condition=models.Q(('rate__gt', models.Value(0))), name='fx_rate_history_rate_check'),
+        ),
+        migrations.AddConstraint(
+            model_name='fxratehistory',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(expressions=[('source', '='), ('base', '='), ('quote', '='), ('valid_during', '&&')], name='fx_rate_history_no_overlap'),
+        ),
+        migrations.RunSQL(     # -- the current rates open the history of their pair
+            """
+            INSERT INTO fx_rate_history (source, base, quote, rate, valid_during)
+            SELECT 'manual', base, quote, rate, tstzrange(updated_at, NULL) FROM exchange_rates_manual
+            UNION ALL
+            SELECT provider, base, quote, rate, tstzrange(fetched_at, NULL) FROM fx_rates_cache;
+            """,
+            reverse_sql=migrations.RunSQL.noop
+        ),
+    ]
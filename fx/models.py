@@ -1,7 +1,14 @@
 from django.db import models
 from django.contrib.postgres.functions import RandomUUID
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import DateTimeRangeField, RangeOperators
 
 from common.functions import TxNow
+from common.triggers import transition_trgs
+from fx.triggers import rate_history_trgs
+from pricing.triggers import REFRESH_FX_RATES_SQL, BUMP_FX_MANUAL_VERSIONS_SQL, BUMP_FX_LIVE_VERSIONS_SQL
+
+MANUAL_RATES_SOURCE = 'manual'  # history source of the manual rates, live rates being recorded under their provider
 
 class ExchangeRatesManual(models.Model):
     id = models.UUIDField(primary_key=True, db_default=RandomUUID())
@@ -30,6 +37,11 @@ class ExchangeRatesManual(models.Model):
                 name='exchange_rates_manual_base_quote_key'
             )
         ]
+        triggers = [
+            *transition_trgs('trg_fx_manual_effective_prices', REFRESH_FX_RATES_SQL),
+            *transition_trgs('trg_fx_manual_pricing_versions', BUMP_FX_MANUAL_VERSIONS_SQL),
+            *rate_history_trgs('trg_fx_manual_rate_history', 'exchange_rates_manual', f"'{MANUAL_RATES_SOURCE}'"),
+        ]
 
 class FXRatesCache(models.Model):
     id = models.UUIDField(primary_key=True, db_default=RandomUUID())
@@ -59,3 +71,39 @@ class FXRatesCache(models.Model):
                 name='fx_rates_cache_provider_base_quote_key'
             )
         ]
+        triggers = [
+            *transition_trgs('trg_fx_rates_cache_pricing_versions', BUMP_FX_LIVE_VERSIONS_SQL),
+            *rate_history_trgs('trg_fx_rates_cache_rate_history', 'fx_rates_cache', '{row}.provider'),
+        ]
+
+class FXRateHistory(models.Model):
+    """
+    Append-only history of the manual and live rates, maintained by triggers on the rates tables (see fx.triggers).
+    Each row is a period during which a pair had a rate, the open period (no upper bound) being the current rate.
+    """
+    id = models.UUIDField(primary_key=True, db_default=RandomUUID())
+    source = models.TextField(null=False)
+    base = models.CharField(max_length=3, null=False)
+    quote = models.CharField(max_length=3, null=False)
+    rate = models.DecimalField(max_digits=18, decimal_places=8, null=False)
+    valid_during = DateTimeRangeField(null=False)
+
+    class Meta:
+        db_table = 'fx_rate_history'
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(rate__gt=models.Value(0)),
+                name='fx_rate_history_rate_check'
+            ),
+            # Also the index of the point-in-time lookups: "rate of a pair at T" is a single probe
+            ExclusionConstraint(
+                index_type='GIST',
+                expressions=[
+                    ('source', RangeOperators.EQUAL),
+                    ('base', RangeOperators.EQUAL),
+                    ('quote', RangeOperators.EQUAL),
+                    ('valid_during', RangeOperators.OVERLAPS),
+                ],
+                name='fx_rate_history_no_overlap'
+            )
+        ]
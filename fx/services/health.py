@@ -0,0 +1,158 @@
+import time
+from datetime import timedelta
+from typing import Dict, Tuple, Any
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max
+from django.utils import timezone
+
+from fx.models import FXRatesCache
+
+# Health of the live rates provider, kept in process so pricing requests and /fx/status read it without any I/O. The
+# process calling the provider records the outcome in the shared state (FX_HEALTH_KEY), the other processes re-read
+# it at most every FX_HEALTH_SYNC seconds. The consecutive failures are counted in their own key, incremented and
+# reset atomically so concurrent calls never lose a failure.
+FX_HEALTH_KEY = 'fx:health:{provider}'
+FX_FAILURES_KEY = 'fx:failures:{provider}'
+FX_HEALTH_SYNC = 5  # seconds
+FX_LATENCY_ALPHA = 0.2  # weight of the last call in the provider latency moving average
+
+# Circuit breaker of the provider calls: after FX_BREAKER_THRESHOLD consecutive failures the provider is not called
+# for FX_BREAKER_COOLDOWN seconds, then a single call is let through (half open) and closes the breaker if it succeeds.
+FX_BREAKER_THRESHOLD = 3
+FX_BREAKER_COOLDOWN = 60  # seconds
+FX_BREAKER_PROBE_KEY = 'fx:breaker-probe:{provider}'  # set by the call let through a half open breaker
+BREAKER_CLOSED = 'closed'
+BREAKER_OPEN = 'open'
+BREAKER_HALF_OPEN = 'half_open'
+
+# provider -> (synced_at, health)
+_health: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+
+
+def _initial_health(provider: str) -> Dict[str, Any]:
+    """
+    Health of a provider never recorded (e.g. after the cache was flushed), its last success being the last fetch.
+    """
+    fetched = FXRatesCache.objects.filter(provider=provider).aggregate(last=Max('fetched_at'))['last']
+
+    return {
+        'last_success_at': fetched,
+        'last_failure_at': None,
+        'latency_ms': None,
+    }
+
+
+def _count_failure(provider: str) -> int:
+    """
+    Increments the consecutive failures of a provider, returning the new count.
+    """
+    key = FX_FAILURES_KEY.format(provider=provider)
+    if cache.add(key, 1, None):
+        return 1
+
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Reset by a successful call meanwhile
+        cache.add(key, 1, None)
+        return 1
+
+
+def get_health(provider: str) -> Dict[str, Any]:
+    """
+    Gets the health of a provider from the in-process state, re-synced from the shared state every FX_HEALTH_SYNC
+    seconds.
+
+    :param provider: The provider name
+    :return: dict of last_success_at, last_failure_at, failures (consecutive) and latency_ms (moving average)
+    """
+    synced = _health.get(provider)
+    if synced is not None and time.monotonic() - synced[0] < FX_HEALTH_SYNC:
+        return synced[1]
+
+    key = FX_HEALTH_KEY.format(provider=provider)
+    failures_key = FX_FAILURES_KEY.format(provider=provider)
+    shared = cache.get_many([key, failures_key])
+    health = shared.get(key)
+    if health is None:
+        cache.add(key, _initial_health(provider), None)
+        health = cache.get(key)
+
+    health = {**health, 'failures': shared.get(failures_key) or 0}
+    _health[provider] = (time.monotonic(), health)
+    return health
+
+
+def record_provider_call(provider: str, elapsed: float, succeeded: bool) -> Dict[str, Any]:
+    """
+    Records the outcome of a provider call in the shared and in-process health.
+
+    :param provider: The provider name
+    :param elapsed: The call duration in seconds
+    :param succeeded: Whether the call returned rates
+    :return: The updated health
+    """
+    health = dict(cache.get(FX_HEALTH_KEY.format(provider=provider)) or _initial_health(provider))
+    now = timezone.now()
+
+    latency = elapsed * 1000
+    if health['latency_ms'] is not None:
+        latency = FX_LATENCY_ALPHA * latency + (1 - FX_LATENCY_ALPHA) * health['latency_ms']
+    health['latency_ms'] = latency
+
+    if succeeded:
+        cache.delete(FX_FAILURES_KEY.format(provider=provider))
+        health.update(last_success_at=now)
+        failures = 0
+    else:
+        health.update(last_failure_at=now)
+        failures = _count_failure(provider)
+
+    health.pop('failures', None)
+    cache.set(FX_HEALTH_KEY.format(provider=provider), health, None)
+    health['failures'] = failures
+    _health[provider] = (time.monotonic(), health)
+
+    return health
+
+
+def get_breaker_state(health: Dict[str, Any]) -> str:
+    """
+    Gets the state of the provider circuit breaker.
+
+    :param health: The provider health (see get_health)
+    :return: BREAKER_CLOSED, BREAKER_OPEN or BREAKER_HALF_OPEN
+    """
+    if health['failures'] < FX_BREAKER_THRESHOLD:
+        return BREAKER_CLOSED
+    if timezone.now() - health['last_failure_at'] < timedelta(seconds=FX_BREAKER_COOLDOWN):
+        return BREAKER_OPEN
+    return BREAKER_HALF_OPEN
+
+
+def allow_provider_call(provider: str) -> bool:
+    """
+    Whether the circuit breaker lets a provider call through: always when closed, never when open, once per cooldown
+    across processes when half open.
+
+    :param provider: The provider name
+    """
+    state = get_breaker_state(get_health(provider))
+    if state == BREAKER_HALF_OPEN:
+        return cache.add(FX_BREAKER_PROBE_KEY.format(provider=provider), 1, FX_BREAKER_COOLDOWN)
+
+    return state == BREAKER_CLOSED
+
+
+def rates_are_stale(health: Dict[str, Any]) -> bool:
+    """
+    Whether the last successful refresh of a provider is older than settings.FX_STALE_AFTER_HOURS (or never
+    happened).
+
+    :param health: The provider health (see get_health)
+    """
+    last = health['last_success_at']
+    return last is None or timezone.now() - last > timedelta(hours=settings.FX_STALE_AFTER_HOURS)
+
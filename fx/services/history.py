@@ -0,0 +1,89 @@
+from datetime import datetime
+from typing import Optional, List, Dict, Any
+
+from django.db.models import Q
+
+from fx.models import FXRateHistory, MANUAL_RATES_SOURCE
+from fx.services.live import get_provider
+from fx.services.rates import Rates, ROUTE_DIRECT, ROUTE_INVERSE
+from pricing.schemas import FXMode
+
+
+def get_history_source(fx_mode: FXMode) -> str:
+    """
+    Gets the history source of the rates of a mode: the manual rates, or the live rates of the current provider.
+
+    :param fx_mode: Manual or live rates
+    :return: The source
+    """
+    return MANUAL_RATES_SOURCE if FXMode(fx_mode) == FXMode.MANUAL else get_provider().name
+
+
+def _history_rate_out(row: FXRateHistory, base: str, quote: str) -> Dict[str, Any]:
+    inverted = row.base != base
+
+    return {
+        'base': base,
+        'quote': quote,
+        'rate': 1 / row.rate if inverted else row.rate,
+        'route': ROUTE_INVERSE if inverted else ROUTE_DIRECT,
+        'valid_from': row.valid_during.lower,
+        'valid_to': row.valid_during.upper,
+    }
+
+
+def get_rate_at(base: str, quote: str, at: datetime, fx_mode: FXMode) -> Optional[Dict[str, Any]]:
+    """
+    Gets the rate a pair had at a point in time, falling back to the inverse of the (quote, base) pair like fx_rate.
+    Both pairs are looked up with a single probe of the history index.
+
+    :param base: The currency being converted from
+    :param quote: The currency being converted to
+    :param at: The point in time
+    :param fx_mode: Manual or live rates
+    :return: dict matching FXHistoryRateOut, or None if neither the pair nor its inverse had a rate
+    """
+    rows = {
+        (row.base, row.quote): row
+        for row in FXRateHistory.objects.filter(Q(base=base, quote=quote) | Q(base=quote, quote=base),
+                                                source=get_history_source(fx_mode), valid_during__contains=at)
+    }
+
+    row = rows.get((base, quote)) or rows.get((quote, base))
+    return _history_rate_out(row, base, quote) if row is not None else None
+
+
+def get_rates_as_of(at: datetime, fx_mode: FXMode) -> Rates:
+    """
+    Gets every rate of a mode as it was at a point in time, in a single query.
+
+    :param at: The point in time
+    :param fx_mode: Manual or live rates
+    :return: Mapping of (base, quote) -> rate, to be used with fx_rate or build_conversion_matrix
+    """
+    rows = (FXRateHistory.objects.filter(source=get_history_source(fx_mode), valid_during__contains=at)
+            .values_list('base', 'quote', 'rate'))
+
+    return {(base, quote): rate for base, quote, rate in rows}
+
+
+def list_rates_as_of(at: datetime, fx_mode: FXMode, currencies: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Lists the stored rates of a mode as they were at a point in time, e.g. to backfill reports.
+
+    :param at: The point in time
+    :param fx_mode: Manual or live rates
+    :param currencies: Optional currencies, pairs of other currencies being left out
+    :return: dict matching FXRatesAsOfOut
+    """
+    source = get_history_source(fx_mode)
+
+    rows = FXRateHistory.objects.filter(source=source, valid_during__contains=at)
+    if currencies:
+        rows = rows.filter(base__in=currencies, quote__in=currencies)
+
+    return {
+        'at': at,
+        'source': source,
+        'rates': [_history_rate_out(row, row.base, row.quote) for row in rows.order_by('base', 'quote')],
+    }
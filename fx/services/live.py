@@ -0,0 +1,277 @@
+import logging
+import time
+import uuid
+from datetime import timedelta
+from functools import lru_cache
+from typing import Optional, List, Dict, Any
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from ninja_extra import status
+
+from catalogs.schemas.fx import Status
+from common.exceptions import APIBaseError, FXRatesStaleError
+from common.jobs import enqueue_job
+from common.models import Job
+from fx.models import FXRatesCache
+from fx.services.health import (get_health, record_provider_call, allow_provider_call, get_breaker_state,
+                                rates_are_stale, BREAKER_OPEN)
+from fx.services.providers import FXProvider
+from fx.services.rates import bump_rates_version
+from pricing.schemas import FXMode
+from ships_cabins.models import ShipCurrency
+
+logger = logging.getLogger(__name__)
+
+# Live rates are served stale-while-revalidate: cached rates older than settings.FX_REFRESH_AFTER are returned as is
+# while a background job refreshes them, rates are only fetched inline when a requested quote was never cached.
+# Refreshes of a base are single-flight: one worker holds the refresh lock and calls the provider, concurrent callers
+# wait for it and read what it stored.
+FX_REFRESH_JOB_KIND = 'fx.refresh'
+FX_REFRESH_LOCK_KEY = 'fx:refresh-lock:{base}'
+FX_REFRESH_LOCK_TIMEOUT = 30  # seconds, longer than a provider call (see FX_PROVIDER_TIMEOUT)
+FX_REFRESH_WAIT = 15  # seconds a caller waits for the refresh of the same base by another caller
+FX_REFRESH_POLL = 0.05
+FX_REVALIDATE_KEY = 'fx:revalidate:{base}'  # set once a background refresh of the base is queued
+
+# What pricing in live mode does once the live rates are stale (see fx.services.health)
+FX_STALE_FALLBACK_MANUAL = 'manual'  # price with the manual rates instead
+FX_STALE_FALLBACK_FAIL = 'fail'  # reject the request with FXRatesStaleError
+
+
+@lru_cache(maxsize=None)
+def get_provider() -> FXProvider:
+    """
+    Gets the configured live rates provider (settings.FX_PROVIDER).
+    """
+    return import_string(settings.FX_PROVIDER)()
+
+
+def get_cached_rates(base: str, quotes: List[str]) -> Dict[str, FXRatesCache]:
+    """
+    Gets the cached live rates of the current provider for a base.
+
+    :param base: The currency being converted from
+    :param quotes: The currencies being converted to
+    :return: Mapping of quote -> cached rate, quotes never fetched being left out
+    """
+    return {
+        row.quote: row
+        for row in FXRatesCache.objects.filter(provider=get_provider().name, base=base, quote__in=quotes)
+    }
+
+
+def _store_rates(base: str, rates: Dict[str, Any]) -> List[FXRatesCache]:
+    """
+    Upserts the rates fetched for a base and bumps the version of the live rate matrices.
+    """
+    now = timezone.now()
+    provider = get_provider().name
+
+    rows = FXRatesCache.objects.bulk_create(
+        [FXRatesCache(provider=provider, base=base, quote=quote, rate=rate, fetched_at=now)
+         for quote, rate in rates.items()],
+        update_conflicts=True,
+        update_fields=['rate', 'fetched_at'],
+        unique_fields=['provider', 'base', 'quote'],
+    )
+    bump_rates_version(FXMode.LIVE)
+
+    return rows
+
+
+def _batch_quotes(base: str, quotes: List[str]) -> List[str]:
+    """
+    The quotes fetched with a refresh of a base: the requested ones, the ones already cached and every currency used
+    by ships, so a single provider call keeps the whole base current.
+    """
+    cached = FXRatesCache.objects.filter(provider=get_provider().name, base=base).values_list('quote', flat=True)
+    used = ShipCurrency.objects.values_list('currency', flat=True).distinct()
+
+    return sorted((set(quotes) | set(cached) | set(used)) - {base})
+
+
+def refresh_live_rates(base: str, quotes: List[str]) -> Dict[str, FXRatesCache]:
+    """
+    Fetches the current rates of a base from the provider in one batched call and caches them. Concurrent refreshes
+    of the same base share a single provider call.
+
+    :param base: The currency being converted from
+    :param quotes: The currencies being converted to
+    :return: Mapping of quote -> cached rate
+    """
+    lock = FX_REFRESH_LOCK_KEY.format(base=base)
+    token = uuid.uuid4().hex
+    provider = get_provider()
+
+    if cache.add(lock, token, FX_REFRESH_LOCK_TIMEOUT):
+        try:
+            if not allow_provider_call(provider.name):
+                raise APIBaseError(
+                    title='FX provider unavailable',
+                    detail=f'The live rates provider is failing, {base} is not refreshed until it recovers',
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                )
+
+            start = time.monotonic()
+            try:
+                rates = async_to_sync(provider.fetch)(base, _batch_quotes(base, quotes))
+            except Exception as exc:
+                logger.exception('Live FX refresh of %s failed', base)
+                record_provider_call(provider.name, time.monotonic() - start, succeeded=False)
+                raise APIBaseError(
+                    title='FX provider unavailable',
+                    detail=f'The live rates of {base} could not be refreshed',
+                    status=status.HTTP_502_BAD_GATEWAY,
+                ) from exc
+
+            record_provider_call(provider.name, time.monotonic() - start, succeeded=True)
+            _store_rates(base, rates)
+        finally:
+            if cache.get(lock) == token:
+                cache.delete(lock)
+    else:
+        # Another caller is refreshing the base, its rates are read once it releases the lock
+        deadline = time.monotonic() + FX_REFRESH_WAIT
+        while cache.get(lock) is not None and time.monotonic() < deadline:
+            time.sleep(FX_REFRESH_POLL)
+
+    return get_cached_rates(base, quotes)
+
+
+def schedule_refresh(base: str, quotes: List[str]) -> Optional[Job]:
+    """
+    Queues a background refresh of a base, unless one is already queued or running. The pending refresh jobs are
+    deduplicated per base (see enqueue_job), so they do not pile up while no worker runs them. FX_REVALIDATE_KEY only
+    saves the job lookup on the reads following a queued refresh.
+
+    :param base: The currency being converted from
+    :param quotes: The currencies being converted to
+    :return: The queued job, or None if a refresh was already pending
+    """
+    if not cache.add(FX_REVALIDATE_KEY.format(base=base), 1, FX_REFRESH_LOCK_TIMEOUT + FX_REFRESH_WAIT):
+        return None
+
+    return enqueue_job(FX_REFRESH_JOB_KIND, {'base': base, 'quotes': sorted(quotes)},
+                       dedup_key=f'{FX_REFRESH_JOB_KIND}:{base}')
+
+
+def run_fx_refresh_job(job: Job) -> Dict[str, Any]:
+    """
+    Job handler refreshing the live rates of a base (see schedule_refresh).
+
+    :param job: The claimed job
+    :return: The number of quotes cached for the base
+    """
+    try:
+        rates = refresh_live_rates(job.payload['base'], job.payload['quotes'])
+    finally:
+        cache.delete(FX_REVALIDATE_KEY.format(base=job.payload['base']))
+
+    return {'base': job.payload['base'], 'quotes': len(rates)}
+
+
+def is_stale(fetched_at) -> bool:
+    """
+    Whether a cached live rate is older than settings.FX_STALE_AFTER_HOURS.
+    """
+    return timezone.now() - fetched_at > timedelta(hours=settings.FX_STALE_AFTER_HOURS)
+
+
+def read_live_rates(base: str, quotes: List[str]) -> List[Dict[str, Any]]:
+    """
+    Gets the live rates of a base, stale-while-revalidate: quotes never cached are fetched inline, cached rates older
+    than settings.FX_REFRESH_AFTER are returned while a background refresh is queued.
+
+    :param base: The currency being converted from
+    :param quotes: The currencies being converted to
+    :return: List of dict matching LiveFXOut
+    """
+    quotes = sorted(set(quotes) - {base})
+    rates = get_cached_rates(base, quotes)
+
+    if set(quotes) - rates.keys():
+        rates = refresh_live_rates(base, quotes)
+    elif rates and min(row.fetched_at for row in rates.values()) < timezone.now() - settings.FX_REFRESH_AFTER:
+        # No refresh is queued while the provider circuit breaker is open, the job would fail right away
+        if get_breaker_state(get_health(get_provider().name)) != BREAKER_OPEN:
+            schedule_refresh(base, quotes)
+
+    return [_live_rates_out(base, rates)]
+
+
+def force_refresh_live_rates(base: str, quotes: List[str]) -> List[Dict[str, Any]]:
+    """
+    Refreshes the live rates of a base right away (single-flight, see refresh_live_rates).
+
+    :param base: The currency being converted from
+    :param quotes: The currencies being converted to
+    :return: List of dict matching LiveFXOut
+    """
+    return [_live_rates_out(base, refresh_live_rates(base, sorted(set(quotes) - {base})))]
+
+
+def _live_rates_out(base: str, rates: Dict[str, FXRatesCache]) -> Dict[str, Any]:
+    return {
+        'provider': get_provider().name,
+        'base': base,
+        'quotes': [
+            {'quote': quote, 'rate': row.rate, 'fetched_at': row.fetched_at, 'is_stale': is_stale(row.fetched_at)}
+            for quote, row in sorted(rates.items())
+        ],
+    }
+
+
+def get_live_rates_status() -> Dict[str, Any]:
+    """
+    Gets the health of the live rates from the in-process provider health (see fx.services.health): down if nothing
+    was ever fetched, degraded if the last refresh failed or the rates are stale, ok otherwise.
+
+    :return: dict matching CacheStatusOut
+    """
+    provider = get_provider().name
+    health = get_health(provider)
+
+    if health['last_success_at'] is None:
+        fx_status = Status.DOWN
+    elif health['failures'] or rates_are_stale(health):
+        fx_status = Status.DEGRADED
+    else:
+        fx_status = Status.OK
+
+    return {
+        'provider': provider,
+        'last_refresh_at': health['last_success_at'],
+        'last_failure_at': health['last_failure_at'],
+        'consecutive_failures': health['failures'],
+        'latency_ms': health['latency_ms'],
+        'breaker': get_breaker_state(health),
+        'stale_after_hours': settings.FX_STALE_AFTER_HOURS,
+        'stale_fallback': settings.FX_STALE_FALLBACK,
+        'status': fx_status,
+    }
+
+
+def resolve_pricing_fx_mode(fx_mode: FXMode) -> FXMode:
+    """
+    Gets the rates a pricing request in a mode is served with. Live requests are checked against the in-process
+    provider health only: once the live rates are stale they are priced with the manual rates or rejected, depending
+    on settings.FX_STALE_FALLBACK.
+
+    :param fx_mode: The requested mode
+    :return: The mode to price with
+    """
+    if FXMode(fx_mode) != FXMode.LIVE or not rates_are_stale(get_health(get_provider().name)):
+        return fx_mode
+
+    if settings.FX_STALE_FALLBACK == FX_STALE_FALLBACK_MANUAL:
+        return FXMode.MANUAL
+
+    raise FXRatesStaleError(
+        title='FX rates stale',
+        detail=f'The live rates were not refreshed for over {settings.FX_STALE_AFTER_HOURS} hours',
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
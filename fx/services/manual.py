@@ -0,0 +1,172 @@
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+from typing import Optional, Iterable, Iterator, List, Dict, Tuple, Any
+
+from django.db import connection, transaction
+from ninja_extra import status
+from pydantic_extra_types.currency_code import Currency
+
+from common.exceptions import APIBaseError, ValidationFailedError
+from fx.services.rates import bump_rates_version
+from pricing.schemas import FXMode
+
+# Manual rate sheets are streamed line by line into a staging table with COPY, then merged with a single
+# INSERT ... ON CONFLICT, so a full sheet (every ordered pair of ~170 currencies) is one round trip whatever its size.
+MANUAL_SHEET_CSV = 'text/csv'
+MANUAL_SHEET_JSONL = 'application/x-ndjson'
+MANUAL_SHEET_COLUMNS = ('base', 'quote', 'rate')
+MANUAL_SHEET_MAX_ERRORS = 50  # invalid rows reported at most, the whole sheet is rejected anyway
+RATE_MAX_DIGITS = 18
+RATE_DECIMAL_PLACES = 8
+
+# The staging table is dropped with the transaction, it only lives for the duration of an upload
+STAGE_MANUAL_RATES_SQL = """
+    CREATE TEMP TABLE IF NOT EXISTS fx_manual_sheet (
+        line integer NOT NULL, base varchar(3) NOT NULL, quote varchar(3) NOT NULL, rate numeric(18, 8) NOT NULL
+    ) ON COMMIT DROP;
+    TRUNCATE fx_manual_sheet;
+"""
+
+# A pair given several times takes its last rate. Unchanged rates are skipped by the WHERE clause of the upsert, so
+# their updated_at is kept and they are counted neither as inserted nor updated.
+MERGE_MANUAL_RATES_SQL = """
+    WITH sheet AS (
+        SELECT DISTINCT ON (base, quote) base, quote, rate
+        FROM fx_manual_sheet
+        ORDER BY base, quote, line DESC
+    ), upserted AS (
+        INSERT INTO exchange_rates_manual AS m (base, quote, rate)
+        SELECT base, quote, rate
+        FROM sheet
+        ON CONFLICT (base, quote) DO UPDATE SET
+            rate = EXCLUDED.rate,
+            updated_at = NOW()
+        WHERE m.rate IS DISTINCT FROM EXCLUDED.rate
+        RETURNING xmax = 0 AS inserted
+    )
+    SELECT (SELECT count(*) FROM sheet), count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted)
+    FROM upserted;
+"""
+
+
+def _read_csv(lines: Iterable[str]) -> Iterator[Tuple[int, Any]]:
+    """
+    Reads a CSV sheet with a base,quote,rate header (in any order, other columns being ignored).
+    """
+    reader = csv.DictReader(lines)
+
+    header = [column.strip().lower() for column in reader.fieldnames or []]
+    missing = [column for column in MANUAL_SHEET_COLUMNS if column not in header]
+    if missing:
+        raise ValidationFailedError(
+            title='Invalid rate sheet',
+            detail='The CSV header must name the base, quote and rate columns',
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            errors=[{'field': column, 'message': 'Column is missing'} for column in missing],
+        )
+    reader.fieldnames = header
+
+    for record in reader:
+        yield reader.line_num, record
+
+
+def _read_jsonl(lines: Iterable[str]) -> Iterator[Tuple[int, Any]]:
+    """
+    Reads a JSON lines sheet, one {"base", "quote", "rate"} object per line. Blank lines are skipped.
+    """
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line, parse_float=Decimal)
+        except ValueError:
+            yield number, None
+
+
+def _parse_row(record: Any) -> Tuple[Optional[tuple], Optional[str]]:
+    """
+    Validates a sheet record.
+
+    :return: ((base, quote, rate), None) or (None, error message)
+    """
+    if not isinstance(record, dict):
+        return None, 'Row is not a base, quote and rate record'
+
+    base = str(record.get('base') or '').strip().upper()
+    quote = str(record.get('quote') or '').strip().upper()
+
+    for currency in (base, quote):
+        if currency not in Currency.allowed_currencies:
+            return None, f'Invalid currency code {currency!r}'
+    if base == quote:
+        return None, 'Base and quote must differ'
+
+    try:
+        rate = Decimal(str(record.get('rate')).strip())
+    except InvalidOperation:
+        return None, f'Invalid rate {record.get("rate")!r}'
+
+    if not rate.is_finite() or rate <= 0:
+        return None, 'Rate must be positive'
+    if rate.normalize().as_tuple().exponent < -RATE_DECIMAL_PLACES \
+            or rate >= 10 ** (RATE_MAX_DIGITS - RATE_DECIMAL_PLACES):
+        return None, f'Rate must have at most {RATE_MAX_DIGITS} digits, {RATE_DECIMAL_PLACES} of them decimal'
+
+    return (base, quote, rate), None
+
+
+def upload_manual_rates(stream: Iterable[bytes], content_type: str) -> Dict[str, Any]:
+    """
+    Upserts a manual rate sheet, streamed as CSV or JSON lines, in one transaction: the rows are copied into a staging
+    table as they are read, then merged with a single INSERT ... ON CONFLICT. Only the rates that changed get a new
+    updated_at. The sheet is rejected as a whole if any row is invalid.
+
+    :param stream: The sheet, as an iterable of lines (e.g. the request)
+    :param content_type: MANUAL_SHEET_CSV or MANUAL_SHEET_JSONL
+    :return: dict matching ManualFXUploadOut
+    """
+    if content_type == MANUAL_SHEET_CSV:
+        read = _read_csv
+    elif content_type == MANUAL_SHEET_JSONL:
+        read = _read_jsonl
+    else:
+        raise APIBaseError(
+            title='Unsupported rate sheet',
+            detail=f'Rate sheets must be sent as {MANUAL_SHEET_CSV} or {MANUAL_SHEET_JSONL}',
+            status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+        )
+
+    lines = (line.decode('utf-8-sig') for line in stream)
+    rows = 0
+    errors: List[Dict[str, str]] = []
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(STAGE_MANUAL_RATES_SQL)
+        with cursor.copy('COPY fx_manual_sheet (line, base, quote, rate) FROM STDIN') as copy:
+            for number, record in read(lines):
+                row, error = _parse_row(record)
+                if error is not None:
+                    errors.append({'field': f'line {number}', 'message': error})
+                    if len(errors) >= MANUAL_SHEET_MAX_ERRORS:
+                        break
+                elif not errors:
+                    copy.write_row((number, *row))
+                rows += 1
+
+        if errors or not rows:
+            raise ValidationFailedError(
+                title='Invalid rate sheet',
+                detail='The sheet has no rates' if not errors else 'One or more rows are invalid, nothing was saved',
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                errors=errors or [{'field': 'sheet', 'message': 'At least one rate is required'}],
+            )
+
+        cursor.execute(MERGE_MANUAL_RATES_SQL)
+        pairs, inserted, updated = cursor.fetchone()
+
+        if inserted or updated:
+            bump_rates_version(FXMode.MANUAL)
+
+    return {'rows': rows, 'pairs': pairs, 'inserted': inserted, 'updated': updated,
+            'unchanged': pairs - inserted - updated}
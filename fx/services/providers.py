@@ -0,0 +1,70 @@
+from abc import ABC, abstractmethod
+from decimal import Decimal
+from typing import List, Dict
+
+import httpx
+
+RATE_QUANTUM = Decimal('0.00000001')  # rates are stored with 8 decimal places
+FX_PROVIDER_TIMEOUT = 10  # seconds
+
+
+class FXProvider(ABC):
+    """
+    Base class of the live FX rate providers (see settings.FX_PROVIDER). A provider fetches the rates of several
+    quotes for a base in a single call.
+    """
+    name = None
+
+    @abstractmethod
+    async def fetch(self, base: str, quotes: List[str]) -> Dict[str, Decimal]:
+        """
+        Fetches the current rates from a base currency.
+
+        :param base: The currency being converted from
+        :param quotes: The currencies being converted to
+        :return: Mapping of quote -> rate, quotes unknown to the provider being left out
+        """
+
+
+class FrankfurterProvider(FXProvider):
+    """
+    Reference rates published by the European Central Bank, through the Frankfurter API (no key needed).
+    """
+    name = 'frankfurter'
+    url = 'https://api.frankfurter.app/latest'
+
+    async def fetch(self, base: str, quotes: List[str]) -> Dict[str, Decimal]:
+        async with httpx.AsyncClient(timeout=FX_PROVIDER_TIMEOUT) as client:
+            response = await client.get(self.url, params={'from': base, 'to': ','.join(quotes)})
+            response.raise_for_status()
+            data = response.json(parse_float=Decimal)
+
+        return {quote: Decimal(rate).quantize(RATE_QUANTUM) for quote, rate in data['rates'].items()}
+
+
+class FakeFXProvider(FXProvider):
+    """
+    Deterministic provider for local development and tests, deriving every pair from fixed USD rates. Counts its calls
+    so batching and single-flight can be checked.
+    """
+    name = 'fake'
+    usd_rates = {
+        'USD': Decimal('1'),
+        'EUR': Decimal('0.92'),
+        'GBP': Decimal('0.79'),
+        'CHF': Decimal('0.88'),
+        'JPY': Decimal('151.20'),
+        'CAD': Decimal('1.37'),
+        'AUD': Decimal('1.52'),
+    }
+    calls = 0
+
+    async def fetch(self, base: str, quotes: List[str]) -> Dict[str, Decimal]:
+        FakeFXProvider.calls += 1
+        if base not in self.usd_rates:
+            return {}
+
+        return {
+            quote: (self.usd_rates[quote] / self.usd_rates[base]).quantize(RATE_QUANTUM)
+            for quote in quotes if quote in self.usd_rates
+        }
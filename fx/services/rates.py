@@ -0,0 +1,274 @@
+import time
+import uuid
+from decimal import Decimal
+from types import MappingProxyType
+from typing import Optional, List, Dict, Tuple, Mapping, Any
+
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from pricing.schemas import FXMode
+from ships_cabins.models import ShipCurrency
+
+# In-process FX rate matrices, one per mode. A matrix is reloaded when the shared version of its mode changes (bumped
+# by the FX write paths once they commit) or when it gets older than FX_MATRIX_MAX_AGE, which bounds how long writes
+# not going through these paths (e.g. admin edits) take to be picked up.
+FX_VERSION_KEY = 'fx:rates-version:{mode}'
+FX_MATRIX_MAX_AGE = 300  # 5 minutes
+
+# The rates are read with the pricing version stamp of their mode in a single statement, so the stamp identifies the
+# exact rates loaded (see sync_rate_matrix). The left joins keep the stamp when there is no rate.
+FX_MATRIX_SQL = {
+    FXMode.MANUAL: """
+        SELECT versions.stamp, rates.base, rates.quote, rates.rate
+        FROM (SELECT 1) AS one
+        LEFT JOIN pricing_versions versions ON versions.key = 'fx:manual'
+        LEFT JOIN exchange_rates_manual rates ON TRUE;
+    """,
+    # Multiple providers may cache the same pair, the most recently fetched rate wins
+    FXMode.LIVE: """
+        SELECT versions.stamp, rates.base, rates.quote, rates.rate
+        FROM (SELECT 1) AS one
+        LEFT JOIN pricing_versions versions ON versions.key = 'fx:live'
+        LEFT JOIN fx_rates_cache rates ON TRUE
+        ORDER BY rates.fetched_at;
+    """,
+}
+NO_RATES_STAMP = 'none'  # the rates of the mode never changed since the pricing versions were introduced
+
+# Pairs that are not stored (directly or inverted) are triangulated through the first pivot currency both currencies
+# convert to. Must match the manual_fx_rate() database function used by the effective prices projection.
+FX_PIVOT_CURRENCIES = ('USD', 'EUR')
+ROUTE_DIRECT = 'direct'
+ROUTE_INVERSE = 'inverse'
+
+Rates = Mapping[Tuple[str, str], Decimal]
+
+# mode -> (version, stamp, loaded_at, rates, conversions, routes). Entries are replaced, never modified, so readers
+# need no lock.
+_matrices: Dict[FXMode, Tuple[Optional[str], str, Optional[float], Rates, Rates, Mapping[Tuple[str, str], str]]] = {}
+
+
+def fx_rate(rates: Rates, base: str, quote: str) -> Optional[Decimal]:
+    """
+    Looks up the conversion rate from base to quote, falling back to the inverse of a stored (quote, base) pair.
+
+    :param rates: Mapping of (base, quote) -> rate, stored rates or a conversion matrix (see get_conversion_matrix)
+    :param base: The currency being converted from
+    :param quote: The currency being converted to
+    :return: The rate, or None if neither the pair nor its inverse is known
+    """
+    if base == quote:
+        return Decimal(1)
+
+    rate = rates.get((base, quote))
+    if rate is not None:
+        return rate
+
+    inverse = rates.get((quote, base))
+    if inverse is not None:
+        return 1 / inverse
+
+    return None
+
+
+def build_conversion_matrix(rates: Rates) -> Tuple[Rates, Mapping[Tuple[str, str], str]]:
+    """
+    Computes the rate of every pair of the currencies found in stored rates: the stored pair, else the inverse of the
+    stored (quote, base) pair, else the product of the two legs through the first pivot currency (see
+    FX_PIVOT_CURRENCIES) where both legs are stored or inverted.
+
+    :param rates: Stored rates, mapping of (base, quote) -> rate
+    :return: (conversions, routes), mappings of (base, quote) -> rate and (base, quote) -> 'direct', 'inverse' or the
+             pivot currency. Pairs that cannot be converted are left out.
+    """
+    def stored(base, quote):
+        rate = rates.get((base, quote))
+        if rate is not None:
+            return rate, ROUTE_DIRECT
+
+        inverse = rates.get((quote, base))
+        if inverse is not None:
+            return 1 / inverse, ROUTE_INVERSE
+
+        return None, None
+
+    currencies = sorted({currency for pair in rates for currency in pair})
+    conversions, routes = {}, {}
+
+    for base in currencies:
+        for quote in currencies:
+            if base == quote:
+                continue
+
+            rate, route = stored(base, quote)
+            for pivot in FX_PIVOT_CURRENCIES:
+                if rate is not None:
+                    break
+                if pivot in (base, quote):
+                    continue
+                first, _ = stored(base, pivot)
+                second, _ = stored(pivot, quote)
+                if first is not None and second is not None:
+                    rate, route = first * second, pivot
+
+            if rate is not None:
+                conversions[(base, quote)] = rate
+                routes[(base, quote)] = route
+
+    return MappingProxyType(conversions), MappingProxyType(routes)
+
+
+def get_rates_version(fx_mode: FXMode) -> str:
+    """
+    Gets the shared version of the rates of a mode, creating it if missing (e.g. after the cache was flushed).
+
+    :param fx_mode: Manual or live rates
+    :return: The version
+    """
+    key = FX_VERSION_KEY.format(mode=FXMode(fx_mode).value)
+
+    version = cache.get(key)
+    if version is None:
+        # Versions are random rather than counters so a recreated key never matches a version loaded before
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+
+    return version
+
+
+def bump_rates_version(fx_mode: FXMode):
+    """
+    Replaces the shared version of the rates of a mode once the current transaction commits, so every process reloads
+    its matrix on its next conversion.
+
+    :param fx_mode: Manual or live rates
+    """
+    key = FX_VERSION_KEY.format(mode=FXMode(fx_mode).value)
+    transaction.on_commit(lambda: cache.set(key, uuid.uuid4().hex, None))
+
+
+def _load_matrix(fx_mode: FXMode) -> Tuple[str, Rates]:
+    """
+    Loads every rate of a mode in a single query.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(FX_MATRIX_SQL[fx_mode])
+        rows = cursor.fetchall()
+
+    stamp = str(rows[0][0]) if rows[0][0] else NO_RATES_STAMP
+    rates = {(base, quote): rate for _, base, quote, rate in rows if base is not None}
+
+    return stamp, MappingProxyType(rates)
+
+
+def _get_matrix(fx_mode: FXMode) -> Tuple[Optional[str], str, Optional[float], Rates, Rates,
+                                         Mapping[Tuple[str, str], str]]:
+    """
+    Gets the in-process matrix of a mode, reloading it (and computing its conversions) if its version changed or it
+    is too old. Inside a transaction the rates are read from it and not shared, as it may hold uncommitted changes.
+    """
+    fx_mode = FXMode(fx_mode)
+    if connection.in_atomic_block:
+        stamp, rates = _load_matrix(fx_mode)
+        return None, stamp, None, rates, *build_conversion_matrix(rates)
+
+    version = get_rates_version(fx_mode)
+
+    matrix = _matrices.get(fx_mode)
+    if matrix is None or matrix[0] != version or time.monotonic() - matrix[2] > FX_MATRIX_MAX_AGE:
+        stamp, rates = _load_matrix(fx_mode)
+        matrix = _matrices[fx_mode] = (version, stamp, time.monotonic(), rates, *build_conversion_matrix(rates))
+
+    return matrix
+
+
+def get_rate_matrix(fx_mode: FXMode) -> Rates:
+    """
+    Gets every stored rate of a mode as an immutable (base, quote) -> rate mapping, shared by the whole process. Only
+    a version check hits the cache when the matrix is current.
+
+    :param fx_mode: Manual or live rates
+    :return: Mapping of (base, quote) -> rate, to be used with fx_rate
+    """
+    return _get_matrix(fx_mode)[3]
+
+
+def get_conversion_matrix(fx_mode: FXMode) -> Rates:
+    """
+    Gets the rate of every convertible pair of a mode (see build_conversion_matrix), computed once per rate change
+    and shared by the whole process, so a conversion is a single lookup.
+
+    :param fx_mode: Manual or live rates
+    :return: Mapping of (base, quote) -> rate, to be used with fx_rate
+    """
+    return _get_matrix(fx_mode)[4]
+
+
+def get_conversion_routes(fx_mode: FXMode) -> Mapping[Tuple[str, str], str]:
+    """
+    Gets how the rate of every convertible pair of a mode was derived.
+
+    :param fx_mode: Manual or live rates
+    :return: Mapping of (base, quote) -> 'direct', 'inverse' or the pivot currency
+    """
+    return _get_matrix(fx_mode)[5]
+
+
+def get_conversion_table(fx_mode: FXMode, currencies: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Lists the conversion rate of every ordered pair of currencies, from the in-process conversion matrix.
+
+    :param fx_mode: Manual or live rates
+    :param currencies: Optional currencies, all the currencies used by ships if omitted
+    :return: dict matching ConversionMatrixOut, pairs that cannot be converted having no rate
+    """
+    if currencies is None:
+        currencies = ShipCurrency.objects.values_list('currency', flat=True).distinct()
+    currencies = sorted(set(currencies))
+
+    matrix = _get_matrix(fx_mode)
+    conversions, routes = matrix[4], matrix[5]
+
+    return {
+        'currencies': currencies,
+        'rates': [
+            {'base': base, 'quote': quote, 'rate': conversions.get((base, quote)), 'route': routes.get((base, quote))}
+            for base in currencies for quote in currencies if base != quote
+        ],
+    }
+
+
+def sync_rate_matrix(fx_mode: FXMode, stamp: str):
+    """
+    Reloads the in-process matrix of a mode unless it holds the rates of the given pricing version stamp, read from
+    the database by the caller (e.g. with the other stamps of a cache key). Closes the window where the matrix lags
+    behind a committed change (until its version is bumped or it gets too old), so a response cached under the stamp
+    is never built from older rates.
+
+    :param fx_mode: Manual or live rates
+    :param stamp: The current pricing version stamp of the rates of the mode
+    """
+    fx_mode = FXMode(fx_mode)
+    if connection.in_atomic_block:
+        return
+
+    matrix = _matrices.get(fx_mode)
+    if matrix is None or matrix[1] != stamp:
+        version = get_rates_version(fx_mode)
+        loaded_stamp, rates = _load_matrix(fx_mode)
+        _matrices[fx_mode] = (version, loaded_stamp, time.monotonic(), rates, *build_conversion_matrix(rates))
+
+
+def convert(amount: Decimal, base: str, quote: str, fx_mode: FXMode) -> Optional[Decimal]:
+    """
+    Converts an amount using the in-process conversion matrix of a mode (unrounded).
+
+    :param amount: The amount in the base currency
+    :param base: The currency being converted from
+    :param quote: The currency being converted to
+    :param fx_mode: Manual or live rates
+    :return: The converted amount, or None if the rate is not known
+    """
+    rate = fx_rate(get_conversion_matrix(fx_mode), base, quote)
+    return amount * rate if rate is not None else None
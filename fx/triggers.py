@@ -0,0 +1,56 @@
+from common.triggers import transition_trgs
+
+# Triggers keeping fx_rate_history (see FXRateHistory) in sync with the stored rates. Each rate change closes the open
+# period of its pair at the transaction time and opens a new one, rewriting a pair that already changed within the
+# same transaction only replaces the period opened by it. Rewrites keeping the rate (e.g. live refreshes) leave the
+# history untouched. The SQL is used with common.triggers.transition_trgs, `{changed}` being the rows touched by the
+# statement, `{table}` the rates table and `{source}` the history source of a row aliased as `{row}`.
+RATE_HISTORY_SQL = """
+                UPDATE fx_rate_history h SET valid_during = tstzrange(lower(h.valid_during), NOW())
+                FROM ({stale}) AS stale
+                WHERE h.id = stale.id AND lower(h.valid_during) < NOW();
+
+                DELETE FROM fx_rate_history h USING ({stale}) AS stale WHERE h.id = stale.id;
+
+                INSERT INTO fx_rate_history (source, base, quote, rate, valid_during)
+                SELECT DISTINCT {rates_source}, rates.base, rates.quote, rates.rate, tstzrange(NOW(), NULL)
+                FROM {changed} AS changed
+                JOIN {table} rates
+                  ON {rates_source} = {changed_source} AND rates.base = changed.base AND rates.quote = changed.quote
+                WHERE NOT EXISTS (
+                    SELECT 1
+                    FROM fx_rate_history h
+                    WHERE h.source = {rates_source} AND h.base = rates.base AND h.quote = rates.quote
+                      AND h.valid_during @> NOW()
+                );
+"""
+
+# Open periods of the changed pairs whose rate is no longer the stored one (or whose pair was deleted)
+STALE_RATE_PERIODS_SQL = """
+                    SELECT h.id
+                    FROM (SELECT DISTINCT {changed_source} AS source, changed.base, changed.quote
+                          FROM {changed} AS changed) AS pairs
+                    JOIN fx_rate_history h
+                      ON h.source = pairs.source AND h.base = pairs.base AND h.quote = pairs.quote
+                     AND h.valid_during @> NOW()
+                    LEFT JOIN {table} rates
+                      ON {rates_source} = pairs.source AND rates.base = pairs.base AND rates.quote = pairs.quote
+                    WHERE rates.rate IS DISTINCT FROM h.rate
+"""
+
+
+def rate_history_trgs(trg_name, table, source):
+    """
+    Definitions for the triggers recording the rate changes of a rates table in fx_rate_history.
+
+    :param trg_name: The base name of the triggers (see common.triggers.transition_trgs).
+    :param table: The rates table, with base, quote and rate columns.
+    :param source: SQL expression of the history source of a row aliased as `{row}` (e.g. "{row}.provider").
+    :return: List of trigger definitions.
+    """
+    sql = RATE_HISTORY_SQL.replace('{stale}', STALE_RATE_PERIODS_SQL.strip())
+    sql = (sql.replace('{table}', table)
+              .replace('{rates_source}', source.replace('{row}', 'rates'))
+              .replace('{changed_source}', source.replace('{row}', 'changed')))
+
+    return transition_trgs(trg_name, sql)
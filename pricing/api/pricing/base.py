@@ -1,30 +1,153 @@
-from ninja import Router
-from ninja_extra import paginate
+import uuid
+from typing import List, Optional, Callable, Dict, Any
 
-from pricing.schemas import PricingGraphOut, PricingListOut, CabinOverrideIn
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from ninja import Router, Query, Schema
+from pydantic_extra_types.currency_code import Currency
+
+from common.jobs import get_job, cancel_job
+from common.schemas import JobOut
+from fx.services.live import resolve_pricing_fx_mode
+from pricing.schemas import (PricingGraphOut, PricingGraphColumnsOut, GraphCoverageOut, PricingListOut, PricingBulkIn,
+                             PricingBulkOut, ScopeCacheStatsOut, CabinOverrideIn, FXMode, Occupancy)
+from pricing.services.bulk import apply_pricing_bulk, enqueue_pricing_bulk, BULK_JOB_KIND
+from pricing.services.engine import build_pricing_graph, build_pricing_graph_columns, load_scope
+from pricing.services.lines import build_pricing_list, LIST_DEFAULT_LIMIT, LIST_MAX_LIMIT
+from pricing.services.projection import get_scope_coverage
+from pricing.services.scope_cache import scope_cache_key, get_cached_scope, set_cached_scope, get_scope_cache_stats
 
 router = Router(tags=['G1. Scope, View, Bulk, Margins & FX'])
 
+# Media type requesting the columnar pricing graph (see build_pricing_graph_columns)
+GRAPH_COLUMNS_MEDIA_TYPE = 'application/vnd.pricing-graph.columns+json'
+
+def _accepts(request, media_type: str) -> bool:
+    """
+    Whether the Accept header of the request explicitly lists a media type.
+    """
+    accepted = request.headers.get('Accept', '').split(',')
+    return any(part.split(';')[0].strip().lower() == media_type for part in accepted)
+
+def _cached_scope_response(request, view: str, key: str, schema: type[Schema], build: Callable[[], Dict[str, Any]],
+                           media_type: Optional[str] = None) -> HttpResponse:
+    """
+    Returns the cached rendering of a pricing scope response, building, validating and rendering it on a miss.
+    """
+    content_type = f'{media_type}; charset=utf-8' if media_type else router.api.get_content_type()
+
+    content = get_cached_scope(view, key)
+    if content is not None:
+        return HttpResponse(content, content_type=content_type)
+
+    response = router.api.create_response(request, schema.model_validate(build()).model_dump(), status=200)
+    response['Content-Type'] = content_type
+    set_cached_scope(key, response.content)
+
+    return response
+
 @router.get('/graph', response=PricingGraphOut)
-def get_pricing_graph(request, season_id, ship_id, sailing_ids, fx_mode, occupancy):
+def get_pricing_graph(request, season_id: uuid.UUID, ship_id: uuid.UUID, fx_mode: FXMode, occupancy: Occupancy,
+                      sailing_ids: List[uuid.UUID] = Query(None), currency: Optional[Currency] = None):
     """
     Pricing Interactive Graph view for a selected scope.
 
-    This returns a grid/coverage-oriented pricing breakdown.
+    This returns a grid/coverage-oriented pricing breakdown. Send `Accept: application/vnd.pricing-graph.columns+json`
+    to get the same graph in a compact columnar layout (PricingGraphColumnsOut): identifiers are listed once, cells
+    are parallel arrays of status codes, amounts scaled to integers and currency indexes.
+
+    Note: all sailings of the ship in the season are used when `sailing_ids` is omitted. Prices are shown in their
+    cost currency unless a display `currency` is given. Responses are cached until a pricing input of the scope changes.
+    Stale live rates are replaced by the manual ones or rejected, depending on the FX policy (see `scope.fx_mode`).
+    """
+    fx_mode = resolve_pricing_fx_mode(fx_mode)
+    # Resolved once, for the cache key and the graph built on a miss
+    season, sailing_ids = load_scope(season_id, ship_id, sailing_ids)
+
+    if _accepts(request, GRAPH_COLUMNS_MEDIA_TYPE):
+        key = scope_cache_key('graph', season_id, ship_id, sailing_ids, fx_mode, occupancy, currency, 'columns')
+        response = _cached_scope_response(request, 'graph', key, PricingGraphColumnsOut, lambda: (
+            build_pricing_graph_columns(season_id, ship_id, sailing_ids, fx_mode, occupancy, currency, season)
+        ), GRAPH_COLUMNS_MEDIA_TYPE)
+    else:
+        key = scope_cache_key('graph', season_id, ship_id, sailing_ids, fx_mode, occupancy, currency)
+        response = _cached_scope_response(request, 'graph', key, PricingGraphOut, lambda: build_pricing_graph(
+            season_id, ship_id, sailing_ids, fx_mode, occupancy, currency, season
+        ))
+
+    patch_vary_headers(response, ['Accept'])
+    return response
+
+@router.get('/graph/coverage', response=GraphCoverageOut)
+def get_pricing_coverage(request, season_id: uuid.UUID, ship_id: uuid.UUID,
+                         sailing_ids: List[uuid.UUID] = Query(None)):
+    """
+    Pricing coverage (graph header) for a selected scope, without resolving its cells.
+
+    Note: all sailings of the ship in the season are used when `sailing_ids` is omitted.
     """
+    return get_scope_coverage(season_id, ship_id, sailing_ids)
 
 @router.get('/lines', response=PricingListOut)
-@paginate()
-def get_pricing_list(request, season_id, ship_id, sailing_ids, fx_mode, occupancy):
+def get_pricing_list(request, season_id: uuid.UUID, ship_id: uuid.UUID, fx_mode: FXMode, occupancy: Occupancy,
+                     sailing_ids: List[uuid.UUID] = Query(None), currency: Optional[Currency] = None,
+                     cursor: Optional[str] = None,
+                     limit: int = Query(LIST_DEFAULT_LIMIT, ge=1, le=LIST_MAX_LIMIT)):
     """
     Pricing List view for a selected scope.
 
-    This returns paginated cabin line items.
+    This returns cabin line items paginated with a cursor: pass the `next_cursor` of a page to get the next one.
+    Totals and the line count cover the whole scope (archived and unpriced lines are left out of the totals).
+
+    Note: totals are only given when the scope has a single cost currency or a display `currency` is given. Pages are
+    cached until a pricing input of the scope changes. Stale live rates are replaced by the manual ones or rejected,
+    depending on the FX policy (see `scope.fx_mode`).
+    """
+    fx_mode = resolve_pricing_fx_mode(fx_mode)
+    season, sailing_ids = load_scope(season_id, ship_id, sailing_ids)
+    key = scope_cache_key('lines', season_id, ship_id, sailing_ids, fx_mode, occupancy, currency, cursor, limit)
+
+    return _cached_scope_response(request, 'lines', key, PricingListOut, lambda: build_pricing_list(
+        season_id, ship_id, sailing_ids, fx_mode, occupancy, currency, cursor, limit, season
+    ))
+
+@router.get('/cache/stats', response=List[ScopeCacheStatsOut])
+def get_pricing_cache_stats(request):
+    """
+    Returns the hit/miss counters of the pricing graph and list response caches.
     """
+    return get_scope_cache_stats()
 
-@router.post('/bulk')
-def pricing_bulk(request):
+@router.post('/bulk', response=PricingBulkOut)
+def pricing_bulk(request, payload: PricingBulkIn):
     """
     Bulk set pricing inputs (base/currency/single multiplier/custom costs) for a target set: Category / Deck /
     selected Cabins, and apply across the selected Sailing
-    """
\ No newline at end of file
+
+    Note: target criteria are combined and archived cabins are skipped. The response reports, per table, how many
+    rows were inserted, updated or left unchanged.
+    """
+    return apply_pricing_bulk(payload, getattr(request, 'auth', None))
+
+@router.post('/bulk/jobs', response={202: JobOut})
+def pricing_bulk_job(request, payload: PricingBulkIn):
+    """
+    Same as the bulk set, but the request is validated then queued as a background job and returned immediately.
+
+    Poll the job for its progress and result (matching the bulk set response).
+    """
+    return 202, enqueue_pricing_bulk(payload, getattr(request, 'auth', None))
+
+@router.get('/bulk/jobs/{job_id}', response=JobOut)
+def get_pricing_bulk_job(request, job_id: uuid.UUID):
+    """
+    Returns the status, progress and result of a bulk pricing job.
+    """
+    return get_job(job_id, BULK_JOB_KIND)
+
+@router.post('/bulk/jobs/{job_id}/cancel', response=JobOut)
+def cancel_pricing_bulk_job(request, job_id: uuid.UUID):
+    """
+    Cancels a bulk pricing job. A running job stops after its current batch, batches already applied are kept.
+    """
+    return cancel_job(job_id, BULK_JOB_KIND)
\ No newline at end of file
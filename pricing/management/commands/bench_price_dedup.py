@@ -0,0 +1,85 @@
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from common.enums import CustomCostMode, CustomCostAppliesTo
+from pricing.schemas import Occupancy
+from pricing.services.engine import price_cell, price_grid_dedup
+
+CURRENCIES = ['USD', 'EUR', 'GBP', 'CHF']
+
+# Stored rates, GBP -> USD being only stored the other way round (priced from its inverse) and CHF -> GBP missing
+RATES = {
+    ('EUR', 'USD'): Decimal('1.08450000'),
+    ('USD', 'EUR'): Decimal('0.92208390'),
+    ('USD', 'GBP'): Decimal('0.78912345'),
+    ('EUR', 'GBP'): Decimal('0.85500000'),
+    ('GBP', 'EUR'): Decimal('1.16959064'),
+    ('CHF', 'USD'): Decimal('1.12500000'),
+    ('CHF', 'EUR'): Decimal('1.03725000'),
+}
+
+
+class Command(BaseCommand):
+    help = ('Benchmarks pricing a synthetic grid with its cells deduplicated (price_grid_dedup) against pricing every '
+            'cell with price_cell. The gain depends on the share of cells sharing the same inputs (see --distinct).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cells', type=int, default=100000, help='Number of cells in the grid')
+        parser.add_argument('--distinct', type=int, default=2000,
+                            help='Number of distinct costs the cells are drawn from')
+        parser.add_argument('--customs', type=float, default=0.1, help='Share of cells carrying custom costs')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        costs, customs = self._grid(options['cells'], options['distinct'], options['customs'])
+        margin_b2b, margin_b2c = Decimal('0.1500'), Decimal('0.3250')
+        inputs = len({(cost, tuple(cell_customs or ())) for cost, cell_customs in zip(costs, customs) if cost})
+
+        for occupancy in Occupancy:
+            for currency in [None, *CURRENCIES]:
+                start = time.perf_counter()
+                for cost, cell_customs in zip(costs, customs):
+                    if cost:
+                        price_cell(cost, cell_customs or (), occupancy, margin_b2b, margin_b2c, RATES, currency)
+                per_cell_time = time.perf_counter() - start
+
+                start = time.perf_counter()
+                price_grid_dedup(costs, customs, occupancy, margin_b2b, margin_b2c, RATES, currency)
+                dedup_time = time.perf_counter() - start
+
+                self.stdout.write(f'occupancy={occupancy.value} currency={currency} cells={len(costs)} '
+                                  f'distinct_inputs={inputs} per_cell={per_cell_time:.3f}s dedup={dedup_time:.3f}s '
+                                  f'speedup={per_cell_time / dedup_time:.1f}x')
+
+    def _grid(self, cells, distinct, customs_share):
+        def amount(low, high, places=4):
+            return Decimal(random.randint(low * 10 ** places, high * 10 ** places)).scaleb(-places)
+
+        pool = [(amount(200, 5000), random.choice(CURRENCIES), amount(1, 2)) for _ in range(distinct)]
+
+        catalogue = [
+            (CustomCostMode.FIXED, CustomCostAppliesTo.PER_PAX),
+            (CustomCostMode.FIXED, CustomCostAppliesTo.PER_CABIN),
+            (CustomCostMode.PERCENT, CustomCostAppliesTo.PER_PAX),
+            (CustomCostMode.PERCENT, CustomCostAppliesTo.PER_CABIN),
+        ]
+
+        costs = []
+        customs = []
+        for _ in range(cells):
+            costs.append(random.choice(pool) if random.random() > 0.02 else None)
+
+            cell_customs = None
+            if random.random() < customs_share:
+                cell_customs = []
+                for mode, applies_to in random.sample(catalogue, random.randint(1, len(catalogue))):
+                    fixed = mode == CustomCostMode.FIXED
+                    cell_customs.append((amount(5, 300) if fixed else None, None if fixed else amount(0, 1),
+                                         random.choice(CURRENCIES), mode, applies_to))
+            customs.append(cell_customs)
+
+        return costs, customs
@@ -0,0 +1,144 @@
+import json
+import random
+import time
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max
+from django.test.utils import CaptureQueriesContext
+from ninja.responses import NinjaJSONEncoder
+
+from catalogs.models import CabinCategory
+from common.enums import CustomCostMode, CustomCostAppliesTo
+from pricing.models import SeasonShipCost, CabinCostOverride, CustomCost, ShipCustomCost, CabinCostCustom
+from pricing.schemas import FXMode, Occupancy, PricingGraphOut, PricingGraphColumnsOut
+from pricing.services.engine import build_pricing_graph, build_pricing_graph_columns
+from seasons_sailings.models import Season, SeasonShip, Sailing
+from ships_cabins.models import Ship, Cabin
+
+DECKS = [str(deck) for deck in range(2, 14)]
+
+
+class Command(BaseCommand):
+    help = ('Seeds a synthetic fleet inside a rolled back transaction and benchmarks the pricing graph engine and '
+            'its JSON and columnar renderings. Fails if the number of queries grows with the number of cabins.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cabins', type=int, nargs='+', default=[200, 2000],
+                            help='Cabin counts to benchmark (one ship is seeded per count)')
+        parser.add_argument('--sailings', type=int, default=40, help='Sailings per ship')
+        parser.add_argument('--budget', type=float, default=None,
+                            help='Optional time budget in seconds for the largest scope')
+
+    def handle(self, *args, **options):
+        random.seed(42)
+        results = []
+
+        with transaction.atomic():
+            season = self._seed_season(options['sailings'])
+            categories = self._seed_categories()
+
+            for cabins in options['cabins']:
+                ship = self._seed_ship(season, categories, cabins, options['sailings'])
+
+                with CaptureQueriesContext(connection) as ctx:
+                    start = time.perf_counter()
+                    graph = build_pricing_graph(season.id, ship.id, None, FXMode.MANUAL, Occupancy.DOUBLE)
+                    elapsed = time.perf_counter() - start
+
+                results.append((cabins, len(graph['cells']), len(ctx.captured_queries), elapsed))
+                self.stdout.write(f'cabins={cabins} cells={len(graph["cells"])} '
+                                  f'queries={len(ctx.captured_queries)} time={elapsed:.3f}s')
+
+                columns = build_pricing_graph_columns(season.id, ship.id, None, FXMode.MANUAL, Occupancy.DOUBLE)
+                for name, schema, data in [('json', PricingGraphOut, graph),
+                                           ('columns', PricingGraphColumnsOut, columns)]:
+                    start = time.perf_counter()
+                    content = json.dumps(schema.model_validate(data).model_dump(), cls=NinjaJSONEncoder)
+                    self.stdout.write(f'  format={name} bytes={len(content)} '
+                                      f'render={time.perf_counter() - start:.3f}s')
+
+            transaction.set_rollback(True)
+
+        query_counts = {queries for _, _, queries, _ in results}
+        if len(query_counts) != 1:
+            raise CommandError(f'Query count is not constant across scope sizes: {sorted(query_counts)}')
+
+        slowest = results[-1][3]
+        if options['budget'] is not None and slowest > options['budget']:
+            raise CommandError(f'Largest scope took {slowest:.3f}s, over the {options["budget"]}s budget')
+
+        self.stdout.write(self.style.SUCCESS('Query count is constant across scope sizes'))
+
+    def _seed_season(self, sailings):
+        # Seasons may not overlap, so the benchmark season starts after the last existing one
+        last_end = Season.objects.aggregate(last=Max('end_date'))['last']
+        start = (last_end or date(2100, 1, 1)) + timedelta(days=1)
+
+        return Season.objects.create(
+            name=f'bench-{start.isoformat()}',
+            start_date=start,
+            end_date=start + timedelta(days=7 * sailings),
+            default_margin_b2b=Decimal('0.1500'),
+            default_margin_b2c=Decimal('0.3000'),
+        )
+
+    def _seed_categories(self):
+        categories = list(CabinCategory.objects.order_by('sort_order'))
+        if not categories:
+            categories = [CabinCategory.objects.create(name=name, sort_order=order)
+                          for order, name in enumerate(['Inside', 'Oceanview', 'Balcony', 'Suite'], start=1)]
+        return categories
+
+    def _seed_ship(self, season, categories, cabins, sailings):
+        ship = Ship.objects.create(name=f'bench-ship-{cabins}-{season.name}')
+        SeasonShip.objects.create(season=season, ship=ship)
+
+        cabin_objs = Cabin.objects.bulk_create([
+            Cabin(id=uuid.uuid4(), name=f'Cabin {number}', number=str(number), deck=random.choice(DECKS),
+                  category=random.choice(categories), ship=ship)
+            for number in range(1000, 1000 + cabins)
+        ])
+
+        sailing_objs = Sailing.objects.bulk_create([
+            Sailing(id=uuid.uuid4(), season=season, ship=ship,
+                    departure_date=season.start_date + timedelta(days=7 * week), nights=7)
+            for week in range(sailings)
+        ])
+
+        # Category defaults for every category plus deck-specific costs for half of the decks
+        costs = [SeasonShipCost(season=season, ship=ship, category=category, deck=None,
+                                base_per_pax=Decimal(random.randint(500, 3000)), currency='USD')
+                 for category in categories]
+        costs += [SeasonShipCost(season=season, ship=ship, category=category, deck=deck,
+                                 base_per_pax=Decimal(random.randint(500, 3000)), currency='USD')
+                  for category in categories for deck in DECKS[::2]]
+        SeasonShipCost.objects.bulk_create(costs)
+
+        # ~5% of the cells are overridden, ~10% carry custom costs
+        cells = [(sailing, cabin) for sailing in sailing_objs for cabin in cabin_objs]
+        CabinCostOverride.objects.bulk_create([
+            CabinCostOverride(sailing=sailing, cabin=cabin, base_per_pax=Decimal(random.randint(500, 3000)),
+                              currency='USD')
+            for sailing, cabin in random.sample(cells, len(cells) // 20)
+        ])
+
+        port_fee = CustomCost.objects.create(key=f'{ship.name}-port-fee', label='Port fee',
+                                             mode=CustomCostMode.FIXED, applies_to=CustomCostAppliesTo.PER_PAX)
+        service = CustomCost.objects.create(key=f'{ship.name}-service', label='Service charge',
+                                            mode=CustomCostMode.PERCENT, applies_to=CustomCostAppliesTo.PER_CABIN)
+        ShipCustomCost.objects.bulk_create([ShipCustomCost(ship=ship, custom_cost=port_fee),
+                                            ShipCustomCost(ship=ship, custom_cost=service)])
+
+        customs = []
+        for sailing, cabin in random.sample(cells, len(cells) // 10):
+            customs.append(CabinCostCustom(sailing=sailing, cabin=cabin, custom_cost=port_fee,
+                                           value=Decimal('85.0000'), currency='USD'))
+            customs.append(CabinCostCustom(sailing=sailing, cabin=cabin, custom_cost=service,
+                                           percent=Decimal('0.0500'), currency='USD'))
+        CabinCostCustom.objects.bulk_create(customs)
+
+        return ship
@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from pricing.services.projection import refresh_effective_prices
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the effective_prices projection for the given sailings (or every sailing).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sailing', dest='sailing_ids', action='append', default=None,
+                            help='Sailing ID to refresh (repeatable), every sailing is refreshed if omitted')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        cells = refresh_effective_prices(options['sailing_ids'])
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(self.style.SUCCESS(f'Refreshed {cells} cells in {elapsed:.3f}s'))
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-17 02:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pricing', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='cabincostcustom',
+            name='percent',
+            field=models.DecimalField(decimal_places=4, max_digits=6, null=True),
+        ),
+        migrations.AlterField(
+            model_name='cabincostcustom',
+            name='value',
+            field=models.DecimalField(decimal_places=4, max_digits=12, null=True),
+        ),
+    ]
@@ -0,0 +1,211 @@
+# Generated by Django 5.2.6 on 2026-10-17 03:07
+
+import common.functions
+import django.db.models.deletion
+import pgtrigger.compiler
+import pgtrigger.migrations
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pricing', '0002_alter_cabincostcustom_percent_and_more'),
+        ('seasons_sailings', '0002_sailing_trg_sailings_effective_prices_and_more'),
+        ('ships_cabins', '0002_cabin_trg_cabins_effective_prices_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EffectivePrice',
+            fields=[
+                ('source', models.TextField(choices=[('default', 'Default'), ('override', 'Override')], null=True)),
+                ('currency', models.CharField(max_length=3, null=True)),
+                ('cos_double', models.DecimalField(decimal_places=2, max_digits=14, null=True)),
+                ('b2b_double', models.DecimalField(decimal_places=2, max_digits=14, null=True)),
+                ('b2c_double', models.DecimalField(decimal_places=2, max_digits=14, null=True)),
+                ('cos_single', models.DecimalField(decimal_places=2, max_digits=14, null=True)),
+                ('b2b_single', models.DecimalField(decimal_places=2, max_digits=14, null=True)),
+                ('b2c_single', models.DecimalField(decimal_places=2, max_digits=14, null=True)),
+                ('has_custom_costs', models.BooleanField(db_default=False)),
+                ('refreshed_at', models.DateTimeField(db_default=common.functions.TxNow())),
+                ('cabin', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='ships_cabins.cabin')),
+                ('sailing', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='seasons_sailings.sailing')),
+                ('pk', models.CompositePrimaryKey('sailing_id', 'cabin_id', blank=True, editable=False, primary_key=True, serialize=False)),
+            ],
+            options={
+                'db_table': 'effective_prices',
+            },
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='cabincostcustom',
+            trigger=pgtrigger.compiler.Trigger(name='trg_cabin_cost_customs_effective_prices_ins', sql=pgtrigger.compiler.UpsertTriggerSql(func='\n            BEGIN\n                PERFORM refresh_effective_prices(array_agg(changed.sailing_id), array_agg(changed.cabin_id))\n                FROM (SELECT * FROM new_values) AS changed;\n                RETURN NULL;\n            END;\n            ', hash='3c51c769d3f8cd881aba8c1ef43917b7c50f40c8', level='STATEMENT', operation='INSERT', pgid='pgtrigger_trg_cabin_cost_customs_effective_prices_ins_625f6', referencing='REFERENCING NEW TABLE AS new_values ', table='cabin_cost_customs', when='AFTER')),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='cabincostcustom',
+            trigger=pgtrigger.compiler.Trigger(name='trg_cabin_cost_customs_effective_prices_upd', sql=pgtrigger.compiler.UpsertTriggerSql(func='\n            BEGIN\n                PERFORM refresh_effective_prices(array_agg(changed.sailing_id), array_agg(changed.cabin_id))\n                FROM (SELECT * FROM new_values UNION ALL SELECT * FROM old_values) AS changed;\n                RETURN NULL;\n            END;\n            ', hash='ab205a703e280a404dbf4ad5f9f9a345dbb47944', level='STATEMENT', operation='UPDATE', pgid='pgtrigger_trg_cabin_cost_customs_effective_prices_upd_9e6bd', referencing='REFERENCING OLD TABLE AS old_values  NEW TABLE AS new_values ', table='cabin_cost_customs', when='AFTER')),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='cabincostcustom',
+            trigger=pgtrigger.compiler.Trigger(name='trg_cabin_cost_customs_effective_prices_del', sql=pgtrigger.compiler.UpsertTriggerSql(func='\n            BEGIN\n                PERFORM refresh_effective_prices(array_agg(changed.sailing_id), array_agg(changed.cabin_id))\n                FROM (SELECT * FROM old_values) AS changed;\n                RETURN NULL;\n            END;\n            ', hash='cdf63142ff3f9419d257df2b66f7b3e6bdcda83f', level='STATEMENT', operation='DELETE', pgid='pgtrigger_trg_cabin_cost_customs_effective_prices_del_92d1e', referencing='REFERENCING OLD TABLE AS old_values ', table='cabin_cost_customs', when='AFTER')),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='cabincostoverride',
+            trigger=pgtrigger.compiler.Trigger(name='trg_cabin_cost_ovr_effective_prices_ins', sql=pgtrigger.compiler.UpsertTriggerSql(func='\n            BEGIN\n                PERFORM refresh_effective_prices(array_agg(changed.sailing_id), array_agg(changed.cabin_id))\n                FROM (SELECT * FROM new_values) AS changed;\n                RETURN NULL;\n            END;\n            ', hash='1abeea6e423db5066b55e797b6f74ec37fa4df10', level='STATEMENT', operation='INSERT', pgid='pgtrigger_trg_cabin_cost_ovr_effective_prices_ins_475c9', referencing='REFERENCING NEW TABLE AS new_values ', table='cabin_cost_overrides', when='AFTER')),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='cabincostoverride',
+            trigger=pgtrigger.compiler.Trigger(name='trg_cabin_cost_ovr_effective_prices_upd', sql=pgtrigger.compiler.UpsertTriggerSql(func='\n            BEGIN\n                PERFORM refresh_effective_prices(array_agg(changed.sailing_id), array_agg(changed.cabin_id))\n                FROM (SELECT * FROM new_values UNION ALL SELECT * FROM old_values) AS changed;\n                RETURN NULL;\n            END;\n            ', hash='f4a1b68e16b0dc132eefceb662088d4d41a9f701', level='STATEMENT', operation='UPDATE', pgid='pgtrigger_trg_cabin_cost_ovr_effective_prices_upd_fccf7', referencing='REFERENCING OLD TABLE AS old_values  NEW TABLE AS new_values ', table='cabin_cost_overrides', when='AFTER')),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='cabincostoverride',
+            trigger=pgtrigger.compiler.Trigger(name='trg_cabin_cost_ovr_effective_prices_del', sql=pgtrigger.compiler.UpsertTriggerSql(func='\n            BEGIN\n                PERFORM refresh_effective_prices(array_agg(changed.sailing_id), array_agg(changed.cabin_id))\n                FROM (SELECT * FROM old_values) AS changed;\n                RETURN NULL;\n            END;\n            ', hash='16331fbde5afcb2a6436b122b503f325b4eb0f8b', level='STATEMENT', operation='DELETE', pgid='pgtrigger_trg_cabin_cost_ovr_effective_prices_del_60d7f', referencing='REFERENCING OLD TABLE AS old_values ', table='cabin_cost_overrides', when='AFTER')),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='customcost',
+            trigger=pgtrigger.compiler.Trigger(name='trg_custom_costs_effective_prices', sql=pgtrigger.compiler.UpsertTriggerSql(condition='WHEN (OLD."applies_to" IS DISTINCT FROM (NEW."applies_to") OR OLD."is_active" IS DISTINCT FROM (NEW."is_active") OR OLD."mode" IS DISTINCT FROM (NEW."mode"))', func='\n            BEGIN\n                PERFORM refresh_effective_prices(array_agg(ccc.sailing_id), array_agg(ccc.cabin_id))\n                FROM cabin_cost_customs ccc\n                WHERE ccc.custom_cost_id = NEW.id;\n                RETURN NULL;\n            END;\n            ', hash='363ac31622eeb36022aba4d9b6a4b490416d3511', operation='UPDATE', pgid='pgtrigger_trg_custom_costs_effective_prices_1f9ed', table='custom_costs', when='AFTER')),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='seasonshipcost',
+            trigger=pgtrigger.compiler.Trigger(name='trg_ssc_effective_prices_ins', sql=pgtrigger.compiler.UpsertTriggerSql(func='\n            BEGIN\n                PERFORM refresh_effective_prices(array_agg(s.id), array_agg(cb.id))\n                FROM (SELECT DISTINCT season_id, ship_id, category_id FROM (SELECT * FROM new_values) AS c) AS changed\n                JOIN sailings s ON s.season_id = changed.season_id AND s.ship_id = changed.ship_id\n                JOIN cabins cb ON cb.ship_id = changed.ship_id AND cb.category_id = changed.category_id;\n                RETURN NULL;\n            END;\n            ', hash='a2d3f384ec804a0ab27eb5771e91540c0969fb34', level='STATEMENT', operation='INSERT', pgid='pgtrigger_trg_ssc_effective_prices_ins_c24be', referencing='REFERENCING NEW TABLE AS new_values ', table='season_ship_costs', when='AFTER')),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='seasonshipcost',
+            trigger=pgtrigger.compiler.Trigger(name='trg_ssc_effective_prices_upd', sql=pgtrigger.compiler.UpsertTriggerSql(func='\n            BEGIN\n                PERFORM refresh_effective_prices(array_agg(s.id), array_agg(cb.id))\n                FROM (SELECT DISTINCT season_id, ship_id, category_id FROM (SELECT * FROM new_values UNION ALL SELECT * FROM old_values) AS c) AS changed\n                JOIN sailings s ON s.season_id = changed.season_id AND s.ship_id = changed.ship_id\n                JOIN cabins cb ON cb.ship_id = changed.ship_id AND cb.category_id = changed.category_id;\n                RETURN NULL;\n            END;\n            ', hash='559a2d8b1efd0dfa16224818632acf341ca79814', level='STATEMENT', operation='UPDATE', pgid='pgtrigger_trg_ssc_effective_prices_upd_7d6cf', referencing='REFERENCING OLD TABLE AS old_values  NEW TABLE AS new_values ', table='season_ship_costs', when='AFTER')),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='seasonshipcost',
+            trigger=pgtrigger.compiler.Trigger(name='trg_ssc_effective_prices_del', sql=pgtrigger.compiler.UpsertTriggerSql(func='\n            BEGIN\n                PERFORM refresh_effective_prices(array_agg(s.id), array_agg(cb.id))\n                FROM (SELECT DISTINCT season_id, ship_id, category_id FROM (SELECT * FROM old_values) AS c) AS changed\n                JOIN sailings s ON s.season_id = changed.season_id AND s.ship_id = changed.ship_id\n                JOIN cabins cb ON cb.ship_id = changed.ship_id AND cb.category_id = changed.category_id;\n                RETURN NULL;\n            END;\n            ', hash='1c4f60e16a3f06cad01d26e7e0fc43b432b9441d', level='STATEMENT', operation='DELETE', pgid='pgtrigger_trg_ssc_effective_prices_del_adffa', referencing='REFERENCING OLD TABLE AS old_values ', table='season_ship_costs', when='AFTER')),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='shipcustomcost',
+            trigger=pgtrigger.compiler.Trigger(name='trg_ship_custom_costs_effective_prices_ins', sql=pgtrigger.compiler.UpsertTriggerSql(func='\n            BEGIN\n                PERFORM refresh_effective_prices(array_agg(ccc.sailing_id), array_agg(ccc.cabin_id))\n                FROM cabin_cost_customs ccc\n                JOIN sailings s ON s.id = ccc.sailing_id\n                JOIN (SELECT * FROM new_values) AS changed ON changed.ship_id = s.ship_id AND changed.custom_cost_id = ccc.custom_cost_id;\n                RETURN NULL;\n            END;\n            ', hash='c794e0f493bbc3c25dc1c6174abfd24949e7fb06', level='STATEMENT', operation='INSERT', pgid='pgtrigger_trg_ship_custom_costs_effective_prices_ins_8a6c9', referencing='REFERENCING NEW TABLE AS new_values ', table='ship_custom_costs', when='AFTER')),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='shipcustomcost',
+            trigger=pgtrigger.compiler.Trigger(name='trg_ship_custom_costs_effective_prices_del', sql=pgtrigger.compiler.UpsertTriggerSql(func='\n            BEGIN\n                PERFORM refresh_effective_prices(array_agg(ccc.sailing_id), array_agg(ccc.cabin_id))\n                FROM cabin_cost_customs ccc\n                JOIN sailings s ON s.id = ccc.sailing_id\n                JOIN (SELECT * FROM old_values) AS changed ON changed.ship_id = s.ship_id AND changed.custom_cost_id = ccc.custom_cost_id;\n                RETURN NULL;\n            END;\n            ', hash='a7551b245f14ba25518d887f5ca41403d82942a1', level='STATEMENT', operation='DELETE', pgid='pgtrigger_trg_ship_custom_costs_effective_prices_del_2f99c', referencing='REFERENCING OLD TABLE AS old_values ', table='ship_custom_costs', when='AFTER')),
+        ),
+        migrations.AddIndex(
+            model_name='effectiveprice',
+            index=models.Index(fields=['cabin'], name='idx_effective_prices_cabin'),
+        ),
+        migrations.AddConstraint(
+            model_name='effectiveprice',
+            constraint=models.CheckConstraint(condition=models.Q(('source__in', ['default', 'override'])), name='effective_prices_source_check'),
+        ),
+        migrations.RunSQL(     # -- re-resolves the given (sailing, cabin) cells into effective_prices
+            """
+            CREATE OR REPLACE FUNCTION refresh_effective_prices(p_sailings uuid[], p_cabins uuid[])
+            RETURNS void
+            LANGUAGE plpgsql
+            AS $$
+            BEGIN
+                IF p_sailings IS NULL OR cardinality(p_sailings) = 0 THEN
+                    RETURN;
+                END IF;
+
+                WITH cells AS (
+                    SELECT DISTINCT c.sailing_id, c.cabin_id
+                    FROM unnest(p_sailings, p_cabins) AS c(sailing_id, cabin_id)
+                ),
+                costs AS (
+                    -- Cost hierarchy: override > season cost for (category, deck) > season cost for the category
+                    SELECT cells.sailing_id, cells.cabin_id, s.season_id, s.ship_id,
+                           COALESCE(o.base_per_pax, d.base_per_pax) AS bpp,
+                           COALESCE(o.currency, d.currency) AS currency,
+                           COALESCE(o.single_multiplier, d.single_multiplier) AS mult,
+                           CASE WHEN o.id IS NOT NULL THEN 'override' WHEN d.id IS NOT NULL THEN 'default' END AS source
+                    FROM cells
+                    JOIN sailings s ON s.id = cells.sailing_id
+                    JOIN cabins cb ON cb.id = cells.cabin_id AND cb.ship_id = s.ship_id
+                    LEFT JOIN cabin_cost_overrides o ON o.sailing_id = cells.sailing_id AND o.cabin_id = cells.cabin_id
+                    LEFT JOIN LATERAL (
+                        SELECT ssc.id, ssc.base_per_pax, ssc.currency, ssc.single_multiplier
+                        FROM season_ship_costs ssc
+                        WHERE o.id IS NULL
+                          AND ssc.season_id = s.season_id AND ssc.ship_id = s.ship_id
+                          AND ssc.category_id = cb.category_id AND (ssc.deck = cb.deck OR ssc.deck IS NULL)
+                        ORDER BY ssc.deck IS NULL, ssc.created_at DESC, ssc.id DESC
+                        LIMIT 1
+                    ) d ON TRUE
+                )
+                INSERT INTO effective_prices AS ep (sailing_id, cabin_id, source, currency,
+                                                    cos_double, b2b_double, b2c_double,
+                                                    cos_single, b2b_single, b2c_single,
+                                                    has_custom_costs, refreshed_at)
+                SELECT costs.sailing_id, costs.cabin_id, costs.source, costs.currency,
+                       round(p.cos_double, 2),
+                       round(p.cos_double * (1 + se.default_margin_b2b), 2),
+                       round(p.cos_double * (1 + se.default_margin_b2c), 2),
+                       round(p.cos_single, 2),
+                       round(p.cos_single * (1 + se.default_margin_b2b), 2),
+                       round(p.cos_single * (1 + se.default_margin_b2c), 2),
+                       cu.customs_count > 0, NOW()
+                FROM costs
+                JOIN seasons se ON se.id = costs.season_id
+                CROSS JOIN LATERAL (
+                    -- Fixed amounts are converted to the cost currency with manual rates (direct or inverse pair)
+                    SELECT count(*) AS customs_count,
+                           COALESCE(SUM(COALESCE(ccc.value, 0) * r.rate)
+                                    FILTER (WHERE cc.mode = 'fixed' AND cc.applies_to = 'per_cabin'), 0) AS fixed_cabin,
+                           COALESCE(SUM(COALESCE(ccc.value, 0) * r.rate)
+                                    FILTER (WHERE cc.mode = 'fixed' AND cc.applies_to = 'per_pax'), 0) AS fixed_pax,
+                           COALESCE(SUM(COALESCE(ccc.percent, 0))
+                                    FILTER (WHERE cc.mode = 'percent' AND cc.applies_to = 'per_cabin'), 0) AS pct_cabin,
+                           COALESCE(SUM(COALESCE(ccc.percent, 0))
+                                    FILTER (WHERE cc.mode = 'percent' AND cc.applies_to = 'per_pax'), 0) AS pct_pax,
+                           COALESCE(bool_or(cc.mode = 'fixed' AND r.rate IS NULL), FALSE) AS missing_rate
+                    FROM cabin_cost_customs ccc
+                    JOIN custom_costs cc ON cc.id = ccc.custom_cost_id AND cc.is_active
+                    JOIN ship_custom_costs scc ON scc.custom_cost_id = cc.id AND scc.ship_id = costs.ship_id
+                    CROSS JOIN LATERAL (
+                        SELECT CASE
+                            WHEN ccc.currency = costs.currency THEN 1::numeric
+                            ELSE COALESCE(
+                                (SELECT m.rate FROM exchange_rates_manual m
+                                 WHERE m.base = ccc.currency AND m.quote = costs.currency),
+                                (SELECT 1 / m.rate FROM exchange_rates_manual m
+                                 WHERE m.base = costs.currency AND m.quote = ccc.currency)
+                            )
+                        END AS rate
+                    ) r
+                    WHERE ccc.sailing_id = costs.sailing_id AND ccc.cabin_id = costs.cabin_id
+                ) cu
+                CROSS JOIN LATERAL (
+                    SELECT
+                        CASE WHEN NOT cu.missing_rate THEN
+                            costs.bpp * 2 * (1 + cu.pct_cabin) + costs.bpp * 2 * cu.pct_pax
+                            + cu.fixed_cabin + cu.fixed_pax * 2
+                        END AS cos_double,
+                        CASE WHEN NOT cu.missing_rate THEN
+                            costs.bpp * costs.mult * (1 + cu.pct_cabin) + costs.bpp * cu.pct_pax
+                            + cu.fixed_cabin + cu.fixed_pax
+                        END AS cos_single
+                ) p
+                ON CONFLICT (sailing_id, cabin_id) DO UPDATE SET
+                    source = EXCLUDED.source,
+                    currency = EXCLUDED.currency,
+                    cos_double = EXCLUDED.cos_double,
+                    b2b_double = EXCLUDED.b2b_double,
+                    b2c_double = EXCLUDED.b2c_double,
+                    cos_single = EXCLUDED.cos_single,
+                    b2b_single = EXCLUDED.b2b_single,
+                    b2c_single = EXCLUDED.b2c_single,
+                    has_custom_costs = EXCLUDED.has_custom_costs,
+                    refreshed_at = EXCLUDED.refreshed_at;
+            END;
+            $$;
+            """,
+            reverse_sql="""
+            DROP FUNCTION IF EXISTS refresh_effective_prices(uuid[], uuid[]);
+            """
+        ),
+        migrations.RunSQL(     # -- backfill every existing cell
+            """
+            SELECT refresh_effective_prices(array_agg(s.id), array_agg(cb.id))
+            FROM sailings s
+            JOIN cabins cb ON cb.ship_id = s.ship_id;
+            """,
+            reverse_sql=migrations.RunSQL.noop
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.6 on 2026-10-17 03:48
+
+import common.functions
+import django.contrib.postgres.functions
+import pgtrigger.compiler
+import pgtrigger.migrations
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pricing', '0003_effectiveprice_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SeasonShipCostVersion',
+            fields=[
+                ('season_id', models.UUIDField()),
+                ('ship_id', models.UUIDField()),
+                ('stamp', models.UUIDField(db_default=django.contrib.postgres.functions.RandomUUID())),
+                ('updated_at', models.DateTimeField(db_default=common.functions.TxNow())),
+                ('pk', models.CompositePrimaryKey('season_id', 'ship_id', blank=True, editable=False, primary_key=True, serialize=False)),
+            ],
+            options={
+                'db_table': 'season_ship_cost_versions',
+            },
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='seasonshipcost',
+            trigger=pgtrigger.compiler.Trigger(name='trg_ssc_version_ins', sql=pgtrigger.compiler.UpsertTriggerSql(func='\n            BEGIN\n                INSERT INTO season_ship_cost_versions (season_id, ship_id, stamp, updated_at)\n                SELECT changed.season_id, changed.ship_id, gen_random_uuid(), NOW()\n                FROM (SELECT DISTINCT season_id, ship_id FROM (SELECT * FROM new_values) AS c) AS changed\n                ON CONFLICT (season_id, ship_id) DO UPDATE SET stamp = EXCLUDED.stamp, updated_at = EXCLUDED.updated_at;\n                RETURN NULL;\n            END;\n            ', hash='620e22d094a242f58651a19db39c2e352021d628', level='STATEMENT', operation='INSERT', pgid='pgtrigger_trg_ssc_version_ins_8a883', referencing='REFERENCING NEW TABLE AS new_values ', table='season_ship_costs', when='AFTER')),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='seasonshipcost',
+            trigger=pgtrigger.compiler.Trigger(name='trg_ssc_version_upd', sql=pgtrigger.compiler.UpsertTriggerSql(func='\n            BEGIN\n                INSERT INTO season_ship_cost_versions (season_id, ship_id, stamp, updated_at)\n                SELECT changed.season_id, changed.ship_id, gen_random_uuid(), NOW()\n                FROM (SELECT DISTINCT season_id, ship_id FROM (SELECT * FROM new_values UNION ALL SELECT * FROM old_values) AS c) AS changed\n                ON CONFLICT (season_id, ship_id) DO UPDATE SET stamp = EXCLUDED.stamp, updated_at = EXCLUDED.updated_at;\n                RETURN NULL;\n            END;\n            ', hash='89bf86045714a14ea88fa68a696aa7cfba1db9a8', level='STATEMENT', operation='UPDATE', pgid='pgtrigger_trg_ssc_version_upd_8350d', referencing='REFERENCING OLD TABLE AS old_values  NEW TABLE AS new_values ', table='season_ship_costs', when='AFTER')),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='seasonshipcost',
+            trigger=pgtrigger.compiler.Trigger(name='trg_ssc_version_del', sql=pgtrigger.compiler.UpsertTriggerSql(func='\n            BEGIN\n                INSERT INTO season_ship_cost_versions (season_id, ship_id, stamp, updated_at)\n                SELECT changed.season_id, changed.ship_id, gen_random_uuid(), NOW()\n                FROM (SELECT DISTINCT season_id, ship_id FROM (SELECT * FROM old_values) AS c) AS changed\n                ON CONFLICT (season_id, ship_id) DO UPDATE SET stamp = EXCLUDED.stamp, updated_at = EXCLUDED.updated_at;\n                RETURN NULL;\n            END;\n            ', hash='87e642229b6f4da16b029bcad7119534b30c9aad', level='STATEMENT', operation='DELETE', pgid='pgtrigger_trg_ssc_version_del_96109', referencing='REFERENCING OLD TABLE AS old_values ', table='season_ship_costs', when='AFTER')),
+        ),
+        migrations.RunSQL(     # -- stamp the season costs existing before the trigger
+            """
+            INSERT INTO season_ship_cost_versions (season_id, ship_id)
+            SELECT DISTINCT season_id, ship_id FROM season_ship_costs
+            ON CONFLICT DO NOTHING;
+            """,
+            reverse_sql=migrations.RunSQL.noop
+        ),
+    ]
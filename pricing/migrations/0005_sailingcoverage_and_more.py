@@ -0,0 +1,105 @@
+# Generated by Django 5.2.6 on 2026-10-17 03:57
+
+import common.functions
+import django.db.models.deletion
+import pgtrigger.compiler
+import pgtrigger.migrations
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pricing', '0004_seasonshipcostversion_and_more'),
+        ('seasons_sailings', '0002_sailing_trg_sailings_effective_prices_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SailingCoverage',
+            fields=[
+                ('cabins_total', models.IntegerField(db_default=0)),
+                ('priced', models.IntegerField(db_default=0)),
+                ('unpriced', models.IntegerField(db_default=0)),
+                ('overridden', models.IntegerField(db_default=0)),
+                ('archived', models.IntegerField(db_default=0)),
+                ('refreshed_at', models.DateTimeField(db_default=common.functions.TxNow())),
+                ('sailing', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='+', serialize=False, to='seasons_sailings.sailing')),
+            ],
+            options={
+                'db_table': 'sailing_coverage',
+            },
+        ),
+        migrations.RunSQL(     # -- recounts the coverage counters of the given sailings from effective_prices
+            """
+            CREATE OR REPLACE FUNCTION refresh_sailing_coverage(p_sailings uuid[])
+            RETURNS void
+            LANGUAGE plpgsql
+            AS $$
+            BEGIN
+                IF p_sailings IS NULL OR cardinality(p_sailings) = 0 THEN
+                    RETURN;
+                END IF;
+
+                -- Counters are locked (created if missing) before counting, so concurrent refreshes of a sailing are
+                -- serialized and the last one counts the cells committed by the others
+                INSERT INTO sailing_coverage (sailing_id)
+                SELECT DISTINCT sailing_id FROM unnest(p_sailings) AS sailing_id ORDER BY 1
+                ON CONFLICT (sailing_id) DO NOTHING;
+
+                PERFORM 1 FROM sailing_coverage
+                WHERE sailing_id = ANY(p_sailings)
+                ORDER BY sailing_id
+                FOR UPDATE;
+
+                -- Same precedence as the pricing graph: archived, then unpriced, then overridden, otherwise priced
+                UPDATE sailing_coverage sc
+                SET cabins_total = counts.cabins_total,
+                    priced = counts.priced,
+                    unpriced = counts.unpriced,
+                    overridden = counts.overridden,
+                    archived = counts.archived,
+                    refreshed_at = NOW()
+                FROM (SELECT DISTINCT sailing_id FROM unnest(p_sailings) AS sailing_id) AS affected
+                CROSS JOIN LATERAL (
+                    SELECT count(*) AS cabins_total,
+                           count(*) FILTER (WHERE NOT cb.is_archived AND ep.source = 'default') AS priced,
+                           count(*) FILTER (WHERE NOT cb.is_archived AND ep.source IS NULL) AS unpriced,
+                           count(*) FILTER (WHERE NOT cb.is_archived AND ep.source = 'override') AS overridden,
+                           count(*) FILTER (WHERE cb.is_archived) AS archived
+                    FROM effective_prices ep
+                    JOIN cabins cb ON cb.id = ep.cabin_id
+                    WHERE ep.sailing_id = affected.sailing_id
+                ) AS counts
+                WHERE sc.sailing_id = affected.sailing_id
+                  AND (sc.cabins_total, sc.priced, sc.unpriced, sc.overridden, sc.archived)
+                      IS DISTINCT FROM (counts.cabins_total, counts.priced, counts.unpriced, counts.overridden,
+                                        counts.archived);
+
+                DELETE FROM sailing_coverage WHERE sailing_id = ANY(p_sailings) AND cabins_total = 0;
+            END;
+            $$;
+            """,
+            reverse_sql="""
+            DROP FUNCTION IF EXISTS refresh_sailing_coverage(uuid[]);
+            """
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='effectiveprice',
+            trigger=pgtrigger.compiler.Trigger(name='trg_effective_prices_coverage_ins', sql=pgtrigger.compiler.UpsertTriggerSql(func='\n            BEGIN\n                PERFORM refresh_sailing_coverage(array_agg(DISTINCT changed.sailing_id))\n                FROM (SELECT * FROM new_values) AS changed;\n                RETURN NULL;\n            END;\n            ', hash='a7251f8fc7b25d4ef321f15e8db01ddf5a132b7b', level='STATEMENT', operation='INSERT', pgid='pgtrigger_trg_effective_prices_coverage_ins_3ce90', referencing='REFERENCING NEW TABLE AS new_values ', table='effective_prices', when='AFTER')),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='effectiveprice',
+            trigger=pgtrigger.compiler.Trigger(name='trg_effective_prices_coverage_upd', sql=pgtrigger.compiler.UpsertTriggerSql(func='\n            BEGIN\n                PERFORM refresh_sailing_coverage(array_agg(DISTINCT changed.sailing_id))\n                FROM (SELECT * FROM new_values UNION ALL SELECT * FROM old_values) AS changed;\n                RETURN NULL;\n            END;\n            ', hash='8b40053d7961158bf2ba5e624b4ea2e72a05c9ce', level='STATEMENT', operation='UPDATE', pgid='pgtrigger_trg_effective_prices_coverage_upd_084cf', referencing='REFERENCING OLD TABLE AS old_values  NEW TABLE AS new_values ', table='effective_prices', when='AFTER')),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='effectiveprice',
+            trigger=pgtrigger.compiler.Trigger(name='trg_effective_prices_coverage_del', sql=pgtrigger.compiler.UpsertTriggerSql(func='\n            BEGIN\n                PERFORM refresh_sailing_coverage(array_agg(DISTINCT changed.sailing_id))\n                FROM (SELECT * FROM old_values) AS changed;\n                RETURN NULL;\n            END;\n            ', hash='d0e95fee5cfdc3595a8c3b80d2b0334bd7961f4e', level='STATEMENT', operation='DELETE', pgid='pgtrigger_trg_effective_prices_coverage_del_7842d', referencing='REFERENCING OLD TABLE AS old_values ', table='effective_prices', when='AFTER')),
+        ),
+        migrations.RunSQL(     # -- backfill the counters of every sailing
+            """
+            SELECT refresh_sailing_coverage(array_agg(id)) FROM sailings;
+            """,
+            reverse_sql=migrations.RunSQL.noop
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.6 on 2026-10-17 04:00
+
+import common.functions
+import django.contrib.postgres.functions
+import pgtrigger.compiler
+import pgtrigger.migrations
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pricing', '0005_sailingcoverage_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PricingVersion',
+            fields=[
+                ('key', models.TextField(primary_key=True, serialize=False)),
+                ('stamp', models.UUIDField(db_default=django.contrib.postgres.functions.RandomUUID())),
+                ('updated_at', models.DateTimeField(db_default=common.functions.TxNow())),
+            ],
+            options={
+                'db_table': 'pricing_versions',
+            },
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='cabincostcustom',
+            trigger=pgtrigger.compiler.Trigger(name='trg_cabin_cost_customs_pricing_versions_ins', sql=pgtrigger.compiler.UpsertTriggerSql(func="\n            BEGIN\n                INSERT INTO pricing_versions (key, stamp, updated_at)\n                SELECT changed_keys.key, gen_random_uuid(), NOW()\n                FROM (SELECT DISTINCT k.key FROM (SELECT 'sailing:' || changed.sailing_id AS key FROM (SELECT * FROM new_values) AS changed) AS k) AS changed_keys\n                ORDER BY changed_keys.key\n                ON CONFLICT (key) DO UPDATE SET stamp = EXCLUDED.stamp, updated_at = EXCLUDED.updated_at;\n                RETURN NULL;\n            END;\n            ", hash='12f0eda8cd84e963873b77647dff66ad9ceeb873', level='STATEMENT', operation='INSERT', pgid='pgtrigger_trg_cabin_cost_customs_pricing_versions_ins_cc4fd', referencing='REFERENCING NEW TABLE AS new_values ', table='cabin_cost_customs', when='AFTER')),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='cabincostcustom',
+            trigger=pgtrigger.compiler.Trigger(name='trg_cabin_cost_customs_pricing_versions_upd', sql=pgtrigger.compiler.UpsertTriggerSql(func="\n            BEGIN\n                INSERT INTO pricing_versions (key, stamp, updated_at)\n                SELECT changed_keys.key, gen_random_uuid(), NOW()\n                FROM (SELECT DISTINCT k.key FROM (SELECT 'sailing:' || changed.sailing_id AS key FROM (SELECT * FROM new_values UNION ALL SELECT * FROM old_values) AS changed) AS k) AS changed_keys\n                ORDER BY changed_keys.key\n                ON CONFLICT (key) DO UPDATE SET stamp = EXCLUDED.stamp, updated_at = EXCLUDED.updated_at;\n                RETURN NULL;\n            END;\n            ", hash='0ed5a4f2889844db2c2e83327dc9c336c38a1e4a', level='STATEMENT', operation='UPDATE', pgid='pgtrigger_trg_cabin_cost_customs_pricing_versions_upd_6cb64', referencing='REFERENCING OLD TABLE AS old_values  NEW TABLE AS new_values ', table='cabin_cost_customs', when='AFTER')),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='cabincostcustom',
+            trigger=pgtrigger.compiler.Trigger(name='trg_cabin_cost_customs_pricing_versions_del', sql=pgtrigger.compiler.UpsertTriggerSql(func="\n            BEGIN\n                INSERT INTO pricing_versions (key, stamp, updated_at)\n                SELECT changed_keys.key, gen_random_uuid(), NOW()\n                FROM (SELECT DISTINCT k.key FROM (SELECT 'sailing:' || changed.sailing_id AS key FROM (SELECT * FROM old_values) AS changed) AS k) AS changed_keys\n                ORDER BY changed_keys.key\n                ON CONFLICT (key) DO UPDATE SET stamp = EXCLUDED.stamp, updated_at = EXCLUDED.updated_at;\n                RETURN NULL;\n            END;\n            ", hash='6559e85914bc5666c547d106578f6a8deba5d52d', level='STATEMENT', operation='DELETE', pgid='pgtrigger_trg_cabin_cost_customs_pricing_versions_del_d6a4a', referencing='REFERENCING OLD TABLE AS old_values ', table='cabin_cost_customs', when='AFTER')),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='cabincostoverride',
+            trigger=pgtrigger.compiler.Trigger(name='trg_cabin_cost_ovr_pricing_versions_ins', sql=pgtrigger.compiler.UpsertTriggerSql(func="\n            BEGIN\n                INSERT INTO pricing_versions (key, stamp, updated_at)\n                SELECT changed_keys.key, gen_random_uuid(), NOW()\n                FROM (SELECT DISTINCT k.key FROM (SELECT 'sailing:' || changed.sailing_id AS key FROM (SELECT * FROM new_values) AS changed) AS k) AS changed_keys\n                ORDER BY changed_keys.key\n                ON CONFLICT (key) DO UPDATE SET stamp = EXCLUDED.stamp, updated_at = EXCLUDED.updated_at;\n                RETURN NULL;\n            END;\n            ", hash='373599331337c32dba727c8c2c9041caa887420a', level='STATEMENT', operation='INSERT', pgid='pgtrigger_trg_cabin_cost_ovr_pricing_versions_ins_7e28a', referencing='REFERENCING NEW TABLE AS new_values ', table='cabin_cost_overrides', when='AFTER')),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='cabincostoverride',
+            trigger=pgtrigger.compiler.Trigger(name='trg_cabin_cost_ovr_pricing_versions_upd', sql=pgtrigger.compiler.UpsertTriggerSql(func="\n            BEGIN\n                INSERT INTO pricing_versions (key, stamp, updated_at)\n                SELECT changed_keys.key, gen_random_uuid(), NOW()\n                FROM (SELECT DISTINCT k.key FROM (SELECT 'sailing:' || changed.sailing_id AS key FROM (SELECT * FROM new_values UNION ALL SELECT * FROM old_values) AS changed) AS k) AS changed_keys\n                ORDER BY changed_keys.key\n                ON CONFLICT (key) DO UPDATE SET stamp = EXCLUDED.stamp, updated_at = EXCLUDED.updated_at;\n                RETURN NULL;\n            END;\n            ", hash='c3789c8b2c4e90174d8e2a5e14c0c741215224d6', level='STATEMENT', operation='UPDATE', pgid='pgtrigger_trg_cabin_cost_ovr_pricing_versions_upd_a629a', referencing='REFERENCING OLD TABLE AS old_values  NEW TABLE AS new_values ', table='cabin_cost_overrides', when='AFTER')),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='cabincostoverride',
+            trigger=pgtrigger.compiler.Trigger(name='trg_cabin_cost_ovr_pricing_versions_del', sql=pgtrigger.compiler.UpsertTriggerSql(func="\n            BEGIN\n                INSERT INTO pricing_versions (key, stamp, updated_at)\n                SELECT changed_keys.key, gen_random_uuid(), NOW()\n                FROM (SELECT DISTINCT k.key FROM (SELECT 'sailing:' || changed.sailing_id AS key FROM (SELECT * FROM old_values) AS changed) AS k) AS changed_keys\n                ORDER BY changed_keys.key\n                ON CONFLICT (key) DO UPDATE SET stamp = EXCLUDED.stamp, updated_at = EXCLUDED.updated_at;\n                RETURN NULL;\n            END;\n            ", hash='62ec5a54db261c9dc6486207493edc0f576443da', level='STATEMENT', operation='DELETE', pgid='pgtrigger_trg_cabin_cost_ovr_pricing_versions_del_ebb4e', referencing='REFERENCING OLD TABLE AS old_values ', table='cabin_cost_overrides', when='AFTER')),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='customcost',
+            trigger=pgtrigger.compiler.Trigger(name='trg_custom_costs_pricing_versions_upd', sql=pgtrigger.compiler.UpsertTriggerSql(func="\n            BEGIN\n                INSERT INTO pricing_versions (key, stamp, updated_at)\n                SELECT changed_keys.key, gen_random_uuid(), NOW()\n                FROM (SELECT DISTINCT k.key FROM (SELECT 'ship:' || scc.ship_id AS key\n                FROM (SELECT * FROM new_values UNION ALL SELECT * FROM old_values) AS changed\n                JOIN ship_custom_costs scc ON scc.custom_cost_id = changed.id) AS k) AS changed_keys\n                ORDER BY changed_keys.key\n                ON CONFLICT (key) DO UPDATE SET stamp = EXCLUDED.stamp, updated_at = EXCLUDED.updated_at;\n                RETURN NULL;\n            END;\n            ", hash='d8882d824575870d3f554b19bde74118ac23a0cb', level='STATEMENT', operation='UPDATE', pgid='pgtrigger_trg_custom_costs_pricing_versions_upd_c0534', referencing='REFERENCING OLD TABLE AS old_values  NEW TABLE AS new_values ', table='custom_costs', when='AFTER')),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='shipcustomcost',
+            trigger=pgtrigger.compiler.Trigger(name='trg_ship_custom_costs_pricing_versions_ins', sql=pgtrigger.compiler.UpsertTriggerSql(func="\n            BEGIN\n                INSERT INTO pricing_versions (key, stamp, updated_at)\n                SELECT changed_keys.key, gen_random_uuid(), NOW()\n                FROM (SELECT DISTINCT k.key FROM (SELECT 'ship:' || changed.ship_id AS key FROM (SELECT * FROM new_values) AS changed) AS k) AS changed_keys\n                ORDER BY changed_keys.key\n                ON CONFLICT (key) DO UPDATE SET stamp = EXCLUDED.stamp, updated_at = EXCLUDED.updated_at;\n                RETURN NULL;\n            END;\n            ", hash='b74e4b03a519a9e70920e766c35616eecacbf595', level='STATEMENT', operation='INSERT', pgid='pgtrigger_trg_ship_custom_costs_pricing_versions_ins_605cf', referencing='REFERENCING NEW TABLE AS new_values ', table='ship_custom_costs', when='AFTER')),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='shipcustomcost',
+            trigger=pgtrigger.compiler.Trigger(name='trg_ship_custom_costs_pricing_versions_del', sql=pgtrigger.compiler.UpsertTriggerSql(func="\n            BEGIN\n                INSERT INTO pricing_versions (key, stamp, updated_at)\n                SELECT changed_keys.key, gen_random_uuid(), NOW()\n                FROM (SELECT DISTINCT k.key FROM (SELECT 'ship:' || changed.ship_id AS key FROM (SELECT * FROM old_values) AS changed) AS k) AS changed_keys\n                ORDER BY changed_keys.key\n                ON CONFLICT (key) DO UPDATE SET stamp = EXCLUDED.stamp, updated_at = EXCLUDED.updated_at;\n                RETURN NULL;\n            END;\n            ", hash='d473d352fe1e09d8873e5abc3c5686566e28386a', level='STATEMENT', operation='DELETE', pgid='pgtrigger_trg_ship_custom_costs_pricing_versions_del_6c925', referencing='REFERENCING OLD TABLE AS old_values ', table='ship_custom_costs', when='AFTER')),
+        ),
+    ]
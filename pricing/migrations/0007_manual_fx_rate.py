@@ -0,0 +1,266 @@
+# Generated by Django 5.2.6 on 2026-10-17 04:10
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pricing', '0006_pricingversion_and_more'),
+    ]
+
+    operations = [
+        migrations.RunSQL(     # -- manual rate of a stored pair, or the inverse of the stored (quote, base) pair
+            """
+            CREATE OR REPLACE FUNCTION manual_fx_pair_rate(p_base text, p_quote text)
+            RETURNS numeric
+            LANGUAGE sql
+            STABLE
+            AS $$
+                SELECT COALESCE(
+                    (SELECT m.rate FROM exchange_rates_manual m WHERE m.base = p_base AND m.quote = p_quote),
+                    (SELECT 1 / m.rate FROM exchange_rates_manual m WHERE m.base = p_quote AND m.quote = p_base)
+                );
+            $$;
+            """,
+            reverse_sql="""
+            DROP FUNCTION IF EXISTS manual_fx_pair_rate(text, text);
+            """
+        ),
+        migrations.RunSQL(     # -- manual rate triangulated through the pivot currencies (see fx.services.rates)
+            """
+            CREATE OR REPLACE FUNCTION manual_fx_rate(p_base text, p_quote text)
+            RETURNS numeric
+            LANGUAGE sql
+            STABLE
+            AS $$
+                SELECT CASE
+                    WHEN p_base = p_quote THEN 1::numeric
+                    ELSE COALESCE(
+                        manual_fx_pair_rate(p_base, p_quote),
+                        (SELECT legs.first * legs.second
+                         FROM unnest(ARRAY['USD', 'EUR']) WITH ORDINALITY AS pivots(currency, position)
+                         CROSS JOIN LATERAL (
+                             SELECT manual_fx_pair_rate(p_base, pivots.currency) AS first,
+                                    manual_fx_pair_rate(pivots.currency, p_quote) AS second
+                         ) legs
+                         WHERE pivots.currency NOT IN (p_base, p_quote)
+                           AND legs.first IS NOT NULL AND legs.second IS NOT NULL
+                         ORDER BY pivots.position
+                         LIMIT 1)
+                    )
+                END;
+            $$;
+            """,
+            reverse_sql="""
+            DROP FUNCTION IF EXISTS manual_fx_rate(text, text);
+            """
+        ),
+        migrations.RunSQL(     # -- converts fixed custom costs with triangulated manual rates
+            """
+            CREATE OR REPLACE FUNCTION refresh_effective_prices(p_sailings uuid[], p_cabins uuid[])
+            RETURNS void
+            LANGUAGE plpgsql
+            AS $$
+            BEGIN
+                IF p_sailings IS NULL OR cardinality(p_sailings) = 0 THEN
+                    RETURN;
+                END IF;
+
+                WITH cells AS (
+                    SELECT DISTINCT c.sailing_id, c.cabin_id
+                    FROM unnest(p_sailings, p_cabins) AS c(sailing_id, cabin_id)
+                ),
+                costs AS (
+                    -- Cost hierarchy: override > season cost for (category, deck) > season cost for the category
+                    SELECT cells.sailing_id, cells.cabin_id, s.season_id, s.ship_id,
+                           COALESCE(o.base_per_pax, d.base_per_pax) AS bpp,
+                           COALESCE(o.currency, d.currency) AS currency,
+                           COALESCE(o.single_multiplier, d.single_multiplier) AS mult,
+                           CASE WHEN o.id IS NOT NULL THEN 'override' WHEN d.id IS NOT NULL THEN 'default' END AS source
+                    FROM cells
+                    JOIN sailings s ON s.id = cells.sailing_id
+                    JOIN cabins cb ON cb.id = cells.cabin_id AND cb.ship_id = s.ship_id
+                    LEFT JOIN cabin_cost_overrides o ON o.sailing_id = cells.sailing_id AND o.cabin_id = cells.cabin_id
+                    LEFT JOIN LATERAL (
+                        SELECT ssc.id, ssc.base_per_pax, ssc.currency, ssc.single_multiplier
+                        FROM season_ship_costs ssc
+                        WHERE o.id IS NULL
+                          AND ssc.season_id = s.season_id AND ssc.ship_id = s.ship_id
+                          AND ssc.category_id = cb.category_id AND (ssc.deck = cb.deck OR ssc.deck IS NULL)
+                        ORDER BY ssc.deck IS NULL, ssc.created_at DESC, ssc.id DESC
+                        LIMIT 1
+                    ) d ON TRUE
+                )
+                INSERT INTO effective_prices AS ep (sailing_id, cabin_id, source, currency,
+                                                    cos_double, b2b_double, b2c_double,
+                                                    cos_single, b2b_single, b2c_single,
+                                                    has_custom_costs, refreshed_at)
+                SELECT costs.sailing_id, costs.cabin_id, costs.source, costs.currency,
+                       round(p.cos_double, 2),
+                       round(p.cos_double * (1 + se.default_margin_b2b), 2),
+                       round(p.cos_double * (1 + se.default_margin_b2c), 2),
+                       round(p.cos_single, 2),
+                       round(p.cos_single * (1 + se.default_margin_b2b), 2),
+                       round(p.cos_single * (1 + se.default_margin_b2c), 2),
+                       cu.customs_count > 0, NOW()
+                FROM costs
+                JOIN seasons se ON se.id = costs.season_id
+                CROSS JOIN LATERAL (
+                    -- Fixed amounts are converted to the cost currency with manual rates (see manual_fx_rate)
+                    SELECT count(*) AS customs_count,
+                           COALESCE(SUM(COALESCE(ccc.value, 0) * r.rate)
+                                    FILTER (WHERE cc.mode = 'fixed' AND cc.applies_to = 'per_cabin'), 0) AS fixed_cabin,
+                           COALESCE(SUM(COALESCE(ccc.value, 0) * r.rate)
+                                    FILTER (WHERE cc.mode = 'fixed' AND cc.applies_to = 'per_pax'), 0) AS fixed_pax,
+                           COALESCE(SUM(COALESCE(ccc.percent, 0))
+                                    FILTER (WHERE cc.mode = 'percent' AND cc.applies_to = 'per_cabin'), 0) AS pct_cabin,
+                           COALESCE(SUM(COALESCE(ccc.percent, 0))
+                                    FILTER (WHERE cc.mode = 'percent' AND cc.applies_to = 'per_pax'), 0) AS pct_pax,
+                           COALESCE(bool_or(cc.mode = 'fixed' AND r.rate IS NULL), FALSE) AS missing_rate
+                    FROM cabin_cost_customs ccc
+                    JOIN custom_costs cc ON cc.id = ccc.custom_cost_id AND cc.is_active
+                    JOIN ship_custom_costs scc ON scc.custom_cost_id = cc.id AND scc.ship_id = costs.ship_id
+                    CROSS JOIN LATERAL (SELECT manual_fx_rate(ccc.currency, costs.currency) AS rate) r
+                    WHERE ccc.sailing_id = costs.sailing_id AND ccc.cabin_id = costs.cabin_id
+                ) cu
+                CROSS JOIN LATERAL (
+                    SELECT
+                        CASE WHEN NOT cu.missing_rate THEN
+                            costs.bpp * 2 * (1 + cu.pct_cabin) + costs.bpp * 2 * cu.pct_pax
+                            + cu.fixed_cabin + cu.fixed_pax * 2
+                        END AS cos_double,
+                        CASE WHEN NOT cu.missing_rate THEN
+                            costs.bpp * costs.mult * (1 + cu.pct_cabin) + costs.bpp * cu.pct_pax
+                            + cu.fixed_cabin + cu.fixed_pax
+                        END AS cos_single
+                ) p
+                ON CONFLICT (sailing_id, cabin_id) DO UPDATE SET
+                    source = EXCLUDED.source,
+                    currency = EXCLUDED.currency,
+                    cos_double = EXCLUDED.cos_double,
+                    b2b_double = EXCLUDED.b2b_double,
+                    b2c_double = EXCLUDED.b2c_double,
+                    cos_single = EXCLUDED.cos_single,
+                    b2b_single = EXCLUDED.b2b_single,
+                    b2c_single = EXCLUDED.b2c_single,
+                    has_custom_costs = EXCLUDED.has_custom_costs,
+                    refreshed_at = EXCLUDED.refreshed_at;
+            END;
+            $$;
+            """,
+            reverse_sql="""
+            CREATE OR REPLACE FUNCTION refresh_effective_prices(p_sailings uuid[], p_cabins uuid[])
+            RETURNS void
+            LANGUAGE plpgsql
+            AS $$
+            BEGIN
+                IF p_sailings IS NULL OR cardinality(p_sailings) = 0 THEN
+                    RETURN;
+                END IF;
+
+                WITH cells AS (
+                    SELECT DISTINCT c.sailing_id, c.cabin_id
+                    FROM unnest(p_sailings, p_cabins) AS c(sailing_id, cabin_id)
+                ),
+                costs AS (
+                    -- Cost hierarchy: override > season cost for (category, deck) > season cost for the category
+                    SELECT cells.sailing_id, cells.cabin_id, s.season_id, s.ship_id,
+                           COALESCE(o.base_per_pax, d.base_per_pax) AS bpp,
+                           COALESCE(o.currency, d.currency) AS currency,
+                           COALESCE(o.single_multiplier, d.single_multiplier) AS mult,
+                           CASE WHEN o.id IS NOT NULL THEN 'override' WHEN d.id IS NOT NULL THEN 'default' END AS source
+                    FROM cells
+                    JOIN sailings s ON s.id = cells.sailing_id
+                    JOIN cabins cb ON cb.id = cells.cabin_id AND cb.ship_id = s.ship_id
+                    LEFT JOIN cabin_cost_overrides o ON o.sailing_id = cells.sailing_id AND o.cabin_id = cells.cabin_id
+                    LEFT JOIN LATERAL (
+                        SELECT ssc.id, ssc.base_per_pax, ssc.currency, ssc.single_multiplier
+                        FROM season_ship_costs ssc
+                        WHERE o.id IS NULL
+                          AND ssc.season_id = s.season_id AND ssc.ship_id = s.ship_id
+                          AND ssc.category_id = cb.category_id AND (ssc.deck = cb.deck OR ssc.deck IS NULL)
+                        ORDER BY ssc.deck IS NULL, ssc.created_at DESC, ssc.id DESC
+                        LIMIT 1
+                    ) d ON TRUE
+                )
+                INSERT INTO effective_prices AS ep (sailing_id, cabin_id, source, currency,
+                                                    cos_double, b2b_double, b2c_double,
+                                                    cos_single, b2b_single, b2c_single,
+                                                    has_custom_costs, refreshed_at)
+                SELECT costs.sailing_id, costs.cabin_id, costs.source, costs.currency,
+                       round(p.cos_double, 2),
+                       round(p.cos_double * (1 + se.default_margin_b2b), 2),
+                       round(p.cos_double * (1 + se.default_margin_b2c), 2),
+                       round(p.cos_single, 2),
+                       round(p.cos_single * (1 + se.default_margin_b2b), 2),
+                       round(p.cos_single * (1 + se.default_margin_b2c), 2),
+                       cu.customs_count > 0, NOW()
+                FROM costs
+                JOIN seasons se ON se.id = costs.season_id
+                CROSS JOIN LATERAL (
+                    -- Fixed amounts are converted to the cost currency with manual rates (direct or inverse pair)
+                    SELECT count(*) AS customs_count,
+                           COALESCE(SUM(COALESCE(ccc.value, 0) * r.rate)
+                                    FILTER (WHERE cc.mode = 'fixed' AND cc.applies_to = 'per_cabin'), 0) AS fixed_cabin,
+                           COALESCE(SUM(COALESCE(ccc.value, 0) * r.rate)
+                                    FILTER (WHERE cc.mode = 'fixed' AND cc.applies_to = 'per_pax'), 0) AS fixed_pax,
+                           COALESCE(SUM(COALESCE(ccc.percent, 0))
+                                    FILTER (WHERE cc.mode = 'percent' AND cc.applies_to = 'per_cabin'), 0) AS pct_cabin,
+                           COALESCE(SUM(COALESCE(ccc.percent, 0))
+                                    FILTER (WHERE cc.mode = 'percent' AND cc.applies_to = 'per_pax'), 0) AS pct_pax,
+                           COALESCE(bool_or(cc.mode = 'fixed' AND r.rate IS NULL), FALSE) AS missing_rate
+                    FROM cabin_cost_customs ccc
+                    JOIN custom_costs cc ON cc.id = ccc.custom_cost_id AND cc.is_active
+                    JOIN ship_custom_costs scc ON scc.custom_cost_id = cc.id AND scc.ship_id = costs.ship_id
+                    CROSS JOIN LATERAL (
+                        SELECT CASE
+                            WHEN ccc.currency = costs.currency THEN 1::numeric
+                            ELSE COALESCE(
+                                (SELECT m.rate FROM exchange_rates_manual m
+                                 WHERE m.base = ccc.currency AND m.quote = costs.currency),
+                                (SELECT 1 / m.rate FROM exchange_rates_manual m
+                                 WHERE m.base = costs.currency AND m.quote = ccc.currency)
+                            )
+                        END AS rate
+                    ) r
+                    WHERE ccc.sailing_id = costs.sailing_id AND ccc.cabin_id = costs.cabin_id
+                ) cu
+                CROSS JOIN LATERAL (
+                    SELECT
+                        CASE WHEN NOT cu.missing_rate THEN
+                            costs.bpp * 2 * (1 + cu.pct_cabin) + costs.bpp * 2 * cu.pct_pax
+                            + cu.fixed_cabin + cu.fixed_pax * 2
+                        END AS cos_double,
+                        CASE WHEN NOT cu.missing_rate THEN
+                            costs.bpp * costs.mult * (1 + cu.pct_cabin) + costs.bpp * cu.pct_pax
+                            + cu.fixed_cabin + cu.fixed_pax
+                        END AS cos_single
+                ) p
+                ON CONFLICT (sailing_id, cabin_id) DO UPDATE SET
+                    source = EXCLUDED.source,
+                    currency = EXCLUDED.currency,
+                    cos_double = EXCLUDED.cos_double,
+                    b2b_double = EXCLUDED.b2b_double,
+                    b2c_double = EXCLUDED.b2c_double,
+                    cos_single = EXCLUDED.cos_single,
+                    b2b_single = EXCLUDED.b2b_single,
+                    b2c_single = EXCLUDED.b2c_single,
+                    has_custom_costs = EXCLUDED.has_custom_costs,
+                    refreshed_at = EXCLUDED.refreshed_at;
+            END;
+            $$;
+            """
+        ),
+        migrations.RunSQL(     # -- backfill the cells with custom costs in another currency than their cost
+            """
+            SELECT refresh_effective_prices(array_agg(ep.sailing_id), array_agg(ep.cabin_id))
+            FROM effective_prices ep
+            WHERE ep.has_custom_costs AND EXISTS (
+                SELECT 1 FROM cabin_cost_customs ccc
+                WHERE ccc.sailing_id = ep.sailing_id AND ccc.cabin_id = ep.cabin_id AND ccc.currency <> ep.currency
+            );
+            """,
+            reverse_sql=migrations.RunSQL.noop
+        ),
+    ]
@@ -1,10 +1,14 @@
+import pgtrigger
 from django.db import models
 from django.contrib.postgres.functions import RandomUUID
 
-from common.enums import CustomCostMode, CustomCostAppliesTo
+from common.enums import CustomCostMode, CustomCostAppliesTo, EffectiveSource
 from common.fields import PostgresEnumField
 from common.functions import TxNow
-from common.triggers import set_updated_at_trg
+from common.triggers import set_updated_at_trg, transition_trgs
+from pricing.triggers import (REFRESH_CHANGED_CELLS_SQL, REFRESH_SEASON_SHIP_COSTS_SQL, REFRESH_SHIP_CUSTOM_COSTS_SQL,
+                              BUMP_SEASON_SHIP_COST_VERSION_SQL, REFRESH_SAILING_COVERAGE_SQL, BUMP_CELL_VERSIONS_SQL,
+                              BUMP_SHIP_VERSIONS_SQL, BUMP_CUSTOM_COST_SHIP_VERSIONS_SQL, custom_cost_changed_trg)
 
 class SeasonShipCost(models.Model):
     id = models.UUIDField(primary_key=True, db_default=RandomUUID())
@@ -36,6 +40,24 @@ class SeasonShipCost(models.Model):
         indexes = [
             models.Index(fields=['season', 'ship', 'category'], name='idx_ssc_lookup'),
         ]
+        triggers = [
+            *transition_trgs('trg_ssc_effective_prices', REFRESH_SEASON_SHIP_COSTS_SQL),
+            *transition_trgs('trg_ssc_version', BUMP_SEASON_SHIP_COST_VERSION_SQL),
+        ]
+
+class SeasonShipCostVersion(models.Model):
+    """
+    Version stamp of the season costs of a (season, ship), replaced by a trigger whenever one of its season_ship_costs
+    rows changes. Stamps are random so a rolled back change never reuses a stamp.
+    """
+    season_id = models.UUIDField(null=False)
+    ship_id = models.UUIDField(null=False)
+    stamp = models.UUIDField(db_default=RandomUUID(), null=False)
+    updated_at = models.DateTimeField(db_default=TxNow(), null=False)
+    pk = models.CompositePrimaryKey('season_id', 'ship_id')
+
+    class Meta:
+        db_table = 'season_ship_cost_versions'
 
 class CabinCostOverride(models.Model):
     id = models.UUIDField(primary_key=True, db_default=RandomUUID())
@@ -68,6 +90,8 @@ class CabinCostOverride(models.Model):
         ]
         triggers = [
             set_updated_at_trg('trg_cabin_cost_ovr_updated'),
+            *transition_trgs('trg_cabin_cost_ovr_effective_prices', REFRESH_CHANGED_CELLS_SQL),
+            *transition_trgs('trg_cabin_cost_ovr_pricing_versions', BUMP_CELL_VERSIONS_SQL),
         ]
 
 class CustomCost(models.Model):
@@ -89,6 +113,11 @@ class CustomCost(models.Model):
                 name='custom_costs_key_key'
             )
         ]
+        triggers = [
+            custom_cost_changed_trg('trg_custom_costs_effective_prices'),
+            *transition_trgs('trg_custom_costs_pricing_versions', BUMP_CUSTOM_COST_SHIP_VERSIONS_SQL,
+                             operations=(pgtrigger.Update,)),
+        ]
 
 class ShipCustomCost(models.Model):
     ship = models.ForeignKey('ships_cabins.Ship', on_delete=models.CASCADE, null=False, db_index=False)
@@ -97,11 +126,17 @@ class ShipCustomCost(models.Model):
 
     class Meta:
         db_table = 'ship_custom_costs'
+        triggers = [
+            *transition_trgs('trg_ship_custom_costs_effective_prices', REFRESH_SHIP_CUSTOM_COSTS_SQL,
+                             operations=(pgtrigger.Insert, pgtrigger.Delete)),
+            *transition_trgs('trg_ship_custom_costs_pricing_versions', BUMP_SHIP_VERSIONS_SQL,
+                             operations=(pgtrigger.Insert, pgtrigger.Delete)),
+        ]
 
 class CabinCostCustom(models.Model):
     id = models.UUIDField(primary_key=True, db_default=RandomUUID())
-    value = models.DecimalField(max_digits=12, decimal_places=4)
-    percent = models.DecimalField(max_digits=6, decimal_places=4)
+    value = models.DecimalField(max_digits=12, decimal_places=4, null=True)
+    percent = models.DecimalField(max_digits=6, decimal_places=4, null=True)
     currency = models.CharField(max_length=3)
 
     sailing = models.ForeignKey('seasons_sailings.Sailing', on_delete=models.CASCADE, null=False, db_index=False)
@@ -124,4 +159,79 @@ class CabinCostCustom(models.Model):
                 fields=['sailing', 'cabin', 'custom_cost'],
                 name='cabin_cost_customs_sailing_id_cabin_id_custom_cost_id_key'
             )
-        ]
\ No newline at end of file
+        ]
+        triggers = [
+            *transition_trgs('trg_cabin_cost_customs_effective_prices', REFRESH_CHANGED_CELLS_SQL),
+            *transition_trgs('trg_cabin_cost_customs_pricing_versions', BUMP_CELL_VERSIONS_SQL),
+        ]
+
+class EffectivePrice(models.Model):
+    """
+    Projection of the resolved cost and prices of every (sailing, cabin) cell, in the currency of the cost and using
+    manual FX rates for custom costs. Rows are maintained by the triggers on the pricing inputs (see pricing.triggers)
+    and must not be written to directly.
+    """
+    source = models.TextField(choices=EffectiveSource.choices, null=True)
+    currency = models.CharField(max_length=3, null=True)
+    cos_double = models.DecimalField(max_digits=14, decimal_places=2, null=True)
+    b2b_double = models.DecimalField(max_digits=14, decimal_places=2, null=True)
+    b2c_double = models.DecimalField(max_digits=14, decimal_places=2, null=True)
+    cos_single = models.DecimalField(max_digits=14, decimal_places=2, null=True)
+    b2b_single = models.DecimalField(max_digits=14, decimal_places=2, null=True)
+    b2c_single = models.DecimalField(max_digits=14, decimal_places=2, null=True)
+    has_custom_costs = models.BooleanField(db_default=False, null=False)
+    refreshed_at = models.DateTimeField(db_default=TxNow(), null=False)
+
+    # Rows are removed by the sailing/cabin triggers, so deleting a sailing never races the refresh triggers
+    sailing = models.ForeignKey('seasons_sailings.Sailing', on_delete=models.DO_NOTHING, null=False,
+                                db_index=False, db_constraint=False, related_name='+')
+    cabin = models.ForeignKey('ships_cabins.Cabin', on_delete=models.DO_NOTHING, null=False,
+                              db_index=False, db_constraint=False, related_name='+')
+    pk = models.CompositePrimaryKey('sailing_id', 'cabin_id')
+
+    class Meta:
+        db_table = 'effective_prices'
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(source__in=EffectiveSource.values),
+                name='effective_prices_source_check'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['cabin'], name='idx_effective_prices_cabin'),
+        ]
+        triggers = [
+            *transition_trgs('trg_effective_prices_coverage', REFRESH_SAILING_COVERAGE_SQL),
+        ]
+
+class SailingCoverage(models.Model):
+    """
+    Pricing coverage counters of a sailing (see GraphCoverageOut), recounted from effective_prices by triggers whenever
+    cells of the sailing change or one of its cabins is archived. Sailings without cells have no row.
+    """
+    cabins_total = models.IntegerField(db_default=0, null=False)
+    priced = models.IntegerField(db_default=0, null=False)
+    unpriced = models.IntegerField(db_default=0, null=False)
+    overridden = models.IntegerField(db_default=0, null=False)
+    archived = models.IntegerField(db_default=0, null=False)
+    refreshed_at = models.DateTimeField(db_default=TxNow(), null=False)
+
+    sailing = models.OneToOneField('seasons_sailings.Sailing', on_delete=models.DO_NOTHING, primary_key=True,
+                                   db_constraint=False, related_name='+')
+
+    class Meta:
+        db_table = 'sailing_coverage'
+
+class PricingVersion(models.Model):
+    """
+    Version stamps of the inputs of the cached pricing responses (see pricing.services.scope_cache), keyed by entity
+    ('season:<id>', 'ship:<id>', 'sailing:<id>', 'fx:manual' or 'fx:live'). Stamps are replaced by triggers within
+    the transaction changing the entity or its pricing inputs, so a response cached before the change is never read
+    once the change is committed. Entities never changed have no row.
+    """
+    key = models.TextField(primary_key=True)
+    stamp = models.UUIDField(db_default=RandomUUID(), null=False)
+    updated_at = models.DateTimeField(db_default=TxNow(), null=False)
+
+    class Meta:
+        db_table = 'pricing_versions'
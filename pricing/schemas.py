@@ -4,7 +4,6 @@ from enum import Enum
 from typing import List, Optional
 
 from ninja import Schema, ModelSchema
-from ninja_extra.schemas import NinjaPaginationResponseSchema
 from pydantic import Field
 from pydantic_extra_types.currency_code import Currency
 
@@ -37,6 +36,7 @@ class ScopeOut(Schema):
     sailings: List[uuid.UUID]
     fx_mode: FXMode
     occupancy: Occupancy
+    currency: Optional[Currency] = None
 
 class GraphCoverageOut(Schema):
     cabins_total: int
@@ -49,15 +49,36 @@ class GraphCellsOut(Schema):
     sailing: uuid.UUID
     cabin: uuid.UUID
     category: uuid.UUID
-    deck: str
+    deck: Optional[str] = None
     status: Status
     is_overridden: bool
-    price_display: MoneyOut
+    price_display: Optional[MoneyOut] = None
 
 class PricingGraphOut(Schema):
     scope: ScopeOut
     coverage: GraphCoverageOut
-    cells: GraphCellsOut
+    cells: List[GraphCellsOut]
+
+class GraphCabinColumnsOut(Schema):
+    id: List[uuid.UUID]
+    category: List[int]
+    deck: List[Optional[str]]
+
+class GraphCellColumnsOut(Schema):
+    status: List[int]
+    is_overridden: List[bool]
+    amount: List[Optional[int]]
+    currency: List[Optional[int]]
+
+class PricingGraphColumnsOut(Schema):
+    scope: ScopeOut
+    coverage: GraphCoverageOut
+    statuses: List[Status]
+    amount_scale: int
+    categories: List[uuid.UUID]
+    currencies: List[str]
+    cabins: GraphCabinColumnsOut
+    cells: GraphCellColumnsOut
 
 class ListTotalsOut(Schema):
     cos_total: MoneyOut
@@ -69,36 +90,62 @@ class ListItemsOut(Schema):
     cabin: CabinOut
     status: Status
     effective_source: EffectiveSource
-    price_display: MoneyOut
+    price_display: Optional[MoneyOut] = None
     has_custom_costs: bool
 
+class ListPageOut(Schema):
+    count: int
+    next_cursor: Optional[str] = None
+    results: List[ListItemsOut]
+
 class PricingListOut(Schema):
     scope: ScopeOut
-    totals: ListTotalsOut
-    page: NinjaPaginationResponseSchema[ListItemsOut]
+    totals: Optional[ListTotalsOut] = None
+    page: ListPageOut
 
-class BulkTargetIn(Schema):
-    category: uuid.UUID
+class ScopeCacheStatsOut(Schema):
+    view: str
+    hits: int
+    misses: int
+    hit_ratio: Optional[float] = None
 
-class PricingBulkIn(Schema):
-    season: uuid.UUID
-    ship: uuid.UUID
-    sailings: List[uuid.UUID]
+class BulkTargetIn(Schema):
+    category: Optional[uuid.UUID] = None
+    deck: Optional[str] = None
+    cabins: Optional[List[uuid.UUID]] = None
 
 class OverrideIn(Schema):
     base_per_pax: Decimal = Field(max_digits=12, decimal_places=4)
     currency: Currency
-    single_multiplier: Decimal = Field("1.50", max_digits=6, decimal_places=4)
+    single_multiplier: Decimal = Field(Decimal("1.50"), max_digits=6, decimal_places=4)
     notes: Optional[str] = None
 
 class OverrideCustomCostIn(Schema):
     custom_cost: uuid.UUID
     mode: Mode
     applies_to: AppliesTo
-    value: Decimal = Field(max_digits=12, decimal_places=4)
-    percent: Optional[Decimal] = Field(max_digits=6, decimal_places=4)
+    value: Optional[Decimal] = Field(None, max_digits=12, decimal_places=4)
+    percent: Optional[Decimal] = Field(None, max_digits=6, decimal_places=4)
     currency: Currency
 
+class PricingBulkIn(Schema):
+    season: uuid.UUID
+    ship: uuid.UUID
+    sailings: List[uuid.UUID]
+    target: BulkTargetIn
+    override: Optional[OverrideIn] = None
+    custom_costs: List[OverrideCustomCostIn] = []
+
+class BulkCountsOut(Schema):
+    inserted: int
+    updated: int
+    unchanged: int
+
+class PricingBulkOut(Schema):
+    cells: int
+    overrides: BulkCountsOut
+    custom_costs: BulkCountsOut
+
 class OverrideMarginsIn(Schema):
     b2b: Decimal = Field(max_digits=6, decimal_places=4)
     b2c: Decimal = Field(max_digits=6, decimal_places=4)
@@ -106,4 +153,4 @@ class OverrideMarginsIn(Schema):
 class CabinOverrideIn(Schema):
     override: OverrideCustomCostIn
     custom_costs: List[OverrideCustomCostIn]
-    margins_override: OverrideMarginsIn
\ No newline at end of file
+    margins_override: OverrideMarginsIn
\ No newline at end of file
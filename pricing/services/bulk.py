@@ -0,0 +1,273 @@
+import uuid
+from typing import Optional, List, Dict, Any, Tuple
+
+from django.db import connection, transaction
+from ninja_extra import status
+
+from common.enums import CustomCostMode
+from common.exceptions import ValidationFailedError
+from common.jobs import enqueue_job, report_progress
+from common.models import Job
+from pricing.models import CustomCost
+from pricing.schemas import PricingBulkIn
+from pricing.services.engine import load_scope
+from ships_cabins.models import Cabin
+
+BULK_JOB_KIND = 'pricing.bulk'
+BULK_JOB_BATCH_CELLS = 20000  # cells applied per transaction by a bulk job, progress is reported in between
+
+# Staging tables are dropped with the transaction, they only live for the duration of a bulk apply
+STAGE_CELLS_SQL = """
+    CREATE TEMP TABLE IF NOT EXISTS bulk_cells (sailing_id uuid NOT NULL, cabin_id uuid NOT NULL) ON COMMIT DROP;
+    TRUNCATE bulk_cells;
+"""
+
+STAGE_CUSTOMS_SQL = """
+    CREATE TEMP TABLE IF NOT EXISTS bulk_customs (
+        custom_cost_id uuid NOT NULL, value numeric(12, 4), percent numeric(6, 4), currency varchar(3) NOT NULL
+    ) ON COMMIT DROP;
+    TRUNCATE bulk_customs;
+"""
+
+# Unchanged rows are skipped by the WHERE clause of the upserts, so they are counted neither as inserted nor updated
+UPSERT_OVERRIDES_SQL = """
+    WITH upserted AS (
+        INSERT INTO cabin_cost_overrides AS o (sailing_id, cabin_id, base_per_pax, currency, single_multiplier, notes,
+                                              updated_by)
+        SELECT sailing_id, cabin_id, %s, %s, %s, %s, %s
+        FROM bulk_cells
+        ON CONFLICT (sailing_id, cabin_id) DO UPDATE SET
+            base_per_pax = EXCLUDED.base_per_pax,
+            currency = EXCLUDED.currency,
+            single_multiplier = EXCLUDED.single_multiplier,
+            notes = EXCLUDED.notes,
+            updated_by = EXCLUDED.updated_by
+        WHERE (o.base_per_pax, o.currency, o.single_multiplier, o.notes)
+              IS DISTINCT FROM (EXCLUDED.base_per_pax, EXCLUDED.currency, EXCLUDED.single_multiplier, EXCLUDED.notes)
+        RETURNING xmax = 0 AS inserted
+    )
+    SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted) FROM upserted;
+"""
+
+UPSERT_CUSTOMS_SQL = """
+    WITH upserted AS (
+        INSERT INTO cabin_cost_customs AS ccc (sailing_id, cabin_id, custom_cost_id, value, percent, currency)
+        SELECT cells.sailing_id, cells.cabin_id, customs.custom_cost_id, customs.value, customs.percent,
+               customs.currency
+        FROM bulk_cells cells
+        CROSS JOIN bulk_customs customs
+        ON CONFLICT (sailing_id, cabin_id, custom_cost_id) DO UPDATE SET
+            value = EXCLUDED.value,
+            percent = EXCLUDED.percent,
+            currency = EXCLUDED.currency
+        WHERE (ccc.value, ccc.percent, ccc.currency)
+              IS DISTINCT FROM (EXCLUDED.value, EXCLUDED.percent, EXCLUDED.currency)
+        RETURNING xmax = 0 AS inserted
+    )
+    SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted) FROM upserted;
+"""
+
+
+def resolve_bulk_cabins(ship_id: uuid.UUID, category_id: Optional[uuid.UUID] = None, deck: Optional[str] = None,
+                        cabin_ids: Optional[List[uuid.UUID]] = None) -> List[uuid.UUID]:
+    """
+    Resolves the (non-archived) cabins of a ship targeted by a bulk apply. Criteria are combined, at least one must
+    be given.
+
+    :param ship_id: The ship ID
+    :param category_id: Optional cabin category
+    :param deck: Optional deck
+    :param cabin_ids: Optional explicit cabins, which must belong to the ship
+    :return: List of cabin IDs
+    """
+    if category_id is None and deck is None and not cabin_ids:
+        raise ValidationFailedError(
+            title='Invalid bulk target',
+            detail='A category, a deck or a list of cabins is required',
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            errors=[{'field': 'target', 'message': 'At least one of category, deck or cabins is required'}],
+        )
+
+    cabins = Cabin.objects.filter(ship_id=ship_id, is_archived=False)
+    if category_id is not None:
+        cabins = cabins.filter(category_id=category_id)
+    if deck is not None:
+        cabins = cabins.filter(deck=deck)
+    if cabin_ids:
+        unknown = set(cabin_ids) - set(Cabin.objects.filter(ship_id=ship_id, id__in=cabin_ids)
+                                       .values_list('id', flat=True))
+        if unknown:
+            raise ValidationFailedError(
+                title='Invalid bulk target',
+                detail='One or more cabins do not belong to the given ship',
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                errors=[{'field': 'target.cabins', 'message': str(cabin_id)} for cabin_id in unknown],
+            )
+        cabins = cabins.filter(id__in=cabin_ids)
+
+    return list(cabins.values_list('id', flat=True))
+
+
+def validate_bulk_customs(ship_id: uuid.UUID, custom_costs: List[Any]) -> List[tuple]:
+    """
+    Validates the custom costs of a bulk apply against the catalogue: each must be active, enabled for the ship and
+    match the catalogue mode and calculation. Fixed costs carry a value, percentage costs a percent.
+
+    :param ship_id: The ship ID
+    :param custom_costs: List of OverrideCustomCostIn
+    :return: List of (custom_cost_id, value, percent, currency) rows to stage
+    """
+    catalogue = {
+        cost.id: cost for cost in
+        CustomCost.objects.filter(id__in=[custom.custom_cost for custom in custom_costs], is_active=True,
+                                  ships=ship_id)
+    }
+
+    errors = []
+    rows = []
+    for i, custom in enumerate(custom_costs):
+        cost = catalogue.get(custom.custom_cost)
+        field = f'custom_costs[{i}]'
+
+        if cost is None:
+            errors.append({'field': field, 'message': 'Custom cost is not active for this ship'})
+        elif (cost.mode, cost.applies_to) != (custom.mode.value, custom.applies_to.value):
+            errors.append({'field': field, 'message': f'Custom cost is {cost.mode} {cost.applies_to}'})
+        elif cost.mode == CustomCostMode.FIXED and custom.value is None:
+            errors.append({'field': f'{field}.value', 'message': 'A value is required for fixed custom costs'})
+        elif cost.mode == CustomCostMode.PERCENT and custom.percent is None:
+            errors.append({'field': f'{field}.percent', 'message': 'A percent is required for percent custom costs'})
+        else:
+            fixed = cost.mode == CustomCostMode.FIXED
+            rows.append((cost.id, custom.value if fixed else None, None if fixed else custom.percent,
+                         custom.currency))
+
+    if len({row[0] for row in rows}) != len(rows):
+        errors.append({'field': 'custom_costs', 'message': 'A custom cost can only be given once'})
+
+    if errors:
+        raise ValidationFailedError(
+            title='Invalid custom costs',
+            detail='One or more custom costs cannot be applied',
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            errors=errors,
+        )
+
+    return rows
+
+
+def prepare_pricing_bulk(payload: PricingBulkIn) -> Tuple[List[uuid.UUID], List[uuid.UUID], List[tuple]]:
+    """
+    Validates a bulk apply request and resolves its target.
+
+    :param payload: The bulk apply request
+    :return: (sailing_ids, cabin_ids, custom cost rows to stage)
+    """
+    if payload.override is None and not payload.custom_costs:
+        raise ValidationFailedError(
+            title='Nothing to apply',
+            detail='An override or at least one custom cost is required',
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            errors=[{'field': 'override', 'message': 'An override or custom costs are required'}],
+        )
+
+    _, sailing_ids = load_scope(payload.season, payload.ship, payload.sailings)
+    cabin_ids = resolve_bulk_cabins(payload.ship, payload.target.category, payload.target.deck, payload.target.cabins)
+    customs = validate_bulk_customs(payload.ship, payload.custom_costs)
+
+    return sailing_ids, cabin_ids, customs
+
+
+def apply_pricing_bulk(payload: PricingBulkIn, user=None) -> Dict[str, Any]:
+    """
+    Applies pricing inputs (override and/or custom costs) to every (sailing, cabin) cell of a target set in one
+    set-based operation: the cells are staged with COPY into a temporary table, then each target table is written with
+    a single INSERT ... ON CONFLICT, all within one transaction.
+
+    :param payload: The bulk apply request
+    :param user: The user applying the change (recorded on the overrides)
+    :return: dict matching PricingBulkOut
+    """
+    sailing_ids, cabin_ids, customs = prepare_pricing_bulk(payload)
+
+    cells = len(sailing_ids) * len(cabin_ids)
+    overrides = {'inserted': 0, 'updated': 0, 'unchanged': 0}
+    custom_costs = {'inserted': 0, 'updated': 0, 'unchanged': 0}
+
+    if not cells:
+        return {'cells': 0, 'overrides': overrides, 'custom_costs': custom_costs}
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(STAGE_CELLS_SQL)
+        with cursor.copy('COPY bulk_cells (sailing_id, cabin_id) FROM STDIN') as copy:
+            for sailing_id in sailing_ids:
+                for cabin_id in cabin_ids:
+                    copy.write_row((sailing_id, cabin_id))
+
+        if payload.override is not None:
+            override = payload.override
+            cursor.execute(UPSERT_OVERRIDES_SQL, [override.base_per_pax, override.currency,
+                                                  override.single_multiplier, override.notes,
+                                                  user.id if user else None])
+            inserted, updated = cursor.fetchone()
+            overrides = {'inserted': inserted, 'updated': updated, 'unchanged': cells - inserted - updated}
+
+        if customs:
+            cursor.execute(STAGE_CUSTOMS_SQL)
+            with cursor.copy('COPY bulk_customs (custom_cost_id, value, percent, currency) FROM STDIN') as copy:
+                for row in customs:
+                    copy.write_row(row)
+
+            cursor.execute(UPSERT_CUSTOMS_SQL)
+            inserted, updated = cursor.fetchone()
+            custom_costs = {'inserted': inserted, 'updated': updated,
+                            'unchanged': cells * len(customs) - inserted - updated}
+
+    return {'cells': cells, 'overrides': overrides, 'custom_costs': custom_costs}
+
+
+def enqueue_pricing_bulk(payload: PricingBulkIn, user=None) -> Job:
+    """
+    Validates a bulk apply request and queues it as a background job, for targets too large to apply within a request.
+
+    :param payload: The bulk apply request
+    :param user: The user applying the change
+    :return: The queued job
+    """
+    sailing_ids, cabin_ids, _ = prepare_pricing_bulk(payload)
+
+    return enqueue_job(BULK_JOB_KIND, payload.model_dump(mode='json'), total=len(sailing_ids) * len(cabin_ids),
+                       user=user)
+
+
+def run_pricing_bulk_job(job: Job) -> Dict[str, Any]:
+    """
+    Job handler applying a queued bulk request in batches of sailings, each batch in its own transaction. Progress is
+    reported (and cancellation checked) between batches, so a cancelled job keeps the batches already applied and
+    their summary as its result.
+
+    :param job: The running job
+    :return: dict matching PricingBulkOut, summed over the applied batches
+    """
+    payload = PricingBulkIn(**job.payload)
+    sailing_ids, cabin_ids, _ = prepare_pricing_bulk(payload)
+
+    summary = {
+        'cells': 0,
+        'overrides': {'inserted': 0, 'updated': 0, 'unchanged': 0},
+        'custom_costs': {'inserted': 0, 'updated': 0, 'unchanged': 0},
+    }
+    report_progress(job, 0, len(sailing_ids) * len(cabin_ids))
+
+    batch = max(1, BULK_JOB_BATCH_CELLS // max(len(cabin_ids), 1))
+    for i in range(0, len(sailing_ids), batch):
+        result = apply_pricing_bulk(payload.model_copy(update={'sailings': sailing_ids[i:i + batch]}), job.created_by)
+
+        summary['cells'] += result['cells']
+        for table in ('overrides', 'custom_costs'):
+            for count, value in result[table].items():
+                summary[table][count] += value
+
+        report_progress(job, summary['cells'], result=summary)
+
+    return summary
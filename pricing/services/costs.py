@@ -0,0 +1,95 @@
+import uuid
+from decimal import Decimal
+from functools import lru_cache
+from typing import Optional, Dict, Tuple
+
+from django.core.cache import cache
+
+from pricing.models import SeasonShipCost, SeasonShipCostVersion
+
+# Cost hierarchy resolution utilities
+COST_INDEX_CACHE_KEY = 'pricing:cost-index:{season}:{ship}:{stamp}'
+COST_INDEX_WINDOW = 86400  # 1 day, stale stamps are simply never read again
+COST_INDEX_LRU_SIZE = 256
+NO_COSTS_STAMP = 'none'  # (season, ship) pairs that never had season costs
+
+Cost = Tuple[Decimal, str, Decimal]  # (base_per_pax, currency, single_multiplier)
+
+
+def get_cost_stamp(season_id: uuid.UUID, ship_id: uuid.UUID) -> str:
+    """
+    Gets the version stamp of the season costs of a (season, ship), which changes whenever any of them changes.
+
+    :param season_id: The season ID
+    :param ship_id: The ship ID
+    :return: The stamp
+    """
+    stamp = (
+        SeasonShipCostVersion.objects.filter(season_id=season_id, ship_id=ship_id)
+        .values_list('stamp', flat=True)
+        .first()
+    )
+    return str(stamp) if stamp else NO_COSTS_STAMP
+
+
+def build_cost_index(season_id: uuid.UUID, ship_id: uuid.UUID) -> Dict[Tuple[uuid.UUID, Optional[str]], Cost]:
+    """
+    Loads the season costs of a (season, ship) into an index keyed by (category_id, deck), category defaults being
+    keyed with a None deck. Later rows win if the same key was configured twice.
+
+    :param season_id: The season ID
+    :param ship_id: The ship ID
+    :return: Mapping of (category_id, deck) -> (base_per_pax, currency, single_multiplier)
+    """
+    return {
+        (category_id, deck): (base_per_pax, currency, single_multiplier)
+        for category_id, deck, base_per_pax, currency, single_multiplier in
+        SeasonShipCost.objects.filter(season_id=season_id, ship_id=ship_id).order_by('created_at', 'id')
+        .values_list('category_id', 'deck', 'base_per_pax', 'currency', 'single_multiplier')
+    }
+
+
+@lru_cache(maxsize=COST_INDEX_LRU_SIZE)
+def _cost_index(season_id: uuid.UUID, ship_id: uuid.UUID, stamp: str) -> Dict[Tuple[uuid.UUID, Optional[str]], Cost]:
+    """
+    Memoized cost index for a stamp: in process first, then in the shared cache, then built from the database.
+    """
+    if stamp == NO_COSTS_STAMP:
+        return {}
+
+    key = COST_INDEX_CACHE_KEY.format(season=season_id, ship=ship_id, stamp=stamp)
+    index = cache.get(key)
+    if index is None:
+        index = build_cost_index(season_id, ship_id)
+        cache.set(key, index, COST_INDEX_WINDOW)
+
+    return index
+
+
+def get_cost_index(season_id: uuid.UUID, ship_id: uuid.UUID) -> Dict[Tuple[uuid.UUID, Optional[str]], Cost]:
+    """
+    Gets the cost index of a (season, ship), memoized by version stamp so an unchanged scope costs a single primary
+    key lookup. The returned index is shared and must not be modified.
+
+    :param season_id: The season ID
+    :param ship_id: The ship ID
+    :return: Mapping of (category_id, deck) -> (base_per_pax, currency, single_multiplier)
+    """
+    return _cost_index(season_id, ship_id, get_cost_stamp(season_id, ship_id))
+
+
+def resolve_cost(index: Dict[Tuple[uuid.UUID, Optional[str]], Cost], category_id: uuid.UUID, deck: Optional[str],
+                 override: Optional[Cost] = None) -> Optional[Cost]:
+    """
+    Resolves the cost of a cabin following the cost hierarchy:
+      1. CabinCostOverride for the (sailing, cabin)
+      2. SeasonShipCost matching the cabin's (category, deck)
+      3. SeasonShipCost for the cabin's category with no deck (category default)
+
+    :param index: The cost index of the cabin's (season, ship)
+    :param category_id: The cabin's category
+    :param deck: The cabin's deck
+    :param override: The (base_per_pax, currency, single_multiplier) of the cell's override, if any
+    :return: The resolved cost, or None if the cabin is unpriced
+    """
+    return override or index.get((category_id, deck)) or index.get((category_id, None))
@@ -0,0 +1,412 @@
+import uuid
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Optional, List, Dict, Tuple, Any, Mapping
+
+from django.shortcuts import get_object_or_404
+from ninja_extra import status
+
+from common.enums import CustomCostMode, CustomCostAppliesTo
+from common.exceptions import ValidationFailedError
+from fx.services.rates import fx_rate, get_conversion_matrix
+from pricing.models import CabinCostOverride, CabinCostCustom
+from pricing.schemas import FXMode, Occupancy, Status, EffectiveSource
+from pricing.services.costs import get_cost_index, resolve_cost
+from seasons_sailings.models import Season, Sailing
+from ships_cabins.models import Cabin
+
+# Pricing resolution utilities
+CENTS = Decimal('0.01')
+OCCUPANCY_PAX = {
+    Occupancy.DOUBLE: 2,
+    Occupancy.SINGLE: 1,
+}
+
+# Columnar pricing graph (see build_pricing_graph_columns): statuses are sent as their index in Status
+GRAPH_AMOUNT_SCALE = 2  # amounts are rounded to cents
+STATUS_CODES = {cell_status: code for code, cell_status in enumerate(Status)}
+
+
+def round_money(amount: Decimal) -> Decimal:
+    """
+    Rounds an amount to cents using half-up rounding (the rounding used for every displayed price).
+
+    :param amount: The unrounded amount
+    :return: The amount rounded to 2 decimal places
+    """
+    return amount.quantize(CENTS, rounding=ROUND_HALF_UP)
+
+
+def load_fx_rates(fx_mode: FXMode, currencies: set) -> Mapping[Tuple[str, str], Decimal]:
+    """
+    Gets the rates needed to convert between the given currencies, from the in-process conversion matrix of the mode
+    (stored, inverse and triangulated rates).
+
+    :param fx_mode: Whether to use manual rates or the live rates cache
+    :param currencies: The set of ISO currency codes involved in a pricing scope
+    :return: Mapping of (base, quote) -> rate
+    """
+    if len(currencies) < 2:
+        return {}
+
+    return get_conversion_matrix(fx_mode)
+
+
+def price_cell(cost: Tuple[Decimal, str, Decimal], customs: List[Tuple], occupancy: Occupancy,
+               margin_b2b: Decimal, margin_b2c: Decimal, rates: Dict[Tuple[str, str], Decimal],
+               currency: Optional[str] = None) -> Optional[Tuple[Decimal, Decimal, Decimal, str]]:
+    """
+    Prices a single (sailing, cabin) cell from its resolved cost and custom costs. This is the reference
+    implementation of the pricing maths; every amount is kept at full precision until the final rounding.
+
+    COS = base_per_pax x pax (or x single_multiplier for single occupancy) + custom costs
+    B2B/B2C = COS x (1 + season margin)
+
+    :param cost: The resolved (base_per_pax, currency, single_multiplier) of the cell
+    :param customs: List of (value, percent, currency, mode, applies_to) custom costs of the cell
+    :param occupancy: The occupancy to price for
+    :param margin_b2b: The B2B margin applied on top of COS
+    :param margin_b2c: The B2C margin applied on top of COS
+    :param rates: Mapping of (base, quote) -> rate used for currency conversion
+    :param currency: The display currency (defaults to the currency of the resolved cost)
+    :return: (cos, b2b, b2c, currency) rounded to cents, or None if a required FX rate is missing
+    """
+    base_per_pax, cost_currency, single_multiplier = cost
+    currency = currency or cost_currency
+    pax = OCCUPANCY_PAX[occupancy]
+
+    rate = fx_rate(rates, cost_currency, currency)
+    if rate is None:
+        return None
+
+    base = base_per_pax * (single_multiplier if occupancy == Occupancy.SINGLE else pax)
+    cos = base * rate
+
+    for value, percent, custom_currency, mode, applies_to in customs:
+        per_pax = applies_to == CustomCostAppliesTo.PER_PAX
+
+        if mode == CustomCostMode.PERCENT:
+            basis = base_per_pax * pax if per_pax else base
+            cos += basis * (percent or 0) * rate
+        else:
+            custom_rate = fx_rate(rates, custom_currency, currency)
+            if custom_rate is None:
+                return None
+            cos += (value or 0) * (pax if per_pax else 1) * custom_rate
+
+    b2b = cos * (1 + margin_b2b)
+    b2c = cos * (1 + margin_b2c)
+
+    return round_money(cos), round_money(b2b), round_money(b2c), currency
+
+
+def price_grid_dedup(costs: List[Optional[Tuple[Decimal, str, Decimal]]], customs: List[Optional[List[Tuple]]],
+                     occupancy: Occupancy, margin_b2b: Decimal, margin_b2c: Decimal,
+                     rates: Dict[Tuple[str, str], Decimal], currency: Optional[str] = None
+                     ) -> List[Optional[Tuple[Decimal, Decimal, Decimal, str]]]:
+    """
+    Prices a grid of cells with price_cell, the cells sharing the same cost and custom costs being priced once.
+
+    :param costs: The resolved (base_per_pax, currency, single_multiplier) of each cell, None for unpriced cells
+    :param customs: The list of (value, percent, currency, mode, applies_to) custom costs of each cell, or None
+    :param occupancy: The occupancy to price for
+    :param margin_b2b: The B2B margin applied on top of COS
+    :param margin_b2c: The B2C margin applied on top of COS
+    :param rates: Mapping of (base, quote) -> rate used for currency conversion
+    :param currency: The display currency (defaults to the currency of the resolved cost of each cell)
+    :return: (cos, b2b, b2c, currency) of each cell (see price_cell), None for unpriced cells
+    """
+    positions = []
+    inputs = []
+    seen = {}
+    for cost, cell_customs in zip(costs, customs):
+        if cost is None:
+            positions.append(None)
+            continue
+
+        key = (cost, tuple(cell_customs) if cell_customs else ())
+        position = seen.get(key)
+        if position is None:
+            position = seen[key] = len(inputs)
+            inputs.append(key)
+        positions.append(position)
+
+    priced = [
+        price_cell(cost, cell_customs, occupancy, margin_b2b, margin_b2c, rates, currency)
+        for cost, cell_customs in inputs
+    ]
+
+    return [None if position is None else priced[position] for position in positions]
+
+
+def load_scope(season_id: uuid.UUID, ship_id: uuid.UUID, sailing_ids: Optional[List[uuid.UUID]] = None
+               ) -> Tuple[Season, List[uuid.UUID]]:
+    """
+    Validates a pricing scope and returns its season and sailing IDs (ordered by departure).
+
+    :param season_id: The season ID
+    :param ship_id: The ship ID
+    :param sailing_ids: Optional subset of sailings, all sailings of the ship in the season are used if omitted
+    :return: (season, sailing_ids)
+    """
+    season = get_object_or_404(Season, id=season_id)
+
+    sailings = Sailing.objects.filter(season_id=season_id, ship_id=ship_id)
+    if sailing_ids:
+        sailings = sailings.filter(id__in=sailing_ids)
+
+    resolved = list(sailings.order_by('departure_date').values_list('id', flat=True))
+
+    if sailing_ids:
+        unknown = set(sailing_ids) - set(resolved)
+        if unknown:
+            raise ValidationFailedError(
+                title='Invalid pricing scope',
+                detail='One or more sailings do not belong to the given season and ship',
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                errors=[{'field': 'sailing_ids', 'message': str(sailing_id)} for sailing_id in unknown],
+            )
+
+    return season, resolved
+
+
+def _build_cell(cabin_id, deck, category_id, is_archived, cost, override, customs, priced) -> Dict[str, Any]:
+    """
+    Derives the status of a priced cell. The sailing is filled in by the caller.
+    """
+    if is_archived:
+        cell_status = Status.ARCHIVED
+    elif cost is None:
+        cell_status = Status.UNPRICED
+    elif priced is None:
+        cell_status = Status.REVIEW  # Cost is known but cannot be converted to the display currency
+    elif override:
+        cell_status = Status.OVERRIDDEN
+    else:
+        cell_status = Status.PRICED
+
+    cos, b2b, b2c, cell_currency = priced or (None, None, None, None)
+
+    return {
+        'sailing': None,
+        'cabin': cabin_id,
+        'category': category_id,
+        'deck': deck,
+        'status': cell_status,
+        'effective_source': EffectiveSource.OVERRIDE if override else EffectiveSource.DEFAULT,
+        'is_overridden': override is not None,
+        'has_custom_costs': customs is not None,
+        'cos': cos,
+        'b2b': b2b,
+        'b2c': b2c,
+        'currency': cell_currency,
+        'price_display': {'amount': cos, 'currency': cell_currency} if priced else None,
+    }
+
+
+def resolve_scope(season_id: uuid.UUID, ship_id: uuid.UUID, sailing_ids: Optional[List[uuid.UUID]],
+                  fx_mode: FXMode, occupancy: Occupancy, currency: Optional[str] = None,
+                  season: Optional[Season] = None) -> Dict[str, Any]:
+    """
+    Resolves the effective price of every (sailing, cabin) cell in a season/ship scope.
+
+    The whole scope is loaded with a fixed number of set-based queries (season, sailings, cabins, season costs,
+    overrides, custom costs and FX rates) regardless of the number of cabins or sailings. The cost hierarchy is then
+    resolved in memory per cell (see resolve_cost), the season costs index being memoized across requests, and the
+    cells sharing the same inputs are priced once (see price_grid_dedup).
+
+    :param season_id: The season ID
+    :param ship_id: The ship ID
+    :param sailing_ids: Optional subset of sailings
+    :param fx_mode: Whether to convert using manual or live rates
+    :param occupancy: The occupancy to price for
+    :param currency: Optional display currency, prices stay in their cost currency if omitted
+    :param season: The season of the scope when already resolved by load_scope, sailing_ids being the resolved sailings
+    :return: dict with 'scope', 'season', 'cabins' and 'cells'
+    """
+    if season is None:
+        season, sailing_ids = load_scope(season_id, ship_id, sailing_ids)
+
+    cabins = list(
+        Cabin.objects.filter(ship_id=ship_id)
+        .order_by('deck', 'category__sort_order', 'number')
+        .values_list('id', 'deck', 'category_id', 'is_archived')
+    )
+
+    # Cells are addressed by (sailing index, cabin index) so the hot loop never hashes UUIDs
+    sailing_index = {sailing_id: i for i, sailing_id in enumerate(sailing_ids)}
+    cabin_index = {cabin[0]: i for i, cabin in enumerate(cabins)}
+
+    defaults = get_cost_index(season_id, ship_id)
+
+    overrides = {
+        (sailing_index[sailing_id], cabin_index[cabin_id]): (base_per_pax, cost_currency, single_multiplier)
+        for sailing_id, cabin_id, base_per_pax, cost_currency, single_multiplier in
+        CabinCostOverride.objects.filter(sailing_id__in=sailing_ids)
+        .values_list('sailing_id', 'cabin_id', 'base_per_pax', 'currency', 'single_multiplier')
+        if cabin_id in cabin_index
+    }
+
+    customs = defaultdict(list)
+    for sailing_id, cabin_id, *custom in (
+        CabinCostCustom.objects.filter(sailing_id__in=sailing_ids,
+                                       custom_cost__is_active=True,
+                                       custom_cost__ships=ship_id)
+        .values_list('sailing_id', 'cabin_id', 'value', 'percent', 'currency',
+                     'custom_cost__mode', 'custom_cost__applies_to')
+    ):
+        if cabin_id in cabin_index:
+            customs[(sailing_index[sailing_id], cabin_index[cabin_id])].append(tuple(custom))
+
+    currencies = {c[1] for c in defaults.values()} | {c[1] for c in overrides.values()}
+    currencies |= {c[2] for rows in customs.values() for c in rows}
+    if currency:
+        currencies.add(currency)
+    rates = load_fx_rates(fx_mode, currencies)
+
+    # A cell without override or custom costs prices the same on every sailing, so it is built once per cabin and
+    # copied for each sailing. The templates and the other cells are priced together, deduplicated.
+    cabin_costs = [resolve_cost(defaults, category_id, deck) for _, deck, category_id, _ in cabins]
+    special = sorted(overrides.keys() | customs.keys())
+    special_costs = [resolve_cost(defaults, cabins[c][2], cabins[c][1], overrides.get((s, c))) for s, c in special]
+
+    priced = price_grid_dedup(cabin_costs + special_costs,
+                              [None] * len(cabins) + [customs.get(key) for key in special],
+                              occupancy, season.default_margin_b2b, season.default_margin_b2c, rates, currency)
+
+    templates = [
+        _build_cell(cabin_id, deck, category_id, is_archived, cost, None, None, cell_priced)
+        for (cabin_id, deck, category_id, is_archived), cost, cell_priced in zip(cabins, cabin_costs, priced)
+    ]
+    special_cells = {
+        (s, c): _build_cell(*cabins[c], cost, overrides.get((s, c)), customs.get((s, c)), cell_priced)
+        for (s, c), cost, cell_priced in zip(special, special_costs, priced[len(cabins):])
+    }
+
+    cells = []
+    for s, sailing_id in enumerate(sailing_ids):
+        for c in range(len(cabins)):
+            cell = special_cells.get((s, c)) or templates[c].copy()
+            cell['sailing'] = sailing_id
+            cells.append(cell)
+
+    return {
+        'scope': {
+            'season': season.id,
+            'ship': ship_id,
+            'sailings': sailing_ids,
+            'fx_mode': fx_mode,
+            'occupancy': occupancy,
+            'currency': currency,
+        },
+        'season': season,
+        'cabins': cabins,
+        'cells': cells,
+    }
+
+
+def summarize_coverage(cells: List[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    Counts the cells of a resolved scope by pricing state. Archived cabins are only counted as archived, overridden
+    cells are not counted as priced.
+
+    :param cells: The resolved cells
+    :return: dict matching GraphCoverageOut
+    """
+    coverage = {'cabins_total': len(cells), 'priced': 0, 'unpriced': 0, 'overridden': 0, 'archived': 0}
+
+    for cell in cells:
+        if cell['status'] == Status.ARCHIVED:
+            coverage['archived'] += 1
+        elif cell['status'] == Status.UNPRICED:
+            coverage['unpriced'] += 1
+        elif cell['is_overridden']:
+            coverage['overridden'] += 1
+        else:
+            coverage['priced'] += 1
+
+    return coverage
+
+
+def build_pricing_graph(season_id: uuid.UUID, ship_id: uuid.UUID, sailing_ids: Optional[List[uuid.UUID]],
+                        fx_mode: FXMode, occupancy: Occupancy, currency: Optional[str] = None,
+                        season: Optional[Season] = None) -> Dict[str, Any]:
+    """
+    Builds the Pricing Interactive Graph for a scope: one cell per (sailing, cabin) displaying its COS.
+
+    :param season_id: The season ID
+    :param ship_id: The ship ID
+    :param sailing_ids: Optional subset of sailings
+    :param fx_mode: Whether to convert using manual or live rates
+    :param occupancy: The occupancy to price for
+    :param currency: Optional display currency
+    :param season: The season of the scope when already resolved by load_scope, sailing_ids being the resolved sailings
+    :return: dict matching PricingGraphOut
+    """
+    resolved = resolve_scope(season_id, ship_id, sailing_ids, fx_mode, occupancy, currency, season)
+
+    return {
+        'scope': resolved['scope'],
+        'coverage': summarize_coverage(resolved['cells']),
+        'cells': resolved['cells'],
+    }
+
+
+def build_pricing_graph_columns(season_id: uuid.UUID, ship_id: uuid.UUID, sailing_ids: Optional[List[uuid.UUID]],
+                                fx_mode: FXMode, occupancy: Occupancy, currency: Optional[str] = None,
+                                season: Optional[Season] = None) -> Dict[str, Any]:
+    """
+    Builds the Pricing Interactive Graph for a scope in a compact columnar layout, holding the same information as
+    build_pricing_graph without repeating identifiers in every cell.
+
+    Cabins are listed once (id, category index in 'categories', deck) and cells are parallel arrays laid out
+    sailing-major: cell i is the (sailing i // len(cabins), cabin i % len(cabins)) of the scope. A cell status is its
+    index in 'statuses', an amount is an integer scaled by 10^amount_scale and a currency is its index in
+    'currencies'.
+
+    :param season_id: The season ID
+    :param ship_id: The ship ID
+    :param sailing_ids: Optional subset of sailings
+    :param fx_mode: Whether to convert using manual or live rates
+    :param occupancy: The occupancy to price for
+    :param currency: Optional display currency
+    :param season: The season of the scope when already resolved by load_scope, sailing_ids being the resolved sailings
+    :return: dict matching PricingGraphColumnsOut
+    """
+    resolved = resolve_scope(season_id, ship_id, sailing_ids, fx_mode, occupancy, currency, season)
+    cabins = resolved['cabins']
+
+    category_index = {}
+    cabin_categories = [category_index.setdefault(category_id, len(category_index)) for _, _, category_id, _ in cabins]
+
+    currency_index = {}
+    statuses, overridden, amounts, currencies = [], [], [], []
+    for cell in resolved['cells']:
+        statuses.append(STATUS_CODES[cell['status']])
+        overridden.append(cell['is_overridden'])
+        if cell['cos'] is None:
+            amounts.append(None)
+            currencies.append(None)
+        else:
+            amounts.append(int(cell['cos'].scaleb(GRAPH_AMOUNT_SCALE)))
+            currencies.append(currency_index.setdefault(cell['currency'], len(currency_index)))
+
+    return {
+        'scope': resolved['scope'],
+        'coverage': summarize_coverage(resolved['cells']),
+        'statuses': list(Status),
+        'amount_scale': GRAPH_AMOUNT_SCALE,
+        'categories': list(category_index),
+        'currencies': list(currency_index),
+        'cabins': {
+            'id': [cabin_id for cabin_id, _, _, _ in cabins],
+            'category': cabin_categories,
+            'deck': [deck for _, deck, _, _ in cabins],
+        },
+        'cells': {
+            'status': statuses,
+            'is_overridden': overridden,
+            'amount': amounts,
+            'currency': currencies,
+        },
+    }
@@ -0,0 +1,264 @@
+import base64
+import binascii
+import hashlib
+import json
+import uuid
+from datetime import date
+from decimal import Decimal
+from typing import Optional, List, Dict, Any, Tuple
+
+from django.core.cache import cache
+from django.db.models import F, Q, Sum, Count
+from ninja_extra import status
+
+from common.exceptions import ValidationFailedError
+from fx.services.rates import fx_rate
+from pricing.models import EffectivePrice
+from pricing.schemas import FXMode, Occupancy, Status, EffectiveSource
+from pricing.services.engine import load_scope, load_fx_rates, round_money
+from pricing.services.projection import OCCUPANCY_COLUMNS
+from pricing.services.scope_cache import get_scope_versions
+from seasons_sailings.models import Season
+
+# Pricing list utilities
+LIST_TOTALS_CACHE_KEY = 'pricing:list-totals:{hash}'
+LIST_TOTALS_WINDOW = 3600  # 1 hour, totals are keyed by the version stamps of the scope so they are never stale
+LIST_DEFAULT_LIMIT = 100
+LIST_MAX_LIMIT = 500
+
+# Lines are ordered like the pricing graph (deck, category, cabin number) then by sailing departure. The same fields
+# make up the cursor, sailing_id being the unique tie-breaker.
+LIST_ORDERING = (
+    F('cabin__deck').asc(nulls_last=True),
+    'cabin__category__sort_order',
+    'cabin__number',
+    'sailing__departure_date',
+    'sailing_id',
+)
+
+
+def scope_hash(season_id: uuid.UUID, ship_id: uuid.UUID, sailing_ids: List[uuid.UUID], fx_mode: FXMode,
+               occupancy: Occupancy, currency: Optional[str] = None, versions: Optional[List[str]] = None) -> str:
+    """
+    Computes a stable hash identifying a pricing scope (the order of the sailings does not matter), optionally at
+    given version stamps of its inputs (see get_scope_versions).
+
+    :return: Hex digest of the scope
+    """
+    scope = [
+        str(season_id),
+        str(ship_id),
+        sorted(str(sailing_id) for sailing_id in sailing_ids),
+        FXMode(fx_mode).value,
+        Occupancy(occupancy).value,
+        currency,
+        versions,
+    ]
+    return hashlib.sha256(json.dumps(scope).encode()).hexdigest()
+
+
+def encode_cursor(line: Dict[str, Any]) -> str:
+    """
+    Encodes the sort key of a line into an opaque cursor.
+    """
+    key = [line['deck'], line['sort_order'], line['number'], line['departure_date'].isoformat(), str(line['sailing'])]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[str], int, str, date, uuid.UUID]:
+    """
+    Decodes a cursor produced by encode_cursor.
+
+    :return: (deck, sort_order, number, departure_date, sailing_id)
+    """
+    try:
+        deck, sort_order, number, departure_date, sailing_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return deck, int(sort_order), str(number), date.fromisoformat(departure_date), uuid.UUID(sailing_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise ValidationFailedError(
+            title='Invalid cursor',
+            detail='The cursor is malformed, use the next_cursor of a previous page',
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            errors=[{'field': 'cursor', 'message': 'Malformed cursor'}],
+        )
+
+
+def _after_cursor(cursor: str) -> Q:
+    """
+    Builds the filter selecting the lines sorted after the cursor (row comparison expanded so NULL decks, which are
+    sorted last, are handled).
+    """
+    deck, sort_order, number, departure_date, sailing_id = decode_cursor(cursor)
+
+    keys = [
+        ('cabin__category__sort_order', sort_order),
+        ('cabin__number', number),
+        ('sailing__departure_date', departure_date),
+        ('sailing_id', sailing_id),
+    ]
+
+    same_deck = Q()
+    for i, (lookup, value) in enumerate(keys):
+        equal = {prev_lookup: prev_value for prev_lookup, prev_value in keys[:i]}
+        same_deck |= Q(**equal, **{f'{lookup}__gt': value})
+
+    if deck is None:
+        return Q(cabin__deck__isnull=True) & same_deck
+
+    return Q(cabin__deck__gt=deck) | Q(cabin__deck__isnull=True) | (Q(cabin__deck=deck) & same_deck)
+
+
+def _line_status(line: Dict[str, Any], converted: Optional[Decimal]) -> Status:
+    """
+    Derives the status of a line, with the same precedence as the pricing graph.
+    """
+    if line['cabin'].is_archived:
+        return Status.ARCHIVED
+    if line['source'] is None:
+        return Status.UNPRICED
+    if converted is None:
+        return Status.REVIEW
+    if line['source'] == EffectiveSource.OVERRIDE:
+        return Status.OVERRIDDEN
+    return Status.PRICED
+
+
+def get_list_totals(season_id: uuid.UUID, ship_id: uuid.UUID, sailing_ids: List[uuid.UUID], fx_mode: FXMode,
+                    occupancy: Occupancy, currency: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Computes the line count and the COS/B2B/B2C totals of a scope with a single aggregate query over the effective
+    prices projection, grouped by cost currency and converted to the display currency. Results are cached by scope and
+    by the version stamps of its inputs.
+
+    Totals are None when the scope mixes cost currencies and no display currency is given, or when a rate is missing.
+    Archived cabins and lines without a price are left out of the totals.
+
+    :return: dict with 'count' and 'totals' (matching ListTotalsOut)
+    """
+    versions = get_scope_versions(season_id, ship_id, sailing_ids, fx_mode)
+    key = LIST_TOTALS_CACHE_KEY.format(hash=scope_hash(season_id, ship_id, sailing_ids, fx_mode, occupancy, currency,
+                                                       versions))
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    cos, b2b, b2c = OCCUPANCY_COLUMNS[occupancy]
+    counted = Q(cabin__is_archived=False)
+
+    groups = list(
+        EffectivePrice.objects.filter(sailing_id__in=sailing_ids)
+        .values('currency')
+        .annotate(lines=Count('*'),
+                  cos_total=Sum(cos, filter=counted),
+                  b2b_total=Sum(b2b, filter=counted),
+                  b2c_total=Sum(b2c, filter=counted))
+        .order_by()
+    )
+
+    count = sum(group['lines'] for group in groups)
+    priced = [group for group in groups if group['currency'] is not None and group['cos_total'] is not None]
+    currencies = {group['currency'] for group in priced}
+    target = currency or (next(iter(currencies)) if len(currencies) == 1 else None)
+
+    totals = None
+    if target is not None:
+        rates = load_fx_rates(fx_mode, currencies | {target})
+        sums = {'cos_total': Decimal(0), 'b2b_total': Decimal(0), 'b2c_total': Decimal(0)}
+
+        for group in priced:
+            rate = fx_rate(rates, group['currency'], target)
+            if rate is None:
+                break
+            for field in sums:
+                sums[field] += (group[field] or 0) * rate
+        else:
+            totals = {field: {'amount': round_money(amount), 'currency': target} for field, amount in sums.items()}
+
+    result = {'count': count, 'totals': totals}
+    cache.set(key, result, LIST_TOTALS_WINDOW)
+
+    return result
+
+
+def build_pricing_list(season_id: uuid.UUID, ship_id: uuid.UUID, sailing_ids: Optional[List[uuid.UUID]],
+                       fx_mode: FXMode, occupancy: Occupancy, currency: Optional[str] = None,
+                       cursor: Optional[str] = None, limit: int = LIST_DEFAULT_LIMIT,
+                       season: Optional[Season] = None) -> Dict[str, Any]:
+    """
+    Builds a page of the Pricing List view for a scope: one line per (sailing, cabin), read from the effective prices
+    projection and paginated with a keyset cursor so deep pages cost the same as the first one.
+
+    :param season_id: The season ID
+    :param ship_id: The ship ID
+    :param sailing_ids: Optional subset of sailings
+    :param fx_mode: Whether to convert to the display currency using manual or live rates
+    :param occupancy: The occupancy to price for
+    :param currency: Optional display currency, prices stay in their cost currency if omitted
+    :param cursor: The next_cursor of the previous page, the first page is returned if omitted
+    :param limit: The maximum number of lines in the page
+    :param season: The season of the scope when already resolved by load_scope, sailing_ids being the resolved sailings
+    :return: dict matching PricingListOut
+    """
+    if season is None:
+        season, sailing_ids = load_scope(season_id, ship_id, sailing_ids)
+    cos = OCCUPANCY_COLUMNS[occupancy][0]
+
+    lines = (
+        EffectivePrice.objects.filter(sailing_id__in=sailing_ids)
+        .select_related('cabin')
+        .annotate(cos=F(cos), deck=F('cabin__deck'), sort_order=F('cabin__category__sort_order'),
+                  number=F('cabin__number'), departure_date=F('sailing__departure_date'))
+        .order_by(*LIST_ORDERING)
+    )
+    if cursor:
+        lines = lines.filter(_after_cursor(cursor))
+
+    # One extra line tells whether there is a next page
+    page = [
+        {'sailing': line.sailing_id, 'cabin': line.cabin, 'source': line.source, 'currency': line.currency,
+         'cos': line.cos, 'deck': line.deck, 'sort_order': line.sort_order, 'number': line.number,
+         'departure_date': line.departure_date, 'has_custom_costs': line.has_custom_costs}
+        for line in lines[:limit + 1]
+    ]
+    has_next = len(page) > limit
+    page = page[:limit]
+
+    currencies = {line['currency'] for line in page if line['currency']}
+    rates = load_fx_rates(fx_mode, currencies | {currency}) if currency else {}
+
+    results = []
+    for line in page:
+        converted = None
+        if line['cos'] is not None:
+            rate = fx_rate(rates, line['currency'], currency) if currency else Decimal(1)
+            converted = round_money(line['cos'] * rate) if rate is not None else None
+
+        results.append({
+            'sailing': line['sailing'],
+            'cabin': line['cabin'],
+            'status': _line_status(line, converted),
+            'effective_source': EffectiveSource.OVERRIDE if line['source'] == EffectiveSource.OVERRIDE
+            else EffectiveSource.DEFAULT,
+            'price_display': {'amount': converted, 'currency': currency or line['currency']}
+            if converted is not None else None,
+            'has_custom_costs': line['has_custom_costs'],
+        })
+
+    summary = get_list_totals(season_id, ship_id, sailing_ids, fx_mode, occupancy, currency)
+
+    return {
+        'scope': {
+            'season': season.id,
+            'ship': ship_id,
+            'sailings': sailing_ids,
+            'fx_mode': fx_mode,
+            'occupancy': occupancy,
+            'currency': currency,
+        },
+        'totals': summary['totals'],
+        'page': {
+            'count': summary['count'],
+            'next_cursor': encode_cursor(page[-1]) if has_next else None,
+            'results': results,
+        },
+    }
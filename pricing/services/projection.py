@@ -0,0 +1,83 @@
+import uuid
+from typing import Optional, List, Dict
+
+from django.db import connection
+from django.db.models import F, Sum, QuerySet
+from django.db.models.functions import Coalesce
+
+from pricing.models import EffectivePrice, SailingCoverage
+from pricing.schemas import Occupancy
+from pricing.services.engine import load_scope
+from seasons_sailings.models import Sailing
+from ships_cabins.models import Cabin
+
+# Effective price projection utilities
+OCCUPANCY_COLUMNS = {
+    Occupancy.DOUBLE: ('cos_double', 'b2b_double', 'b2c_double'),
+    Occupancy.SINGLE: ('cos_single', 'b2b_single', 'b2c_single'),
+}
+COVERAGE_FIELDS = ('cabins_total', 'priced', 'unpriced', 'overridden', 'archived')
+
+
+def refresh_effective_prices(sailing_ids: Optional[List[uuid.UUID]] = None) -> int:
+    """
+    Re-resolves the effective prices of every cell of the given sailings (or of every sailing). The projection is kept
+    up to date by triggers, this is only needed to rebuild it (e.g. after a bulk load with triggers disabled).
+
+    :param sailing_ids: Optional sailings to refresh, all sailings are refreshed if omitted
+    :return: The number of cells refreshed
+    """
+    sailings = Sailing.objects.all()
+    if sailing_ids:
+        sailings = sailings.filter(id__in=sailing_ids)
+
+    cells = list(
+        Cabin.objects.filter(ship__sailing__in=sailings)
+        .values_list('ship__sailing__id', 'id')
+    )
+    if not cells:
+        return 0
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT refresh_effective_prices(%s::uuid[], %s::uuid[])',
+            [[sailing_id for sailing_id, _ in cells], [cabin_id for _, cabin_id in cells]]
+        )
+
+    return len(cells)
+
+
+def get_effective_prices(sailing_ids: List[uuid.UUID], occupancy: Occupancy) -> QuerySet:
+    """
+    Reads the projected prices of the cells of the given sailings for an occupancy. Prices are expressed in the
+    currency of the resolved cost (custom costs being converted with manual rates).
+
+    :param sailing_ids: The sailings to read
+    :param occupancy: The occupancy to read prices for
+    :return: Values queryset of sailing, cabin, source, currency, cos, b2b, b2c and has_custom_costs
+    """
+    cos, b2b, b2c = OCCUPANCY_COLUMNS[occupancy]
+
+    return (
+        EffectivePrice.objects.filter(sailing_id__in=sailing_ids)
+        .annotate(cos=F(cos), b2b=F(b2b), b2c=F(b2c))
+        .values('sailing_id', 'cabin_id', 'source', 'currency', 'cos', 'b2b', 'b2c', 'has_custom_costs')
+    )
+
+
+def get_scope_coverage(season_id: uuid.UUID, ship_id: uuid.UUID,
+                       sailing_ids: Optional[List[uuid.UUID]] = None) -> Dict[str, int]:
+    """
+    Gets the pricing coverage of a scope by summing the coverage counters of its sailings, which are kept up to date by
+    triggers. Counts match the coverage of the pricing graph of the same scope.
+
+    :param season_id: The season ID
+    :param ship_id: The ship ID
+    :param sailing_ids: Optional subset of sailings
+    :return: dict matching GraphCoverageOut
+    """
+    _, sailing_ids = load_scope(season_id, ship_id, sailing_ids)
+
+    return SailingCoverage.objects.filter(sailing_id__in=sailing_ids).aggregate(
+        **{field: Coalesce(Sum(field), 0) for field in COVERAGE_FIELDS}
+    )
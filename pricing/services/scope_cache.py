@@ -0,0 +1,130 @@
+import hashlib
+import json
+import uuid
+from typing import Optional, List, Dict, Any
+
+from django.core.cache import cache
+
+from fx.services.rates import sync_rate_matrix
+from pricing.models import PricingVersion
+from pricing.schemas import FXMode, Occupancy
+from pricing.services.costs import get_cost_stamp
+
+# Pricing scope response cache. Entries are keyed by the scope and by the version stamps of every input of the
+# response, which triggers replace within the transaction changing them (see PricingVersion): once a change is
+# committed, the responses cached before it are never read again and simply expire.
+SCOPE_CACHE_KEY = 'pricing:scope:{view}:{hash}'
+SCOPE_CACHE_WINDOW = 3600  # 1 hour, only bounds the memory held by entries of replaced versions
+SCOPE_CACHE_STATS_KEY = 'pricing:scope-cache-stats:{view}:{outcome}'
+SCOPE_CACHE_VIEWS = ('graph', 'lines')
+NO_VERSION_STAMP = 'none'  # entities never changed since the versions were introduced
+
+
+def get_scope_versions(season_id: uuid.UUID, ship_id: uuid.UUID, sailing_ids: List[uuid.UUID],
+                       fx_mode: FXMode) -> List[str]:
+    """
+    Gets the version stamps of every input of a pricing scope: the season (margins), the ship (cabins, categories and
+    custom costs), each sailing (overrides and custom costs), the FX rates of the mode and the season costs. The
+    manual rates are included in every mode: the effective prices projection behind the lines and totals converts
+    fixed custom costs with them (see manual_fx_rate()), and refreshing it for a rate change bumps no sailing stamp.
+
+    :param season_id: The season ID
+    :param ship_id: The ship ID
+    :param sailing_ids: The resolved sailings of the scope
+    :param fx_mode: Whether the scope uses manual or live rates
+    :return: List of stamps
+    """
+    fx_key = f'fx:{FXMode(fx_mode).value}'
+    keys = [f'season:{season_id}', f'ship:{ship_id}', f'fx:{FXMode.MANUAL.value}']
+    if fx_key not in keys:
+        keys.append(fx_key)
+    keys += [f'sailing:{sailing_id}' for sailing_id in sailing_ids]
+
+    stamps = {
+        key: str(stamp) for key, stamp in PricingVersion.objects.filter(key__in=keys).values_list('key', 'stamp')
+    }
+
+    # The response is built from the rates held in process, which must be the ones of the stamp in the key
+    sync_rate_matrix(fx_mode, stamps.get(fx_key, NO_VERSION_STAMP))
+
+    return [stamps.get(key, NO_VERSION_STAMP) for key in keys] + [get_cost_stamp(season_id, ship_id)]
+
+
+def scope_cache_key(view: str, season_id: uuid.UUID, ship_id: uuid.UUID, sailing_ids: List[uuid.UUID],
+                    fx_mode: FXMode, occupancy: Occupancy, currency: Optional[str] = None, *extra: Any) -> str:
+    """
+    Computes the cache key of a pricing scope response, which changes whenever one of its inputs changes.
+
+    :param view: The cached view, one of SCOPE_CACHE_VIEWS
+    :param season_id: The season ID
+    :param ship_id: The ship ID
+    :param sailing_ids: The resolved sailings of the scope, in display order
+    :param fx_mode: Whether to convert using manual or live rates
+    :param occupancy: The occupancy priced
+    :param currency: Optional display currency
+    :param extra: Other parameters of the view (e.g. the page cursor), which must be JSON serializable
+    :return: The cache key
+    """
+    scope = [
+        view,
+        str(season_id),
+        str(ship_id),
+        [str(sailing_id) for sailing_id in sailing_ids],
+        FXMode(fx_mode).value,
+        Occupancy(occupancy).value,
+        currency,
+        list(extra),
+        get_scope_versions(season_id, ship_id, sailing_ids, fx_mode),
+    ]
+    return SCOPE_CACHE_KEY.format(view=view, hash=hashlib.sha256(json.dumps(scope).encode()).hexdigest())
+
+
+def get_cached_scope(view: str, key: str) -> Optional[bytes]:
+    """
+    Gets a cached pricing scope response, recording the hit or miss.
+
+    :param view: The cached view, one of SCOPE_CACHE_VIEWS
+    :param key: The key computed by scope_cache_key
+    :return: The rendered response, or None on a miss
+    """
+    content = cache.get(key)
+    cache.incr(SCOPE_CACHE_STATS_KEY.format(view=view, outcome='hits' if content is not None else 'misses'),
+               ignore_key_check=True)
+
+    return content
+
+
+def set_cached_scope(key: str, content: bytes):
+    """
+    Caches a rendered pricing scope response.
+
+    :param key: The key computed by scope_cache_key
+    :param content: The rendered response
+    """
+    cache.set(key, content, SCOPE_CACHE_WINDOW)
+
+
+def get_scope_cache_stats() -> List[Dict[str, Any]]:
+    """
+    Gets the hit/miss counters of the pricing scope response cache, per view.
+
+    :return: List of dict matching ScopeCacheStatsOut
+    """
+    keys = {
+        (view, outcome): SCOPE_CACHE_STATS_KEY.format(view=view, outcome=outcome)
+        for view in SCOPE_CACHE_VIEWS for outcome in ('hits', 'misses')
+    }
+    counters = cache.get_many(keys.values())
+
+    stats = []
+    for view in SCOPE_CACHE_VIEWS:
+        hits = int(counters.get(keys[(view, 'hits')]) or 0)
+        misses = int(counters.get(keys[(view, 'misses')]) or 0)
+        stats.append({
+            'view': view,
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': hits / (hits + misses) if hits + misses else None,
+        })
+
+    return stats
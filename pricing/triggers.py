@@ -0,0 +1,216 @@
+import pgtrigger
+
+from common.triggers import transition_trgs
+
+# Triggers keeping the effective_prices projection in sync with its pricing inputs. Every trigger collects the
+# (sailing, cabin) cells affected by a statement and hands them to refresh_effective_prices() (see the pricing
+# migrations) which re-resolves them in a single upsert. The SQL below is used with common.triggers.transition_trgs,
+# `{changed}` being the rows touched by the statement.
+
+REFRESH_CHANGED_CELLS_SQL = """
+                PERFORM refresh_effective_prices(array_agg(changed.sailing_id), array_agg(changed.cabin_id))
+                FROM {changed} AS changed;
+"""
+
+REFRESH_SEASON_SHIP_COSTS_SQL = """
+                PERFORM refresh_effective_prices(array_agg(s.id), array_agg(cb.id))
+                FROM (SELECT DISTINCT season_id, ship_id, category_id FROM {changed} AS c) AS changed
+                JOIN sailings s ON s.season_id = changed.season_id AND s.ship_id = changed.ship_id
+                JOIN cabins cb ON cb.ship_id = changed.ship_id AND cb.category_id = changed.category_id;
+"""
+
+BUMP_SEASON_SHIP_COST_VERSION_SQL = """
+                INSERT INTO season_ship_cost_versions (season_id, ship_id, stamp, updated_at)
+                SELECT changed.season_id, changed.ship_id, gen_random_uuid(), NOW()
+                FROM (SELECT DISTINCT season_id, ship_id FROM {changed} AS c) AS changed
+                ON CONFLICT (season_id, ship_id) DO UPDATE SET stamp = EXCLUDED.stamp, updated_at = EXCLUDED.updated_at;
+"""
+
+# Rates may be triangulated through a pivot currency (see manual_fx_rate()), so a changed pair affects every cell with
+# custom costs converted from or to one of its currencies
+REFRESH_FX_RATES_SQL = """
+                PERFORM refresh_effective_prices(array_agg(ep.sailing_id), array_agg(ep.cabin_id))
+                FROM effective_prices ep
+                WHERE ep.has_custom_costs AND EXISTS (
+                    SELECT 1
+                    FROM cabin_cost_customs ccc
+                    JOIN {changed} AS changed
+                      ON changed.base IN (ccc.currency, ep.currency) OR changed.quote IN (ccc.currency, ep.currency)
+                    WHERE ccc.sailing_id = ep.sailing_id AND ccc.cabin_id = ep.cabin_id
+                      AND ccc.currency <> ep.currency
+                );
+"""
+
+REFRESH_SHIP_CUSTOM_COSTS_SQL = """
+                PERFORM refresh_effective_prices(array_agg(ccc.sailing_id), array_agg(ccc.cabin_id))
+                FROM cabin_cost_customs ccc
+                JOIN sailings s ON s.id = ccc.sailing_id
+                JOIN {changed} AS changed ON changed.ship_id = s.ship_id AND changed.custom_cost_id = ccc.custom_cost_id;
+"""
+
+REFRESH_NEW_SAILINGS_SQL = """
+                PERFORM refresh_effective_prices(array_agg(changed.id), array_agg(cb.id))
+                FROM {changed} AS changed
+                JOIN cabins cb ON cb.ship_id = changed.ship_id;
+"""
+
+REFRESH_NEW_CABINS_SQL = """
+                PERFORM refresh_effective_prices(array_agg(s.id), array_agg(changed.id))
+                FROM {changed} AS changed
+                JOIN sailings s ON s.ship_id = changed.ship_id;
+"""
+
+DELETE_SAILING_CELLS_SQL = """
+                DELETE FROM effective_prices ep USING {changed} AS changed WHERE ep.sailing_id = changed.id;
+"""
+
+DELETE_CABIN_CELLS_SQL = """
+                DELETE FROM effective_prices ep USING {changed} AS changed WHERE ep.cabin_id = changed.id;
+"""
+
+# Coverage counters are recounted from the projection, see refresh_sailing_coverage() in the pricing migrations
+REFRESH_SAILING_COVERAGE_SQL = """
+                PERFORM refresh_sailing_coverage(array_agg(DISTINCT changed.sailing_id))
+                FROM {changed} AS changed;
+"""
+
+# Version stamps of the inputs of the cached pricing responses (see PricingVersion). `{keys}` is a query over the
+# changed rows returning the `key` of every entity whose stamp must be replaced.
+BUMP_PRICING_VERSIONS_SQL = """
+                INSERT INTO pricing_versions (key, stamp, updated_at)
+                SELECT changed_keys.key, gen_random_uuid(), NOW()
+                FROM (SELECT DISTINCT k.key FROM ({keys}) AS k) AS changed_keys
+                ORDER BY changed_keys.key
+                ON CONFLICT (key) DO UPDATE SET stamp = EXCLUDED.stamp, updated_at = EXCLUDED.updated_at;
+"""
+
+
+def pricing_versions_sql(keys):
+    """
+    SQL replacing the pricing version stamps of the entities selected by the given query.
+
+    :param keys: A query over `{changed}` selecting a `key` column (e.g. 'sailing:' || changed.sailing_id)
+    :return: The SQL to use with common.triggers.transition_trgs
+    """
+    return BUMP_PRICING_VERSIONS_SQL.replace('{keys}', keys.strip())
+
+
+BUMP_CELL_VERSIONS_SQL = pricing_versions_sql("""
+                SELECT 'sailing:' || changed.sailing_id AS key FROM {changed} AS changed
+""")
+
+BUMP_SAILING_VERSIONS_SQL = pricing_versions_sql("""
+                SELECT 'sailing:' || changed.id AS key FROM {changed} AS changed
+""")
+
+BUMP_SEASON_VERSIONS_SQL = pricing_versions_sql("""
+                SELECT 'season:' || changed.id AS key FROM {changed} AS changed
+""")
+
+BUMP_SHIP_VERSIONS_SQL = pricing_versions_sql("""
+                SELECT 'ship:' || changed.ship_id AS key FROM {changed} AS changed
+""")
+
+BUMP_CATEGORY_SHIP_VERSIONS_SQL = pricing_versions_sql("""
+                SELECT 'ship:' || cb.ship_id AS key
+                FROM {changed} AS changed
+                JOIN cabins cb ON cb.category_id = changed.id
+""")
+
+BUMP_CUSTOM_COST_SHIP_VERSIONS_SQL = pricing_versions_sql("""
+                SELECT 'ship:' || scc.ship_id AS key
+                FROM {changed} AS changed
+                JOIN ship_custom_costs scc ON scc.custom_cost_id = changed.id
+""")
+
+BUMP_FX_MANUAL_VERSIONS_SQL = pricing_versions_sql("""
+                SELECT 'fx:manual' AS key FROM {changed} AS changed
+""")
+
+BUMP_FX_LIVE_VERSIONS_SQL = pricing_versions_sql("""
+                SELECT 'fx:live' AS key FROM {changed} AS changed
+""")
+
+
+def effective_price_row_trg(trg_name, sql, condition):
+    """
+    Definition for a row-level trigger refreshing effective prices when some columns of a (rarely updated) row change.
+
+    :param trg_name: The name of the trigger.
+    :param sql: The PL/pgSQL statements to run, NEW and OLD refer to the updated row.
+    :param condition: The pgtrigger condition limiting when the trigger fires.
+    :return: The trigger definition.
+    """
+    return pgtrigger.Trigger(
+        name=trg_name,
+        when=pgtrigger.After,
+        operation=pgtrigger.Update,
+        level=pgtrigger.Row,
+        condition=condition,
+        func=pgtrigger.Func(
+            f"""
+            BEGIN
+                {sql.strip()}
+                RETURN NULL;
+            END;
+            """
+        )
+    )
+
+
+def season_margins_trg(trg_name):
+    """
+    Definition for trigger refreshing every cell of a season when its default margins change.
+    """
+    return effective_price_row_trg(trg_name, """
+                PERFORM refresh_effective_prices(array_agg(s.id), array_agg(cb.id))
+                FROM sailings s
+                JOIN cabins cb ON cb.ship_id = s.ship_id
+                WHERE s.season_id = NEW.id;
+    """, pgtrigger.AnyChange('default_margin_b2b', 'default_margin_b2c'))
+
+
+def sailing_moved_trg(trg_name):
+    """
+    Definition for trigger rebuilding the cells of a sailing moved to another season or ship.
+    """
+    return effective_price_row_trg(trg_name, """
+                DELETE FROM effective_prices WHERE sailing_id = NEW.id;
+                PERFORM refresh_effective_prices(array_agg(NEW.id), array_agg(cb.id))
+                FROM cabins cb
+                WHERE cb.ship_id = NEW.ship_id;
+    """, pgtrigger.AnyChange('season', 'ship'))
+
+
+def cabin_moved_trg(trg_name):
+    """
+    Definition for trigger rebuilding the cells of a cabin whose ship, category or deck changed.
+    """
+    return effective_price_row_trg(trg_name, """
+                DELETE FROM effective_prices WHERE cabin_id = NEW.id;
+                PERFORM refresh_effective_prices(array_agg(s.id), array_agg(NEW.id))
+                FROM sailings s
+                WHERE s.ship_id = NEW.ship_id;
+    """, pgtrigger.AnyChange('ship', 'category', 'deck'))
+
+
+def custom_cost_changed_trg(trg_name):
+    """
+    Definition for trigger refreshing the cells using a custom cost whose activation or calculation changed.
+    """
+    return effective_price_row_trg(trg_name, """
+                PERFORM refresh_effective_prices(array_agg(ccc.sailing_id), array_agg(ccc.cabin_id))
+                FROM cabin_cost_customs ccc
+                WHERE ccc.custom_cost_id = NEW.id;
+    """, pgtrigger.AnyChange('is_active', 'mode', 'applies_to'))
+
+
+def cabin_archived_trg(trg_name):
+    """
+    Definition for trigger recounting the coverage of the sailings of a cabin archived or restored.
+    """
+    return effective_price_row_trg(trg_name, """
+                PERFORM refresh_sailing_coverage(array_agg(s.id))
+                FROM sailings s
+                WHERE s.ship_id = NEW.ship_id;
+    """, pgtrigger.AnyChange('is_archived'))
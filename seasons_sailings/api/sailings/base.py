@@ -1,3 +1,7 @@
+import uuid
+from typing import Optional
+
+from django.http import StreamingHttpResponse
 from ninja import Router
 
 from ninja_extra import paginate
@@ -8,6 +12,7 @@ from seasons_sailings.schemas import (
     ValidateOverlapSailingsIn, ValidateOverlapSailingsOut,
     SummaryOut, CabinAvailabilityOut,
 )
+from selling.services.availability import get_sailing_availability as get_availability, stream_sailing_availability
 from ships_cabins.schemas import CabinOut
 
 router = Router(tags=['F2. Sailing'])
@@ -59,7 +64,29 @@ def get_sailing_cabins(request, sailing_id):
     """
 
 @router.get('/{sailing_id}/availability', response=NinjaPaginationResponseSchema[CabinAvailabilityOut])
-def get_sailing_availability(request, sailing_id):
+@paginate()
+def get_sailing_availability(request, sailing_id: uuid.UUID):
     """
     Returns the per-cabin availability status for the sailing.
-    """
\ No newline at end of file
+
+    Note: read from the per-sailing availability bitsets kept in Redis (see selling.services.availability), in cabin
+    map order.
+    """
+    return get_availability(sailing_id)
+
+@router.get('/{sailing_id}/availability/stream')
+async def stream_availability(request, sailing_id: uuid.UUID, cursor: Optional[str] = None):
+    """
+    Streams the availability of the sailing as server-sent events (text/event-stream): a "snapshot" event listing
+    every cabin like the availability endpoint, then "reserved", "released", "booked" and "cancelled" events as cabins
+    change state.
+
+    Note: each event has an id to resume from after a disconnect, sent back as the Last-Event-ID header (or the cursor
+    parameter). A fresh snapshot is sent when the changes since can no longer be replayed. Requires the ASGI app.
+    """
+    events = await stream_sailing_availability(sailing_id, cursor or request.headers.get('Last-Event-ID'))
+
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # no proxy buffering, events are sent as they happen
+    return response
\ No newline at end of file
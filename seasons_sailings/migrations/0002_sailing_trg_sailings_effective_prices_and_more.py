@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-17 03:07
+
+import pgtrigger.compiler
+import pgtrigger.migrations
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seasons_sailings', '0001_initial'),
+    ]
+
+    operations = [
+        pgtrigger.migrations.AddTrigger(
+            model_name='sailing',
+            trigger=pgtrigger.compiler.Trigger(name='trg_sailings_effective_prices', sql=pgtrigger.compiler.UpsertTriggerSql(condition='WHEN (OLD."season_id" IS DISTINCT FROM (NEW."season_id") OR OLD."ship_id" IS DISTINCT FROM (NEW."ship_id"))', func='\n            BEGIN\n                DELETE FROM effective_prices WHERE sailing_id = NEW.id;\n                PERFORM refresh_effective_prices(array_agg(NEW.id), array_agg(cb.id))\n                FROM cabins cb\n                WHERE cb.ship_id = NEW.ship_id;\n                RETURN NULL;\n            END;\n            ', hash='89b5245cfc9af95a984f9d7d3e0b39b2686b09c5', operation='UPDATE', pgid='pgtrigger_trg_sailings_effective_prices_36c23', table='sailings', when='AFTER')),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='sailing',
+            trigger=pgtrigger.compiler.Trigger(name='trg_sailings_effective_prices_ins', sql=pgtrigger.compiler.UpsertTriggerSql(func='\n            BEGIN\n                PERFORM refresh_effective_prices(array_agg(changed.id), array_agg(cb.id))\n                FROM (SELECT * FROM new_values) AS changed\n                JOIN cabins cb ON cb.ship_id = changed.ship_id;\n                RETURN NULL;\n            END;\n            ', hash='00e926effd36fb29f72728f6b59aea2748b83e6c', level='STATEMENT', operation='INSERT', pgid='pgtrigger_trg_sailings_effective_prices_ins_3881a', referencing='REFERENCING NEW TABLE AS new_values ', table='sailings', when='AFTER')),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='sailing',
+            trigger=pgtrigger.compiler.Trigger(name='trg_sailings_effective_prices_del', sql=pgtrigger.compiler.UpsertTriggerSql(func='\n            BEGIN\n                DELETE FROM effective_prices ep USING (SELECT * FROM old_values) AS changed WHERE ep.sailing_id = changed.id;\n                RETURN NULL;\n            END;\n            ', hash='1a56942b34c7af900e08b120ca4d73f92e6f340c', level='STATEMENT', operation='DELETE', pgid='pgtrigger_trg_sailings_effective_prices_del_5b85b', referencing='REFERENCING OLD TABLE AS old_values ', table='sailings', when='AFTER')),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='season',
+            trigger=pgtrigger.compiler.Trigger(name='trg_seasons_effective_prices', sql=pgtrigger.compiler.UpsertTriggerSql(condition='WHEN (OLD."default_margin_b2b" IS DISTINCT FROM (NEW."default_margin_b2b") OR OLD."default_margin_b2c" IS DISTINCT FROM (NEW."default_margin_b2c"))', func='\n            BEGIN\n                PERFORM refresh_effective_prices(array_agg(s.id), array_agg(cb.id))\n                FROM sailings s\n                JOIN cabins cb ON cb.ship_id = s.ship_id\n                WHERE s.season_id = NEW.id;\n                RETURN NULL;\n            END;\n            ', hash='6ab7415299483ccc71da9b056136b9ac42fd00f0', operation='UPDATE', pgid='pgtrigger_trg_seasons_effective_prices_5c895', table='seasons', when='AFTER')),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-17 04:00
+
+import pgtrigger.compiler
+import pgtrigger.migrations
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pricing', '0006_pricingversion_and_more'),
+        ('seasons_sailings', '0002_sailing_trg_sailings_effective_prices_and_more'),
+    ]
+
+    operations = [
+        pgtrigger.migrations.AddTrigger(
+            model_name='sailing',
+            trigger=pgtrigger.compiler.Trigger(name='trg_sailings_pricing_versions_upd', sql=pgtrigger.compiler.UpsertTriggerSql(func="\n            BEGIN\n                INSERT INTO pricing_versions (key, stamp, updated_at)\n                SELECT changed_keys.key, gen_random_uuid(), NOW()\n                FROM (SELECT DISTINCT k.key FROM (SELECT 'sailing:' || changed.id AS key FROM (SELECT * FROM new_values UNION ALL SELECT * FROM old_values) AS changed) AS k) AS changed_keys\n                ORDER BY changed_keys.key\n                ON CONFLICT (key) DO UPDATE SET stamp = EXCLUDED.stamp, updated_at = EXCLUDED.updated_at;\n                RETURN NULL;\n            END;\n            ", hash='49f178ef2a15579e2fd5d24e2b7085602ec3f4a5', level='STATEMENT', operation='UPDATE', pgid='pgtrigger_trg_sailings_pricing_versions_upd_3ccaf', referencing='REFERENCING OLD TABLE AS old_values  NEW TABLE AS new_values ', table='sailings', when='AFTER')),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='season',
+            trigger=pgtrigger.compiler.Trigger(name='trg_seasons_pricing_versions_upd', sql=pgtrigger.compiler.UpsertTriggerSql(func="\n            BEGIN\n                INSERT INTO pricing_versions (key, stamp, updated_at)\n                SELECT changed_keys.key, gen_random_uuid(), NOW()\n                FROM (SELECT DISTINCT k.key FROM (SELECT 'season:' || changed.id AS key FROM (SELECT * FROM new_values UNION ALL SELECT * FROM old_values) AS changed) AS k) AS changed_keys\n                ORDER BY changed_keys.key\n                ON CONFLICT (key) DO UPDATE SET stamp = EXCLUDED.stamp, updated_at = EXCLUDED.updated_at;\n                RETURN NULL;\n            END;\n            ", hash='e3645d17fdfe4c1f5fc2f6dbdeeec81dd415aadc', level='STATEMENT', operation='UPDATE', pgid='pgtrigger_trg_seasons_pricing_versions_upd_a1b13', referencing='REFERENCING OLD TABLE AS old_values  NEW TABLE AS new_values ', table='seasons', when='AFTER')),
+        ),
+    ]
@@ -1,10 +1,13 @@
+import pgtrigger
 from django.db import models
 from django.contrib.postgres.functions import RandomUUID
 from django.contrib.postgres.constraints import ExclusionConstraint
 from django.contrib.postgres.fields import DateRangeField, RangeOperators
 
 from common.functions import TxNow
-from common.triggers import set_updated_at_trg
+from common.triggers import set_updated_at_trg, transition_trgs
+from pricing.triggers import (REFRESH_NEW_SAILINGS_SQL, DELETE_SAILING_CELLS_SQL, BUMP_SEASON_VERSIONS_SQL,
+                              BUMP_SAILING_VERSIONS_SQL, season_margins_trg, sailing_moved_trg)
 
 class Season(models.Model):
     id = models.UUIDField(primary_key=True, db_default=RandomUUID())
@@ -41,6 +44,8 @@ class Season(models.Model):
         ]
         triggers = [
             set_updated_at_trg('trg_seasons_updated'),
+            season_margins_trg('trg_seasons_effective_prices'),
+            *transition_trgs('trg_seasons_pricing_versions', BUMP_SEASON_VERSIONS_SQL, operations=(pgtrigger.Update,)),
         ]
 
 class SeasonShip(models.Model):
@@ -85,5 +90,10 @@ class Sailing(models.Model):
         ]
         triggers = [
             set_updated_at_trg('trg_sailings_updated'),
+            sailing_moved_trg('trg_sailings_effective_prices'),
+            *transition_trgs('trg_sailings_effective_prices', REFRESH_NEW_SAILINGS_SQL, operations=(pgtrigger.Insert,)),
+            *transition_trgs('trg_sailings_effective_prices', DELETE_SAILING_CELLS_SQL, operations=(pgtrigger.Delete,)),
+            *transition_trgs('trg_sailings_pricing_versions', BUMP_SAILING_VERSIONS_SQL,
+                             operations=(pgtrigger.Update,)),
         ]
 
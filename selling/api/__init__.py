@@ -1,5 +1,7 @@
 from ninja import Router
 
+from ninja_jwt.authentication import JWTAuth
+
 from .zoho.base import router as zoho_base_router
 from .holds.base import router as holds_base_router
 from .bookings.base import router as bookings_base_router
@@ -12,7 +14,7 @@ holds_router = Router()
 holds_router.add_router('', holds_base_router)
 
 bookings_router = Router()
-bookings_router.add_router('', bookings_base_router)
+bookings_router.add_router('', bookings_base_router, auth=JWTAuth())
 
 release_requests_router = Router()
 release_requests_router.add_router('', release_requests_base_router)
@@ -2,14 +2,17 @@ from typing import Union
 
 from ninja import Router
 
-from ninja_extra import paginate
+from ninja_extra import paginate, status
 from ninja_extra.schemas import NinjaPaginationResponseSchema
 
+from common.exceptions import APIBaseError
+
 from selling.schemas import (
     BookingOut, BookingInFromHold, BookingInDirect,
     CancellationQuoteIn, CancellationQuoteOut,
     CancellationIn, CancellationOut,
 )
+from selling.services.bookings import create_booking_from_hold
 
 router = Router(tags=['I3 + I4. Booking'])
 
@@ -17,7 +20,20 @@ router = Router(tags=['I3 + I4. Booking'])
 def create_booking(request, payload: Union[BookingInFromHold, BookingInDirect]):
     """
     Creates a booking either by converting a hold into a booking or directly. Stores a pricing snapshot.
+
+    Note: a hold is converted by its holder while active, concurrent conversions of a hold create a single booking
+    (409 for the others). Send an Idempotency-Key header to retry safely, a retry returns the booking created by the
+    first request.
     """
+    if payload.mode == 'from_hold':
+        return create_booking_from_hold(request.auth, payload.hold, payload.occupancy_mode, payload.acknowledge_policy,
+                                        idempotency_key=request.headers.get('Idempotency-Key'))
+
+    raise APIBaseError(
+        title='Direct bookings not supported',
+        detail='Cabins are booked by converting a hold, hold the cabin first',
+        status=status.HTTP_501_NOT_IMPLEMENTED,
+    )
 
 @router.get('/bookings', response=NinjaPaginationResponseSchema[BookingOut])
 @paginate()
@@ -1,12 +1,16 @@
+import uuid
+
 from ninja import Router
+from ninja_jwt.authentication import JWTAuth
 
 from ninja_extra import paginate
 from ninja_extra.schemas import NinjaPaginationResponseSchema
 
 from selling.schemas import (
-    HoldOut, HoldIn, HoldExtensionOut, HoldReleaseOut,
+    HoldOut, HoldIn, HoldBatchIn, HoldBatchOut, HoldExtensionOut, HoldReleaseOut,
     ReasonIn, ReleaseRequestOut,
 )
+from selling.services.holds import extend_hold_expiry, create_hold as create_hold_for, create_holds
 
 router = Router(tags=['I2. Reserve'])
 
@@ -17,25 +21,46 @@ def list_holds(request):
     Returns a list of holds.
     """
 
-@router.get('/{hold_id}', response=HoldOut)
-def get_hold(request, hold_id):
+@router.get('/{uuid:hold_id}', response=HoldOut)
+def get_hold(request, hold_id: uuid.UUID):
     """
     Returns a single holds details.
     """
 
-@router.post('', response=HoldOut)
+@router.post('', response=HoldOut, auth=JWTAuth())
 def create_hold(request, payload: HoldIn):
     """
     Creates a new hold (reserve a cabin) with an expiry computed from the reserve policy (reserve_settings).
+
+    Note: send an Idempotency-Key header to retry safely, a retry returns the hold created by the first request
+    (409 if the key was used for a different request). A cabin already held or booked on the sailing is a 409.
+    """
+    return create_hold_for(request.auth, payload.sailing, payload.cabin, payload.uc_ref,
+                           idempotency_key=request.headers.get('Idempotency-Key'))
+
+@router.post('/batch', response=HoldBatchOut, auth=JWTAuth())
+def create_hold_batch(request, payload: HoldBatchIn):
     """
+    Creates the holds of several cabins of a sailing (e.g. a group sale) in one request, all expiring at the same time
+    computed from the reserve policy (reserve_settings).
 
-@router.post('/{hold_id}/extend', response=HoldExtensionOut)
-def extend_hold(request, hold_id):
+    Returns the outcome of every cabin: created, held or booked (by someone else), invalid, or skipped.
+
+    Note: in atomic mode (the default) no cabin is held unless all of them are free, the free cabins are then reported
+    as skipped. In best_effort mode the free cabins are held regardless of the others.
+    """
+    return create_holds(request.auth, payload.sailing, payload.cabins, payload.uc_ref, payload.mode)
+
+@router.post('/{hold_id}/extend', response=HoldExtensionOut, auth=JWTAuth())
+def extend_hold(request, hold_id: uuid.UUID):
     """
     Extends a cabin hold expiry if the global reserve policy (reserve_settings) permits extensions.
 
     Returns the updated cabin hold.
+
+    Note: the hold reminders and expiry are rescheduled to the new expiry.
     """
+    return extend_hold_expiry(hold_id, request.auth)
 
 @router.post('/{hold_id}/release', response=HoldReleaseOut)
 def release_hold(request, hold_id):
@@ -0,0 +1,126 @@
+import statistics
+import threading
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from common.enums import HoldStatus, BookingStatus
+from common.exceptions import APIBaseError
+from myauth.models import User
+from seasons_sailings.models import Sailing
+from selling.models import Hold, Booking
+from selling.schemas import HoldBatchMode, OccupancyMode
+from selling.services.availability import rebuild_sailing_availability
+from selling.services.bookings import create_booking_from_hold
+from selling.services.holds import create_holds
+from ships_cabins.models import Cabin
+
+
+class Command(BaseCommand):
+    help = ('Holds free cabins of a sailing and converts the holds into bookings, measuring the conversion latency, '
+            'then races parallel conversions of a hold. Fails if a cabin is ever booked twice. The holds and bookings '
+            'created are deleted afterwards, run it against a staging database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sailing', required=True, help='Sailing ID, its free cabins must be priced')
+        parser.add_argument('--user', required=True, help='Email of the user holding and booking the cabins')
+        parser.add_argument('--bookings', type=int, default=50, help='Conversions timed one after the other')
+        parser.add_argument('--rounds', type=int, default=5, help='Holds raced')
+        parser.add_argument('--racers', type=int, default=16, help='Parallel conversions of each raced hold')
+        parser.add_argument('--keep', action='store_true', help='Keep the holds and bookings created')
+
+    def handle(self, *args, **options):
+        sailing = Sailing.objects.filter(id=options['sailing']).first()
+        if sailing is None:
+            raise CommandError(f'Sailing {options["sailing"]} not found')
+        user = User.objects.filter(email=options['user']).first()
+        if user is None:
+            raise CommandError(f'User {options["user"]} not found')
+
+        wanted = options['bookings'] + options['rounds']
+        taken = (set(Hold.objects.filter(sailing=sailing, status=HoldStatus.ACTIVE).values_list('cabin_id', flat=True))
+                 | set(Booking.objects.filter(sailing=sailing, status=BookingStatus.ACTIVE)
+                       .values_list('cabin_id', flat=True)))
+        cabins = [cabin_id for cabin_id in Cabin.objects.filter(ship_id=sailing.ship_id, is_archived=False)
+                  .order_by('number').values_list('id', flat=True) if cabin_id not in taken][:wanted]
+        if len(cabins) < wanted:
+            raise CommandError(f'{wanted} free cabins are needed on the sailing, only {len(cabins)} are free')
+
+        uc_ref = f'bench-{uuid.uuid4().hex[:8]}'
+        holds = [result['hold'] for result in
+                 create_holds(user, sailing.id, cabins, uc_ref, HoldBatchMode.BEST_EFFORT)['results']]
+
+        try:
+            self._bench(user, holds[:options['bookings']])
+            failed = self._race(user, holds[options['bookings']:], options['racers'])
+        finally:
+            if not options['keep']:
+                Booking.objects.filter(sailing=sailing, uc_ref=uc_ref).delete()
+                Hold.objects.filter(sailing=sailing, uc_ref=uc_ref).delete()
+                rebuild_sailing_availability(sailing.id)
+
+        if failed:
+            raise CommandError(f'{failed} raced hold(s) not converted into exactly one booking')
+
+        self.stdout.write(self.style.SUCCESS('Every raced hold was converted into a single booking'))
+
+    def _bench(self, user, holds):
+        latencies = []
+        queries = set()
+        for hold_id in holds:
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                try:
+                    create_booking_from_hold(user, hold_id, OccupancyMode.TWO_PAX, True)
+                except APIBaseError as error:
+                    raise CommandError(f'Hold {hold_id} not converted: {error.detail}')
+                latencies.append(time.perf_counter() - start)
+            queries.add(len(ctx.captured_queries))
+
+        if latencies:
+            latencies.sort()
+            self.stdout.write(f'conversions={len(latencies)} p50={statistics.median(latencies) * 1000:.2f}ms '
+                              f'p95={latencies[int(len(latencies) * 0.95) - 1] * 1000:.2f}ms '
+                              f'max={latencies[-1] * 1000:.2f}ms queries={sorted(queries)}')
+
+    def _race(self, user, holds, racers):
+        failed = 0
+        for hold_id in holds:
+            barrier = threading.Barrier(racers)
+            outcomes = []
+
+            def convert():
+                try:
+                    barrier.wait()
+                    create_booking_from_hold(user, hold_id, OccupancyMode.TWO_PAX, True)
+                    outcomes.append('booked')
+                except APIBaseError as error:
+                    outcomes.append(error.status)
+                except Exception as error:
+                    outcomes.append(type(error).__name__)
+                finally:
+                    connection.close()
+
+            threads = [threading.Thread(target=convert) for _ in range(racers)]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+
+            hold = Hold.objects.get(id=hold_id)
+            bookings = Booking.objects.filter(sailing_id=hold.sailing_id, cabin_id=hold.cabin_id,
+                                              status=BookingStatus.ACTIVE).count()
+            booked, conflicts = outcomes.count('booked'), outcomes.count(409)
+            if bookings != 1 or booked != 1:
+                failed += 1
+
+            self.stdout.write(f'hold={hold_id} racers={racers} booked={booked} conflicts={conflicts} '
+                              f'errors={len(outcomes) - booked - conflicts} bookings={bookings} '
+                              f'hold_status={hold.status} time={elapsed * 1000:.1f}ms')
+
+        return failed
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from selling.services.holds import sweep_expired_holds, get_next_hold_expiry, HOLD_EXPIRY_BATCH
+
+SWEEP_MIN_WAIT = 0.1  # seconds, a due hold locked by another sweeper or transaction is not polled in a busy loop
+
+
+class Command(BaseCommand):
+    help = ('Expires the active holds past their expiry, freeing their cabins. Several sweepers can run side by side, '
+            'each batch of holds is expired by a single one (SELECT ... FOR UPDATE SKIP LOCKED).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit once no hold is due')
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help='Maximum seconds to wait between sweeps, less when a hold expires sooner')
+        parser.add_argument('--batch', type=int, default=HOLD_EXPIRY_BATCH, help='Holds expired per transaction')
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                start = time.perf_counter()
+                expired = sweep_expired_holds(options['batch'])
+                if expired:
+                    self.stdout.write(f'Expired {expired} hold(s) in {time.perf_counter() - start:.3f}s')
+
+                if options['once']:
+                    return
+
+                # Sleeps until the next hold is due, checking at least every interval for holds created meanwhile
+                wait = options['interval']
+                next_expiry = get_next_hold_expiry()
+                if next_expiry is not None:
+                    wait = min(wait, max((next_expiry - timezone.now()).total_seconds(), SWEEP_MIN_WAIT))
+                time.sleep(wait)
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping sweeper')
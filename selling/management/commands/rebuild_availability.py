@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from seasons_sailings.models import Sailing
+from selling.services.availability import rebuild_sailing_availability
+
+
+class Command(BaseCommand):
+    help = ('Rebuilds the Redis availability of sailings (held and booked cabin bitsets) from the active holds and '
+            'bookings, e.g. after Redis lost its data. Sailings are otherwise rebuilt on their first read.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sailing', action='append', default=[], help='Sailing ID, repeatable')
+        parser.add_argument('--all', action='store_true', help='Include the sailings already departed')
+
+    def handle(self, *args, **options):
+        sailings = Sailing.objects.all()
+        if options['sailing']:
+            sailings = sailings.filter(id__in=options['sailing'])
+        elif not options['all']:
+            sailings = sailings.filter(departure_date__gte=timezone.localdate())
+
+        start = time.perf_counter()
+        rebuilt = 0
+        for sailing_id in sailings.order_by('departure_date').values_list('id', flat=True):
+            rebuild_sailing_availability(sailing_id)
+            rebuilt += 1
+
+        self.stdout.write(f'Rebuilt the availability of {rebuilt} sailing(s) in {time.perf_counter() - start:.3f}s')
@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from selling.services.reserve import get_active_reserve_setting
+from selling.services.timers import ensure_hold_timers, run_due_timers, get_next_timer_at, HOLD_TIMERS_BATCH
+
+
+class Command(BaseCommand):
+    help = ('Fires the hold reminders and expiries of the Redis timer wheel as they fall due, rebuilding the wheel '
+            'from the active holds if Redis lost it. Several workers can run side by side, each due timer is claimed '
+            'by a single one.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit once no timer is due')
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help='Maximum seconds to wait between polls, less when a timer falls due sooner')
+        parser.add_argument('--batch', type=int, default=HOLD_TIMERS_BATCH, help='Timers claimed at once')
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                setting = get_active_reserve_setting()
+                rebuilt = ensure_hold_timers(setting.reminder_scheduled_minutes if setting else [])
+                if rebuilt is not None:
+                    self.stdout.write(f'Rebuilt the timer wheel from {rebuilt} active hold(s)')
+
+                counts = run_due_timers(options['batch'])
+                if any(counts.values()):
+                    self.stdout.write(', '.join(f'{count} {outcome}' for outcome, count in counts.items()))
+                if sum(counts.values()) == options['batch']:
+                    continue
+
+                if options['once']:
+                    return
+
+                wait = options['interval']
+                next_at = get_next_timer_at()
+                if next_at is not None:
+                    wait = min(wait, max((next_at - timezone.now()).total_seconds(), 0))
+                time.sleep(wait)
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping worker')
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.6 on 2026-10-17 04:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seasons_sailings', '0003_sailing_trg_sailings_pricing_versions_upd_and_more'),
+        ('selling', '0001_initial'),
+        ('ships_cabins', '0004_cabin_trg_cabins_pricing_versions_ins_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='hold',
+            index=models.Index(condition=models.Q(('status', 'active')), fields=['expires_at'], name='idx_holds_active_expiry'),
+        ),
+    ]
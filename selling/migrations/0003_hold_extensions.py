@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 04:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('selling', '0002_hold_idx_holds_active_expiry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hold',
+            name='extensions',
+            field=models.IntegerField(db_default=0),
+        ),
+    ]
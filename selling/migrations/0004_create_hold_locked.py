@@ -0,0 +1,81 @@
+# Generated by Django 5.2.6 on 2026-10-17 09:20
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('selling', '0003_hold_extensions'),
+    ]
+
+    operations = [
+        migrations.RunSQL(     # -- hold creation serialized per (sailing,cabin) (see selling.services.holds.create_hold)
+            """
+            CREATE OR REPLACE FUNCTION create_hold_locked(
+                p_user uuid, p_sailing uuid, p_cabin uuid, p_uc_ref text, p_minutes integer, p_idempotency_key text
+            )
+            RETURNS TABLE (outcome text, hold_id uuid, hold_expires_at timestamptz)
+            LANGUAGE plpgsql
+            VOLATILE
+            AS $$
+            BEGIN
+                -- Retries of a request serialize on its key, then every writer of the cabin on the cabin (always in
+                -- this order). The locks are held until the transaction ends, and each statement below runs on a
+                -- snapshot taken after they were granted, so it sees what the previous holder committed.
+                IF p_idempotency_key IS NOT NULL THEN
+                    PERFORM pg_advisory_xact_lock(hashtextextended('hold-key:' || p_idempotency_key, 0));
+
+                    RETURN QUERY
+                        SELECT 'replay'::text, h.id, h.expires_at
+                        FROM holds h
+                        WHERE h.idempotency_key = p_idempotency_key;
+                    IF FOUND THEN
+                        RETURN;
+                    END IF;
+                END IF;
+
+                PERFORM pg_advisory_xact_lock(hashtextextended('hold:' || p_sailing || ':' || p_cabin, 0));
+
+                PERFORM 1
+                FROM sailings s
+                JOIN cabins c ON c.ship_id = s.ship_id
+                WHERE s.id = p_sailing AND c.id = p_cabin AND NOT c.is_archived;
+                IF NOT FOUND THEN
+                    RETURN QUERY SELECT 'invalid'::text, NULL::uuid, NULL::timestamptz;
+                    RETURN;
+                END IF;
+
+                -- A hold past its expiry the sweepers did not reach yet no longer holds the cabin
+                UPDATE holds SET status = 'expired'
+                WHERE sailing_id = p_sailing AND cabin_id = p_cabin AND status = 'active' AND expires_at <= NOW();
+
+                RETURN QUERY
+                    SELECT 'held'::text, h.id, h.expires_at
+                    FROM holds h
+                    WHERE h.sailing_id = p_sailing AND h.cabin_id = p_cabin AND h.status = 'active';
+                IF FOUND THEN
+                    RETURN;
+                END IF;
+
+                RETURN QUERY
+                    SELECT 'booked'::text, b.id, NULL::timestamptz
+                    FROM bookings b
+                    WHERE b.sailing_id = p_sailing AND b.cabin_id = p_cabin AND b.status = 'active';
+                IF FOUND THEN
+                    RETURN;
+                END IF;
+
+                RETURN QUERY
+                    INSERT INTO holds (user_id, sailing_id, cabin_id, uc_ref, expires_at, idempotency_key)
+                    VALUES (p_user, p_sailing, p_cabin, p_uc_ref, NOW() + make_interval(mins => p_minutes),
+                            p_idempotency_key)
+                    RETURNING 'created'::text, holds.id, holds.expires_at;
+            END;
+            $$;
+            """,
+            reverse_sql="""
+            DROP FUNCTION IF EXISTS create_hold_locked(uuid, uuid, uuid, text, integer, text);
+            """
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.6 on 2026-10-17 10:05
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('selling', '0004_create_hold_locked'),
+    ]
+
+    operations = [
+        migrations.RunSQL(     # -- batch of holds on one sailing (see selling.services.holds.create_holds)
+            """
+            CREATE OR REPLACE FUNCTION create_holds_locked(
+                p_user uuid, p_sailing uuid, p_cabins uuid[], p_uc_ref text, p_minutes integer, p_atomic boolean
+            )
+            RETURNS TABLE (r_cabin uuid, r_outcome text, r_hold uuid, r_expires_at timestamptz)
+            LANGUAGE plpgsql
+            VOLATILE
+            AS $$
+            BEGIN
+                -- The cabin locks of create_hold_locked, taken in cabin order so that overlapping batches never
+                -- deadlock
+                PERFORM pg_advisory_xact_lock(hashtextextended('hold:' || p_sailing || ':' || c.id, 0))
+                FROM (SELECT DISTINCT id FROM unnest(p_cabins) AS id ORDER BY id) c;
+
+                UPDATE holds SET status = 'expired'
+                WHERE sailing_id = p_sailing AND cabin_id = ANY (p_cabins) AND status = 'active'
+                  AND expires_at <= NOW();
+
+                RETURN QUERY
+                    WITH checked AS (
+                        SELECT r.id,
+                               CASE
+                                   WHEN c.id IS NULL THEN 'invalid'
+                                   WHEN h.id IS NOT NULL THEN 'held'
+                                   WHEN b.id IS NOT NULL THEN 'booked'
+                                   ELSE 'created'
+                               END AS outcome,
+                               h.id AS hold_id,
+                               h.expires_at
+                        FROM (SELECT DISTINCT id FROM unnest(p_cabins) AS id) r
+                        LEFT JOIN sailings s ON s.id = p_sailing
+                        LEFT JOIN cabins c ON c.id = r.id AND c.ship_id = s.ship_id AND NOT c.is_archived
+                        LEFT JOIN holds h ON h.sailing_id = p_sailing AND h.cabin_id = r.id AND h.status = 'active'
+                        LEFT JOIN bookings b ON b.sailing_id = p_sailing AND b.cabin_id = r.id AND b.status = 'active'
+                    ),
+                    inserted AS (
+                        INSERT INTO holds (user_id, sailing_id, cabin_id, uc_ref, expires_at)
+                        SELECT p_user, p_sailing, ch.id, p_uc_ref, NOW() + make_interval(mins => p_minutes)
+                        FROM checked ch
+                        WHERE ch.outcome = 'created'
+                          AND NOT (p_atomic AND EXISTS (SELECT 1 FROM checked x WHERE x.outcome <> 'created'))
+                        RETURNING holds.id, holds.cabin_id, holds.expires_at
+                    )
+                    SELECT ch.id,
+                           CASE WHEN ch.outcome = 'created' AND i.id IS NULL THEN 'skipped' ELSE ch.outcome END,
+                           COALESCE(i.id, ch.hold_id),
+                           COALESCE(i.expires_at, ch.expires_at)
+                    FROM checked ch
+                    LEFT JOIN inserted i ON i.cabin_id = ch.id
+                    ORDER BY array_position(p_cabins, ch.id);
+            END;
+            $$;
+            """,
+            reverse_sql="""
+            DROP FUNCTION IF EXISTS create_holds_locked(uuid, uuid, uuid[], text, integer, boolean);
+            """
+        ),
+    ]
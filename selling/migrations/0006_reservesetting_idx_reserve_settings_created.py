@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-17 04:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('selling', '0005_create_holds_locked'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservesetting',
+            index=models.Index(fields=['-created_at'], name='idx_reserve_settings_created'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-17 04:38
+
+import common.functions
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('selling', '0006_reservesetting_idx_reserve_settings_created'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingSnapshotPart',
+            fields=[
+                ('hash', models.TextField(primary_key=True, serialize=False)),
+                ('kind', models.TextField()),
+                ('body', models.JSONField()),
+                ('created_at', models.DateTimeField(db_default=common.functions.TxNow())),
+            ],
+            options={
+                'db_table': 'booking_snapshot_parts',
+            },
+        ),
+    ]
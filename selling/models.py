@@ -21,6 +21,10 @@ class ReserveSetting(models.Model):
 
     class Meta:
         db_table = 'reserve_settings'
+        indexes = [
+            # -- The active policy is the most recently created one (cached, see selling.services.reserve)
+            models.Index(fields=['-created_at'], name='idx_reserve_settings_created'),
+        ]
 
 class Hold(models.Model):
     id = models.UUIDField(primary_key=True, db_default=RandomUUID())
@@ -28,6 +32,7 @@ class Hold(models.Model):
     expires_at = models.DateTimeField(null=False)
     status = PostgresEnumField('hold_status', db_default=HoldStatus.ACTIVE, choices=HoldStatus.choices, null=False)
     idempotency_key = models.TextField(null=True)
+    extensions = models.IntegerField(db_default=0, null=False)  # -- counted against ReserveSetting.max_extensions
     created_at = models.DateTimeField(db_default=TxNow(), null=False)
     updated_at = models.DateTimeField(db_default=TxNow(), null=False)
 
@@ -49,6 +54,11 @@ class Hold(models.Model):
                 name='uidx_holds_active',
             ),
         ]
+        indexes = [
+            # -- Expiry sweeps (see selling.services.holds) only visit the ACTIVE holds, in expiry order
+            models.Index(fields=['expires_at'], condition=models.Q(status=HoldStatus.ACTIVE),
+                         name='idx_holds_active_expiry'),
+        ]
         triggers = [
             set_updated_at_trg('trg_holds_updated'),
         ]
@@ -98,6 +108,16 @@ class Booking(models.Model):
             set_updated_at_trg('trg_bookings_updated'),
         ]
 
+class BookingSnapshotPart(models.Model):
+    # -- Content addressed pieces shared by booking snapshots (FX rates, discounts, cancellation policies)
+    hash = models.TextField(primary_key=True)  # -- sha256 of the canonical body (see selling.services.snapshots)
+    kind = models.TextField(null=False)
+    body = models.JSONField(null=False)
+    created_at = models.DateTimeField(db_default=TxNow(), null=False)
+
+    class Meta:
+        db_table = 'booking_snapshot_parts'
+
 
 class CancellationPolicy(models.Model):
     id = models.UUIDField(primary_key=True, db_default=RandomUUID())
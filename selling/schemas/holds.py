@@ -1,8 +1,10 @@
 import uuid
+from datetime import datetime
 from enum import Enum
-from typing import Optional
+from typing import Optional, List
 
 from ninja import Schema, ModelSchema
+from pydantic import Field
 
 from selling.models import Hold, ReleaseRequest
 
@@ -28,6 +30,34 @@ class HoldIn(Schema):
     uc_ref: str
     notes: Optional[str] = None
 
+class HoldBatchMode(str, Enum):
+    ATOMIC = 'atomic'            # every cabin is held, or none
+    BEST_EFFORT = 'best_effort'  # the free cabins are held, the others reported
+
+class HoldBatchOutcome(str, Enum):
+    CREATED = 'created'
+    HELD = 'held'        # already held on the sailing
+    BOOKED = 'booked'    # already booked on the sailing
+    INVALID = 'invalid'  # not a cabin of the sailing ship, or archived
+    SKIPPED = 'skipped'  # free, but not held as another cabin of an atomic batch was not
+
+class HoldBatchIn(Schema):
+    sailing: uuid.UUID
+    cabins: List[uuid.UUID] = Field(min_length=1, max_length=200)
+    uc_ref: str
+    mode: HoldBatchMode = HoldBatchMode.ATOMIC
+    notes: Optional[str] = None
+
+class HoldBatchItemOut(Schema):
+    cabin: uuid.UUID
+    outcome: HoldBatchOutcome
+    hold: Optional[uuid.UUID] = None  # the created hold, or the hold holding the cabin
+    expires_at: Optional[datetime] = None
+
+class HoldBatchOut(Schema):
+    created: int
+    results: List[HoldBatchItemOut]
+
 class HoldExtensionOut(ModelSchema):
     status: HoldStatus
 
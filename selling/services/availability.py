@@ -0,0 +1,375 @@
+import json
+import uuid
+from datetime import datetime, timezone as dt_timezone
+from typing import Optional, List, Dict, Any, Tuple, Iterable, AsyncIterator
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django_redis import get_redis_connection
+from ninja.responses import NinjaJSONEncoder
+from redis import asyncio as aioredis
+from redis.exceptions import WatchError
+
+from common.enums import HoldStatus, BookingStatus
+from seasons_sailings.models import Sailing
+from selling.models import Hold, Booking
+from ships_cabins.models import Cabin
+
+# Availability of the cabins of a sailing, kept in Redis so the cabin map is read without joining cabins, holds and
+# bookings. Each cabin has a slot (its index in display order), the held and booked cabins are bitsets indexed by
+# slot, and the hold and booking of a taken cabin are kept in a hash ('h:{slot}' / 'b:{slot}' -> '{id}\t...'):
+#   {prefix}:cabins  the cabin IDs in slot order (16 bytes each)
+#   {prefix}:slots   cabin ID -> slot, the changes are applied to the sailings it exists for
+#   {prefix}:held / {prefix}:booked / {prefix}:refs
+# The write paths apply their changes once they commit (see apply_availability). The structure is rebuilt from the
+# database when missing (rebuilds racing a change are discarded), and expires after AVAILABILITY_WINDOW so any drift
+# (e.g. writes outside these paths, or changes applied out of commit order) is bounded. Holds past their expiry are
+# reported available when read.
+AVAILABILITY_KEY = 'availability:{sailing_id}'
+AVAILABILITY_WINDOW = 600  # 10 minutes
+AVAILABILITY_HOLD = 'hold'
+AVAILABILITY_BOOKING = 'booking'
+AVAILABILITY_REBUILD_ATTEMPTS = 3  # then the last rebuild is served without being stored
+
+# Changes of the cabins of a sailing are also appended to a Redis stream, pushed to the cabin maps of the agents
+# browsing it (see stream_sailing_availability). The stream entry IDs are the resume cursors of the clients.
+AVAILABILITY_EVENTS_KEY = 'availability:{sailing_id}:events'
+AVAILABILITY_EVENTS_MAXLEN = 1000  # changes kept per sailing to resume from (approximately)
+AVAILABILITY_EVENTS_WINDOW = 86400  # 1 day, the streams of sailings no longer changing expire
+AVAILABILITY_STREAM_HEARTBEAT = 15  # seconds between keepalives of an idle stream, below proxy idle timeouts
+AVAILABILITY_STREAM_BATCH = 100  # changes read at once
+
+# Applies a change of a cabin to a built sailing. A cabin without a slot (e.g. added to the ship since the build)
+# drops the structure so the next read rebuilds it. Clearing only clears the hold or booking given, which a change
+# applied out of order may have replaced already.
+APPLY_AVAILABILITY_LUA = """
+    if redis.call('EXISTS', KEYS[2]) == 0 then
+        return 0
+    end
+    local slot = redis.call('HGET', KEYS[2], ARGV[1])
+    if not slot then
+        redis.call('DEL', KEYS[1], KEYS[2], KEYS[3], KEYS[4], KEYS[5])
+        return -1
+    end
+    local bits = ARGV[2] == 'hold' and KEYS[3] or KEYS[4]
+    local field = (ARGV[2] == 'hold' and 'h:' or 'b:') .. slot
+    if ARGV[4] ~= '' then
+        redis.call('SETBIT', bits, slot, 1)
+        redis.call('HSET', KEYS[5], field, ARGV[4])
+    else
+        local current = redis.call('HGET', KEYS[5], field)
+        if current and string.sub(current, 1, string.len(ARGV[3])) ~= ARGV[3] then
+            return 0
+        end
+        redis.call('SETBIT', bits, slot, 0)
+        redis.call('HDEL', KEYS[5], field)
+    end
+    local ttl = redis.call('PTTL', KEYS[2])
+    if ttl > 0 then
+        redis.call('PEXPIRE', KEYS[5], ttl)
+    end
+    return 1
+"""
+
+# (sailing_id, cabin_id, kind, hold_or_booking_id, ref) of a change applied by apply_availability
+Change = Tuple[uuid.UUID, uuid.UUID, str, uuid.UUID, Optional[str]]
+
+_apply_script = None
+
+
+def _redis():
+    return get_redis_connection('default')
+
+
+def _keys(sailing_id: uuid.UUID) -> List[str]:
+    prefix = AVAILABILITY_KEY.format(sailing_id=sailing_id)
+    return [f'{prefix}:cabins', f'{prefix}:slots', f'{prefix}:held', f'{prefix}:booked', f'{prefix}:refs']
+
+
+def _hold_ref(hold_id: uuid.UUID, uc_ref: str, expires_at: datetime) -> str:
+    return f'{hold_id}\t{expires_at.timestamp()}\t{uc_ref}'
+
+
+def _booking_ref(booking_id: uuid.UUID, uc_ref: str) -> str:
+    return f'{booking_id}\t{uc_ref}'
+
+
+def _parse_hold_ref(ref: bytes) -> Dict[str, Any]:
+    hold_id, expires_at, uc_ref = ref.decode().split('\t', 2)
+    expires_at = datetime.fromtimestamp(float(expires_at), tz=dt_timezone.utc)
+    return {'id': hold_id, 'uc_ref': uc_ref, 'expires_at': expires_at}
+
+
+def _parse_booking_ref(ref: bytes) -> Dict[str, Any]:
+    booking_id, uc_ref = ref.decode().split('\t', 1)
+    return {'id': booking_id, 'uc_ref': uc_ref}
+
+
+def _bit(bits: bytes, slot: int) -> bool:
+    return slot // 8 < len(bits) and bool(bits[slot // 8] & 0x80 >> slot % 8)
+
+
+def _load_sailing_availability(ship_id: uuid.UUID, sailing_id: uuid.UUID
+                               ) -> Tuple[bytes, Dict[str, int], bytes, bytes, Dict[bytes, bytes]]:
+    """
+    Reads the availability of a sailing from the database: its cabins (not archived, in cabin map order) and their
+    active holds and bookings.
+    """
+    cabin_ids = list(
+        Cabin.objects.filter(ship_id=ship_id, is_archived=False)
+        .order_by('deck', 'category__sort_order', 'number')
+        .values_list('id', flat=True)
+    )
+    slots = {cabin_id: slot for slot, cabin_id in enumerate(cabin_ids)}
+
+    held, booked, refs = bytearray(len(slots) // 8 + 1), bytearray(len(slots) // 8 + 1), {}
+    holds = Hold.objects.filter(sailing_id=sailing_id, status=HoldStatus.ACTIVE).values_list(
+        'cabin_id', 'id', 'uc_ref', 'expires_at'
+    )
+    for cabin_id, hold_id, uc_ref, expires_at in holds:
+        if cabin_id in slots:
+            held[slots[cabin_id] // 8] |= 0x80 >> slots[cabin_id] % 8
+            refs[f'h:{slots[cabin_id]}'.encode()] = _hold_ref(hold_id, uc_ref, expires_at).encode()
+
+    bookings = Booking.objects.filter(sailing_id=sailing_id, status=BookingStatus.ACTIVE).values_list(
+        'cabin_id', 'id', 'uc_ref'
+    )
+    for cabin_id, booking_id, uc_ref in bookings:
+        if cabin_id in slots:
+            booked[slots[cabin_id] // 8] |= 0x80 >> slots[cabin_id] % 8
+            refs[f'b:{slots[cabin_id]}'.encode()] = _booking_ref(booking_id, uc_ref).encode()
+
+    cabins = b''.join(cabin_id.bytes for cabin_id in cabin_ids)
+    return cabins, {str(cabin_id): slot for cabin_id, slot in slots.items()}, bytes(held), bytes(booked), refs
+
+
+def rebuild_sailing_availability(sailing_id: uuid.UUID) -> Tuple[bytes, bytes, bytes, Dict[bytes, bytes]]:
+    """
+    Rebuilds the availability of a sailing from the database: its cabins (not archived, in cabin map order) and their
+    active holds and bookings. The change stream of the sailing is watched while the database is read: a change
+    committed meanwhile is recorded in it before being applied (see apply_availability), which discards the rebuild
+    so it is never stored without the change. Discarded rebuilds are retried, the last one is only returned.
+
+    :param sailing_id: The sailing ID
+    :return: (cabins, held, booked, refs) as read
+    """
+    sailing = get_object_or_404(Sailing.objects.only('ship_id'), id=sailing_id)
+    keys = _keys(sailing_id)
+
+    with _redis().pipeline(transaction=True) as pipe:
+        for _ in range(AVAILABILITY_REBUILD_ATTEMPTS):
+            pipe.watch(AVAILABILITY_EVENTS_KEY.format(sailing_id=sailing_id))
+            cabins, slots, held, booked, refs = _load_sailing_availability(sailing.ship_id, sailing_id)
+
+            pipe.multi()
+            pipe.delete(*keys)
+            pipe.set(keys[0], cabins, ex=AVAILABILITY_WINDOW)
+            pipe.set(keys[2], held, ex=AVAILABILITY_WINDOW)
+            pipe.set(keys[3], booked, ex=AVAILABILITY_WINDOW)
+            if refs:
+                pipe.hset(keys[4], mapping=refs)
+                pipe.expire(keys[4], AVAILABILITY_WINDOW)
+            if slots:
+                pipe.hset(keys[1], mapping=slots)
+                pipe.expire(keys[1], AVAILABILITY_WINDOW)
+            try:
+                pipe.execute()
+                break
+            except WatchError:
+                continue
+
+    return cabins, held, booked, refs
+
+
+def apply_availability(changes: Iterable[Change]):
+    """
+    Applies changes of cabins to the availability of their sailings once the current transaction commits, in a
+    single round trip, and appends them to the change streams of their sailings. Sailings not built are left alone,
+    they are built from the database when read.
+
+    :param changes: The changes (see hold_taken, hold_freed, booking_taken and booking_freed)
+    """
+    changes = list(changes)
+    if not changes:
+        return
+
+    def apply():
+        global _apply_script
+        client = _redis()
+        if _apply_script is None:
+            _apply_script = client.register_script(APPLY_AVAILABILITY_LUA)
+
+        # Each change is recorded in the stream before being applied, so a rebuild reading the database meanwhile is
+        # discarded (see rebuild_sailing_availability)
+        pipe = client.pipeline(transaction=False)
+        for sailing_id, cabin_id, kind, ref_id, ref in changes:
+            events = AVAILABILITY_EVENTS_KEY.format(sailing_id=sailing_id)
+            pipe.xadd(events, {'cabin': str(cabin_id), 'kind': kind, 'id': str(ref_id), 'ref': ref or ''},
+                      maxlen=AVAILABILITY_EVENTS_MAXLEN, approximate=True)
+            pipe.expire(events, AVAILABILITY_EVENTS_WINDOW)
+
+            _apply_script(keys=_keys(sailing_id), args=[str(cabin_id), kind, str(ref_id), ref or ''], client=pipe)
+        pipe.execute()
+
+    transaction.on_commit(apply)
+
+
+def hold_taken(hold: Hold) -> Change:
+    """
+    Change of the cabin of an active hold (created or extended), see apply_availability.
+    """
+    return hold.sailing_id, hold.cabin_id, AVAILABILITY_HOLD, hold.id, _hold_ref(hold.id, hold.uc_ref, hold.expires_at)
+
+
+def hold_freed(hold_id: uuid.UUID, sailing_id: uuid.UUID, cabin_id: uuid.UUID) -> Change:
+    """
+    Change of the cabin of a hold no longer active (released, expired or converted), see apply_availability.
+    """
+    return sailing_id, cabin_id, AVAILABILITY_HOLD, hold_id, None
+
+
+def booking_taken(booking: Booking) -> Change:
+    """
+    Change of the cabin of an active booking, see apply_availability.
+    """
+    ref = _booking_ref(booking.id, booking.uc_ref)
+    return booking.sailing_id, booking.cabin_id, AVAILABILITY_BOOKING, booking.id, ref
+
+
+def booking_freed(booking_id: uuid.UUID, sailing_id: uuid.UUID, cabin_id: uuid.UUID) -> Change:
+    """
+    Change of the cabin of a cancelled booking, see apply_availability.
+    """
+    return sailing_id, cabin_id, AVAILABILITY_BOOKING, booking_id, None
+
+
+def get_sailing_availability(sailing_id: uuid.UUID) -> List[Dict[str, Any]]:
+    """
+    Gets the availability of every cabin of a sailing, in cabin map order, from the Redis bitsets (rebuilt from the
+    database if missing). A single round trip when built.
+
+    :param sailing_id: The sailing ID
+    :return: List of dict matching CabinAvailabilityOut
+    """
+    keys = _keys(sailing_id)
+
+    pipe = _redis().pipeline(transaction=True)
+    pipe.get(keys[0])
+    pipe.get(keys[2])
+    pipe.get(keys[3])
+    pipe.hgetall(keys[4])
+    cabins, held, booked, refs = pipe.execute()
+
+    if cabins is None or held is None or booked is None:
+        cabins, held, booked, refs = rebuild_sailing_availability(sailing_id)
+
+    now = timezone.now()
+
+    availability = []
+    for slot in range(len(cabins) // 16):
+        cabin = {'cabin': uuid.UUID(bytes=cabins[slot * 16:slot * 16 + 16]), 'status': 'available'}
+
+        # Slot n of a bitset is bit n % 8 of byte n // 8, most significant first
+        if _bit(booked, slot) and f'b:{slot}'.encode() in refs:
+            cabin.update(status='booked', booking=_parse_booking_ref(refs[f'b:{slot}'.encode()]))
+
+        elif _bit(held, slot) and f'h:{slot}'.encode() in refs:
+            hold = _parse_hold_ref(refs[f'h:{slot}'.encode()])
+            if hold['expires_at'] > now:
+                cabin.update(status='reserved', hold=hold)
+
+        availability.append(cabin)
+
+    return availability
+
+
+def _async_redis() -> aioredis.Redis:
+    return aioredis.Redis.from_url(settings.CACHES['default']['LOCATION'])
+
+
+def _event(event: str, data: Any, event_id: Optional[str] = None) -> str:
+    """
+    Formats a server-sent event.
+    """
+    lines = [f'event: {event}']
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'data: {json.dumps(data, cls=NinjaJSONEncoder)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+def _change_event(fields: Dict[bytes, bytes]) -> Tuple[str, Dict[str, Any]]:
+    """
+    Event of a change read from the stream of a sailing: 'reserved', 'released' (the hold no longer takes the cabin),
+    'booked' or 'cancelled'.
+    """
+    cabin, kind, ref = fields[b'cabin'].decode(), fields[b'kind'].decode(), fields[b'ref']
+
+    if kind == AVAILABILITY_HOLD:
+        if ref:
+            return 'reserved', {'cabin': cabin, 'hold': _parse_hold_ref(ref)}
+        return 'released', {'cabin': cabin, 'hold': {'id': fields[b'id'].decode()}}
+
+    if ref:
+        return 'booked', {'cabin': cabin, 'booking': _parse_booking_ref(ref)}
+    return 'cancelled', {'cabin': cabin, 'booking': {'id': fields[b'id'].decode()}}
+
+
+def _stream_position(cursor: str) -> Tuple[int, int]:
+    milliseconds, sequence = cursor.split('-')
+    return int(milliseconds), int(sequence)
+
+
+async def _availability_events(sailing_id: uuid.UUID, cursor: Optional[str]) -> AsyncIterator[str]:
+    client = _async_redis()
+    key = AVAILABILITY_EVENTS_KEY.format(sailing_id=sailing_id)
+
+    try:
+        # A cursor is resumed from only if no change after it was trimmed from the stream (or expired with it)
+        if cursor is not None:
+            first = await client.xrange(key, count=1)
+            try:
+                if not first or _stream_position(first[0][0].decode()) > _stream_position(cursor):
+                    cursor = None
+            except ValueError:
+                cursor = None
+
+        # The position is read before the availability so no change is missed, a change both in the snapshot and
+        # sent after it is idempotent
+        if cursor is None:
+            last = await client.xrevrange(key, count=1)
+            cursor = last[0][0].decode() if last else '0-0'
+            yield _event('snapshot', await sync_to_async(get_sailing_availability)(sailing_id), cursor)
+
+        while True:
+            streams = await client.xread({key: cursor}, count=AVAILABILITY_STREAM_BATCH,
+                                         block=AVAILABILITY_STREAM_HEARTBEAT * 1000)
+            if not streams:
+                yield ': keepalive\n\n'
+                continue
+
+            for entry_id, fields in streams[0][1]:
+                cursor = entry_id.decode()
+                yield _event(*_change_event(fields), cursor)
+    finally:
+        await client.aclose()
+
+
+async def stream_sailing_availability(sailing_id: uuid.UUID, cursor: Optional[str] = None) -> AsyncIterator[str]:
+    """
+    Opens the server-sent event stream of the availability of a sailing: a 'snapshot' of every cabin (see
+    get_sailing_availability), then its changes as they are committed ('reserved', 'released', 'booked' and
+    'cancelled'). Each event ID is a cursor to resume from, without a snapshot unless changes after it were trimmed.
+
+    :param sailing_id: The sailing ID
+    :param cursor: The ID of the last event received, if resuming
+    :return: Async iterator of the events
+    """
+    if not await Sailing.objects.filter(id=sailing_id).aexists():
+        raise Http404('No Sailing matches the given query.')
+
+    return _availability_events(sailing_id, cursor)
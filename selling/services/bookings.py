@@ -0,0 +1,156 @@
+import uuid
+from typing import Optional, Dict, Any
+
+from django.db import connection, transaction, IntegrityError
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from ninja_extra import status
+
+from common.enums import HoldStatus, BookingStatus
+from common.exceptions import (
+    APIBaseError, PermissionDeniedError, ValidationFailedError, CabinAlreadyBookedError, IdempotentReplayError,
+)
+from pricing.schemas import Occupancy
+from selling.models import Hold, Booking
+from selling.schemas import BookingOut, OccupancyMode
+from selling.services.availability import apply_availability, hold_freed, booking_taken
+from selling.services.reserve import get_active_reserve_setting
+from selling.services.snapshots import build_booking_snapshot, canonical_json
+from selling.services.timers import cancel_hold_timers
+
+BOOKING_OCCUPANCY = {
+    OccupancyMode.TWO_PAX: Occupancy.DOUBLE,
+    OccupancyMode.SINGLE: Occupancy.SINGLE,
+}
+
+# Converts an active hold of the user into a booking in a single statement: takes the cabin lock of
+# create_hold_locked, marks the hold converted and inserts the booking from the converted row. Concurrent conversions
+# of a hold queue on its row lock, the hold is no longer active once the first one commits so the others convert
+# nothing. uidx_bookings_active still guards against a booking of the cabin not made from a hold.
+CONVERT_HOLD_SQL = """
+    WITH target AS (
+        SELECT id, pg_advisory_xact_lock(hashtextextended('hold:' || sailing_id || ':' || cabin_id, 0))
+        FROM holds
+        WHERE id = %(hold)s
+    ),
+    converted AS (
+        UPDATE holds h SET status = 'converted'
+        FROM target t
+        WHERE h.id = t.id AND h.user_id = %(user)s AND h.status = 'active' AND h.expires_at > NOW()
+        RETURNING h.sailing_id, h.cabin_id, h.uc_ref
+    )
+    INSERT INTO bookings (uc_ref, snapshot, idempotency_key, sailing_id, cabin_id, user_id)
+    SELECT uc_ref, %(snapshot)s::jsonb, %(idempotency_key)s, sailing_id, cabin_id, %(user)s
+    FROM converted
+    RETURNING id;
+"""
+
+
+def _hold_not_active(hold: Hold) -> APIBaseError:
+    return APIBaseError(
+        title='Hold not active',
+        detail=f'The hold is {hold.status if hold.status != HoldStatus.ACTIVE else HoldStatus.EXPIRED}',
+        status=status.HTTP_409_CONFLICT,
+    )
+
+
+def _replay_mismatch(idempotency_key: str) -> IdempotentReplayError:
+    return IdempotentReplayError(
+        title='Idempotency key reused',
+        detail=f'The idempotency key {idempotency_key} was already used for a different booking request',
+        status=status.HTTP_409_CONFLICT,
+    )
+
+
+def _replay_booking(hold: Hold, idempotency_key: str) -> Optional[Dict[str, Any]]:
+    """
+    Gets the booking created with an idempotency key, which must be the booking of the hold.
+    """
+    booking = Booking.objects.filter(idempotency_key=idempotency_key).first()
+    if booking is None:
+        return None
+
+    if (booking.user_id, booking.sailing_id, booking.cabin_id) != (hold.user_id, hold.sailing_id, hold.cabin_id):
+        raise _replay_mismatch(idempotency_key)
+
+    return BookingOut.model_validate(booking).model_dump(by_alias=True)
+
+
+def create_booking_from_hold(user, hold_id: uuid.UUID, occupancy_mode: OccupancyMode, acknowledge_policy: bool,
+                             idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Converts an active hold of the user into a booking of its cabin, with a snapshot of the cabin pricing (see
+    build_booking_snapshot). The hold is converted and the booking inserted by a single statement, in the transaction
+    storing the snapshot parts. A retry with the idempotency key of a created booking replays it.
+
+    :param user: The user booking the cabin, who must hold it
+    :param hold_id: The hold ID
+    :param occupancy_mode: The occupancy of the cabin
+    :param acknowledge_policy: Whether the user acknowledged the cancellation policy, required
+    :param idempotency_key: The idempotency key of the request, if any
+    :return: dict matching BookingOut
+    """
+    if not acknowledge_policy:
+        raise ValidationFailedError(
+            title='Policy not acknowledged',
+            detail='The cancellation policy must be acknowledged to book',
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            errors=[{'field': 'acknowledge_policy', 'message': 'Must be true'}],
+        )
+
+    hold = get_object_or_404(Hold, id=hold_id)
+
+    if hold.user_id != user.id:
+        raise PermissionDeniedError(
+            title='Not the holder',
+            detail='Only the holder of a cabin can book it',
+            status=status.HTTP_403_FORBIDDEN,
+        )
+    if hold.status != HoldStatus.ACTIVE or hold.expires_at <= timezone.now():
+        replay = _replay_booking(hold, idempotency_key) if idempotency_key is not None else None
+        if replay is not None:
+            return replay
+        raise _hold_not_active(hold)
+
+    setting = get_active_reserve_setting()
+
+    with transaction.atomic():
+        snapshot = build_booking_snapshot(hold.sailing_id, hold.cabin_id, BOOKING_OCCUPANCY[occupancy_mode])
+
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(CONVERT_HOLD_SQL, {
+                    'hold': hold.id,
+                    'user': user.id,
+                    'snapshot': canonical_json(snapshot),
+                    'idempotency_key': idempotency_key,
+                })
+                row = cursor.fetchone()
+        except IntegrityError as error:
+            constraint = getattr(getattr(error.__cause__, 'diag', None), 'constraint_name', None)
+            if constraint == 'bookings_idempotency_key_key':
+                raise _replay_mismatch(idempotency_key)
+            if constraint == 'uidx_bookings_active':
+                raise CabinAlreadyBookedError(
+                    title='Cabin already booked',
+                    detail='The cabin is booked on this sailing',
+                    status=status.HTTP_409_CONFLICT,
+                )
+            raise
+
+        if row is None:
+            # Converted (or expired) by a concurrent request since it was read
+            hold.refresh_from_db(fields=['status', 'expires_at'])
+            replay = _replay_booking(hold, idempotency_key) if idempotency_key is not None else None
+            if replay is not None:
+                return replay
+            raise _hold_not_active(hold)
+
+        booking = Booking(id=row[0], uc_ref=hold.uc_ref, snapshot=snapshot, status=BookingStatus.ACTIVE,
+                          idempotency_key=idempotency_key, sailing_id=hold.sailing_id, cabin_id=hold.cabin_id,
+                          user_id=user.id)
+
+        cancel_hold_timers(hold.id, setting.reminder_scheduled_minutes if setting is not None else [])
+        apply_availability([hold_freed(hold.id, hold.sailing_id, hold.cabin_id), booking_taken(booking)])
+
+    return BookingOut.model_validate(booking).model_dump(by_alias=True)
@@ -0,0 +1,289 @@
+import hashlib
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional, List, Tuple, Dict, Any
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Min
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from ninja_extra import status
+
+from common.enums import HoldStatus
+from common.exceptions import (
+    APIBaseError, PermissionDeniedError, ValidationFailedError, ActiveHoldExistsError, CabinAlreadyBookedError,
+    IdempotentReplayError,
+)
+from selling.models import Hold
+from selling.schemas import HoldOut, HoldBatchMode
+from selling.services.reserve import get_active_reserve_setting
+from selling.services.availability import apply_availability, hold_taken, hold_freed
+from selling.services.timers import schedule_hold_timers, schedule_holds_timers
+
+HOLD_DEFAULT_MINUTES = 2880  # hold duration without a reserve policy, ReserveSetting.max_hold_minutes default
+
+# Responses of the holds created with an idempotency key, so a retry is replayed without a database round trip. Past
+# the window a retry is still replayed, from the hold stored with the key.
+HOLD_REPLAY_CACHE_KEY = 'holds:replay:{key}'
+HOLD_REPLAY_WINDOW = 600  # 10 minutes
+
+# Takes the advisory locks of the idempotency key and the (sailing,cabin), then checks the cabin is free of active
+# holds and bookings and inserts the hold, in a single round trip (see the create_hold_locked function). Concurrent
+# requests for a cabin queue on the lock instead of racing to the uidx_holds_active index, the losers get the hold of
+# the winner back rather than a unique violation rolling back their transaction.
+CREATE_HOLD_SQL = """
+    SELECT outcome, hold_id, hold_expires_at
+    FROM create_hold_locked(%(user)s, %(sailing)s, %(cabin)s, %(uc_ref)s, %(minutes)s, %(idempotency_key)s);
+"""
+
+# Holds of a batch on one sailing: the cabin locks are taken in cabin order, then the cabins are checked and the free
+# ones held by a single multi-row INSERT, every cabin reporting its outcome (see the create_holds_locked function)
+CREATE_HOLDS_SQL = """
+    SELECT r_cabin, r_outcome, r_hold, r_expires_at
+    FROM create_holds_locked(%(user)s, %(sailing)s, %(cabins)s::uuid[], %(uc_ref)s, %(minutes)s, %(atomic)s);
+"""
+
+HOLD_EXPIRY_BATCH = 500  # holds expired per transaction, bounds the rows locked by a sweep
+
+# Due holds are picked in expiry order from the idx_holds_active_expiry partial index. Rows locked by a concurrent
+# sweeper (or a hold being converted or released) are skipped rather than waited for, so several sweepers can run
+# side by side, each expiring its own batch.
+EXPIRE_DUE_HOLDS_SQL = """
+    WITH due AS (
+        SELECT id
+        FROM holds
+        WHERE status = 'active' AND expires_at <= NOW()
+        ORDER BY expires_at
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    )
+    UPDATE holds h SET status = 'expired'
+    FROM due
+    WHERE h.id = due.id
+    RETURNING h.id, h.sailing_id, h.cabin_id;
+"""
+
+
+def expire_due_holds(batch: int = HOLD_EXPIRY_BATCH) -> List[Tuple]:
+    """
+    Expires a batch of the active holds past their expiry, in one transaction.
+
+    :param batch: The maximum number of holds expired
+    :return: List of (hold_id, sailing_id, cabin_id) of the expired holds
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(EXPIRE_DUE_HOLDS_SQL, [batch])
+        rows = cursor.fetchall()
+        apply_availability(hold_freed(*row) for row in rows)
+        return rows
+
+
+def sweep_expired_holds(batch: int = HOLD_EXPIRY_BATCH) -> int:
+    """
+    Expires every active hold past its expiry, batch after batch, freeing their cabins.
+
+    :param batch: The maximum number of holds expired per transaction
+    :return: The number of holds expired
+    """
+    expired = 0
+    while True:
+        rows = expire_due_holds(batch)
+        expired += len(rows)
+        if len(rows) < batch:
+            return expired
+
+
+def get_next_hold_expiry() -> Optional[datetime]:
+    """
+    Gets the earliest expiry of the active holds (a single probe of the idx_holds_active_expiry index).
+
+    :return: The expiry, or None if there is no active hold
+    """
+    return Hold.objects.filter(status=HoldStatus.ACTIVE).aggregate(next=Min('expires_at'))['next']
+
+
+def extend_hold_expiry(hold_id: uuid.UUID, user) -> Hold:
+    """
+    Extends an active hold by the extension time of the reserve policy, within its maximum number of extensions, and
+    reschedules the hold reminders and expiry in place.
+
+    :param hold_id: The hold ID
+    :param user: The user extending the hold, who must hold it (or be staff)
+    :return: The extended hold
+    """
+    setting = get_active_reserve_setting()
+
+    with transaction.atomic():
+        hold = get_object_or_404(Hold.objects.select_for_update(), id=hold_id)
+
+        if hold.user_id != user.id and not user.is_staff:
+            raise PermissionDeniedError(
+                title='Not the holder',
+                detail='Only the holder of a cabin can extend its hold',
+                status=status.HTTP_403_FORBIDDEN,
+            )
+        if hold.status != HoldStatus.ACTIVE or hold.expires_at <= timezone.now():
+            raise APIBaseError(
+                title='Hold not active',
+                detail=f'The hold is {hold.status if hold.status != HoldStatus.ACTIVE else HoldStatus.EXPIRED}',
+                status=status.HTTP_409_CONFLICT,
+            )
+        if setting is None or not setting.allow_extensions:
+            raise APIBaseError(
+                title='Extensions not allowed',
+                detail='The reserve policy does not allow extending holds',
+                status=status.HTTP_409_CONFLICT,
+            )
+        if hold.extensions >= setting.max_extensions:
+            raise APIBaseError(
+                title='Extensions exhausted',
+                detail=f'A hold can be extended at most {setting.max_extensions} time(s)',
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        hold.expires_at += timedelta(minutes=setting.extension_minutes)
+        hold.extensions += 1
+        hold.save(update_fields=['expires_at', 'extensions'])
+
+        schedule_hold_timers(hold, setting.reminder_scheduled_minutes)
+        apply_availability([hold_taken(hold)])
+
+    return hold
+
+
+def _hold_fingerprint(user_id: uuid.UUID, sailing_id: uuid.UUID, cabin_id: uuid.UUID, uc_ref: str) -> str:
+    """
+    Fingerprint of a hold request, a retry must match the request first sent with its idempotency key.
+    """
+    return hashlib.sha256(f'{user_id}:{sailing_id}:{cabin_id}:{uc_ref}'.encode()).hexdigest()
+
+
+def _replay_mismatch(idempotency_key: str) -> IdempotentReplayError:
+    return IdempotentReplayError(
+        title='Idempotency key reused',
+        detail=f'The idempotency key {idempotency_key} was already used for a different hold request',
+        status=status.HTTP_409_CONFLICT,
+    )
+
+
+def create_hold(user, sailing_id: uuid.UUID, cabin_id: uuid.UUID, uc_ref: str,
+                idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Holds a cabin of a sailing for the user until the expiry of the reserve policy, and schedules the hold reminders
+    and expiry. A retry with the idempotency key of a created hold replays its response.
+
+    :param user: The user holding the cabin
+    :param sailing_id: The sailing ID
+    :param cabin_id: The cabin ID, a cabin of the sailing ship
+    :param uc_ref: The reference of the hold
+    :param idempotency_key: The idempotency key of the request, if any
+    :return: dict matching HoldOut
+    """
+    fingerprint = _hold_fingerprint(user.id, sailing_id, cabin_id, uc_ref)
+
+    if idempotency_key is not None:
+        replay = cache.get(HOLD_REPLAY_CACHE_KEY.format(key=idempotency_key))
+        if replay is not None:
+            if replay['fingerprint'] != fingerprint:
+                raise _replay_mismatch(idempotency_key)
+            return replay['hold']
+
+    setting = get_active_reserve_setting()
+    minutes = setting.max_hold_minutes if setting is not None else HOLD_DEFAULT_MINUTES
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(CREATE_HOLD_SQL, {
+            'user': user.id,
+            'sailing': sailing_id,
+            'cabin': cabin_id,
+            'uc_ref': uc_ref,
+            'minutes': minutes,
+            'idempotency_key': idempotency_key,
+        })
+        outcome, hold_id, expires_at = cursor.fetchone()
+
+        if outcome == 'invalid':
+            raise ValidationFailedError(
+                title='Invalid cabin',
+                detail='The cabin is not a cabin of the sailing ship, or is archived',
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                errors=[{'field': 'cabin', 'message': 'Cabin not available on this sailing'}],
+            )
+        if outcome == 'held':
+            raise ActiveHoldExistsError(
+                title='Cabin already held',
+                detail=f'The cabin is held on this sailing until {expires_at:%Y-%m-%d %H:%M %Z}',
+                status=status.HTTP_409_CONFLICT,
+            )
+        if outcome == 'booked':
+            raise CabinAlreadyBookedError(
+                title='Cabin already booked',
+                detail='The cabin is booked on this sailing',
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        if outcome == 'replay':
+            hold = Hold.objects.get(id=hold_id)
+            if _hold_fingerprint(hold.user_id, hold.sailing_id, hold.cabin_id, hold.uc_ref) != fingerprint:
+                raise _replay_mismatch(idempotency_key)
+        else:
+            hold = Hold(id=hold_id, user_id=user.id, sailing_id=sailing_id, cabin_id=cabin_id, uc_ref=uc_ref,
+                        expires_at=expires_at, status=HoldStatus.ACTIVE, extensions=0,
+                        idempotency_key=idempotency_key)
+            schedule_hold_timers(hold, setting.reminder_scheduled_minutes if setting is not None else [])
+            apply_availability([hold_taken(hold)])
+
+        response = HoldOut.model_validate(hold).model_dump(by_alias=True)
+        if idempotency_key is not None:
+            replay = {'fingerprint': fingerprint, 'hold': response}
+            transaction.on_commit(
+                lambda: cache.set(HOLD_REPLAY_CACHE_KEY.format(key=idempotency_key), replay, HOLD_REPLAY_WINDOW)
+            )
+
+    return response
+
+
+def create_holds(user, sailing_id: uuid.UUID, cabin_ids: List[uuid.UUID], uc_ref: str,
+                 mode: HoldBatchMode = HoldBatchMode.ATOMIC) -> Dict[str, Any]:
+    """
+    Holds several cabins of a sailing for the user, every hold expiring at the same time, and schedules the hold
+    reminders and expiries. In atomic mode no cabin is held unless all of them are free.
+
+    :param user: The user holding the cabins
+    :param sailing_id: The sailing ID
+    :param cabin_ids: The cabin IDs, cabins of the sailing ship (duplicates are ignored)
+    :param uc_ref: The reference of the holds
+    :param mode: HoldBatchMode.ATOMIC or HoldBatchMode.BEST_EFFORT
+    :return: dict matching HoldBatchOut, the outcomes in the order of the cabins
+    """
+    setting = get_active_reserve_setting()
+    minutes = setting.max_hold_minutes if setting is not None else HOLD_DEFAULT_MINUTES
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(CREATE_HOLDS_SQL, {
+            'user': user.id,
+            'sailing': sailing_id,
+            'cabins': list(cabin_ids),
+            'uc_ref': uc_ref,
+            'minutes': minutes,
+            'atomic': mode == HoldBatchMode.ATOMIC,
+        })
+        rows = cursor.fetchall()
+
+        created = [(cabin_id, hold_id, expires_at) for cabin_id, outcome, hold_id, expires_at in rows
+                   if outcome == 'created']
+        schedule_holds_timers([(hold_id, expires_at) for _, hold_id, expires_at in created],
+                              setting.reminder_scheduled_minutes if setting is not None else [])
+        apply_availability(
+            hold_taken(Hold(id=hold_id, sailing_id=sailing_id, cabin_id=cabin_id, uc_ref=uc_ref, expires_at=expires_at))
+            for cabin_id, hold_id, expires_at in created
+        )
+
+    return {
+        'created': len(created),
+        'results': [
+            {'cabin': cabin_id, 'outcome': outcome, 'hold': hold_id, 'expires_at': expires_at}
+            for cabin_id, outcome, hold_id, expires_at in rows
+        ],
+    }
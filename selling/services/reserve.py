@@ -0,0 +1,103 @@
+import time
+import uuid
+from typing import Optional, Dict, Any, Tuple
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from ninja_extra import status
+
+from common.exceptions import PermissionDeniedError
+
+from selling.models import ReserveSetting
+
+# In-process active reserve policy, read by every hold create and extend. It is reloaded when the shared version
+# changes (replaced by set_reserve_setting once it commits) or when it gets older than RESERVE_SETTING_MAX_AGE, which
+# bounds how long writes not going through set_reserve_setting (e.g. admin edits) take to be picked up.
+RESERVE_SETTING_VERSION_KEY = 'selling:reserve-setting-version'
+RESERVE_SETTING_MAX_AGE = 300  # 5 minutes
+
+# (version, loaded_at, setting), replaced and never modified so readers need no lock
+_active: Optional[Tuple[str, float, Optional[ReserveSetting]]] = None
+
+
+def get_reserve_setting_version() -> str:
+    """
+    Gets the shared version of the reserve policy, creating it if missing (e.g. after the cache was flushed).
+
+    :return: The version
+    """
+    version = cache.get(RESERVE_SETTING_VERSION_KEY)
+    if version is None:
+        # Random rather than a counter so a recreated key never matches a version loaded before
+        cache.add(RESERVE_SETTING_VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(RESERVE_SETTING_VERSION_KEY)
+
+    return version
+
+
+def bump_reserve_setting_version():
+    """
+    Replaces the shared version of the reserve policy once the current transaction commits, so every process reloads
+    it on its next read.
+    """
+    transaction.on_commit(lambda: cache.set(RESERVE_SETTING_VERSION_KEY, uuid.uuid4().hex, None))
+
+
+def _load_active_reserve_setting() -> Optional[ReserveSetting]:
+    return ReserveSetting.objects.order_by('-created_at').first()
+
+
+def get_active_reserve_setting() -> Optional[ReserveSetting]:
+    """
+    Gets the active reserve policy, the most recently created one, from the in-process copy. Only a version check
+    hits the cache when the copy is current. Inside a transaction it is read from the database and not shared, as it
+    may be uncommitted.
+
+    :return: The reserve setting (shared, must not be modified), or None if none was ever set
+    """
+    global _active
+
+    if connection.in_atomic_block:
+        return _load_active_reserve_setting()
+
+    version = get_reserve_setting_version()
+
+    active = _active
+    if active is None or active[0] != version or time.monotonic() - active[1] > RESERVE_SETTING_MAX_AGE:
+        active = _active = (version, time.monotonic(), _load_active_reserve_setting())
+
+    return active[2]
+
+
+def set_reserve_setting(values: Dict[str, Any], user) -> ReserveSetting:
+    """
+    Sets a new active reserve policy: a copy of the active one (or of the defaults) with the given values. The
+    previous policies are kept.
+
+    :param values: The policy fields to change (see ReserveSettingsIn)
+    :param user: The user setting the policy, who must be staff
+    :return: The new reserve setting
+    """
+    if not user.is_staff:
+        raise PermissionDeniedError(
+            title='Not staff',
+            detail='Only staff can set the reserve policy',
+            status=status.HTTP_403_FORBIDDEN,
+        )
+
+    with transaction.atomic():
+        setting = _load_active_reserve_setting()
+
+        fields = {}
+        if setting is not None:
+            fields = {
+                field.attname: getattr(setting, field.attname)
+                for field in ReserveSetting._meta.concrete_fields
+                if field.attname not in ('id', 'created_at', 'created_by_id')
+            }
+        fields.update(values)
+
+        setting = ReserveSetting.objects.create(created_by=user, **fields)
+        bump_reserve_setting_version()
+
+    return setting
@@ -0,0 +1,265 @@
+import hashlib
+import json
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Optional, List, Dict, Any, Tuple
+
+from django.db import transaction
+from django.db.models import Q
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from ninja_extra import status
+
+from common.enums import DiscountStatus, CustomCostMode
+from common.exceptions import APIBaseError
+from discounts.models import Discount
+from fx.services.live import resolve_pricing_fx_mode
+from fx.services.rates import fx_rate
+from pricing.models import CabinCostOverride, CabinCostCustom
+from pricing.schemas import FXMode, Occupancy, EffectiveSource
+from pricing.services.costs import get_cost_index, resolve_cost
+from pricing.services.engine import price_cell, load_fx_rates, OCCUPANCY_PAX
+from seasons_sailings.models import Sailing
+from selling.models import BookingSnapshotPart, CancellationPolicy
+from ships_cabins.models import Cabin
+
+# Booking snapshots: the pricing breakdown of a cabin at booking time, in a canonical encoding (sorted keys, no
+# whitespace, decimals as normalized strings) so equal snapshots are byte-identical. The pieces many bookings share
+# (the FX rates used, the discounts, the cancellation policy) are stored once in booking_snapshot_parts and referenced
+# by the sha256 of their canonical encoding. Bump SNAPSHOT_VERSION on any change of the structure.
+SNAPSHOT_VERSION = 1
+SNAPSHOT_PART_FX = 'fx'
+SNAPSHOT_PART_DISCOUNT = 'discount'
+SNAPSHOT_PART_POLICY = 'policy'
+SNAPSHOT_PARTS_CACHE_SIZE = 4096  # parts held in process, they never change once stored
+
+# hash -> body
+_parts: Dict[str, Dict[str, Any]] = {}
+
+
+def _canonical_default(value: Any) -> str:
+    if isinstance(value, Decimal):
+        return format(value.normalize(), 'f')
+    if isinstance(value, (uuid.UUID, str)):
+        return str(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} cannot be encoded in a snapshot')
+
+
+def canonical_json(value: Any) -> str:
+    """
+    Encodes a value canonically: sorted keys, no whitespace, decimals as normalized strings (1.5000 -> '1.5'), UUIDs
+    and dates as strings.
+
+    :param value: The value, made of dicts, lists, strings, numbers, decimals, UUIDs and dates
+    :return: The JSON encoding
+    """
+    return json.dumps(value, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=_canonical_default)
+
+
+def _part(parts: Dict[str, Tuple[str, Dict[str, Any]]], kind: str, body: Dict[str, Any]) -> str:
+    """
+    Adds a shared part to the parts of a snapshot, returning its reference.
+    """
+    encoded = canonical_json({'kind': kind, **body})
+    digest = hashlib.sha256(encoded.encode()).hexdigest()
+    parts[digest] = (kind, json.loads(encoded))
+    return digest
+
+
+def _policy_body(policy: CancellationPolicy) -> Dict[str, Any]:
+    return {
+        'id': policy.id,
+        'name': policy.name,
+        'non_refundable': policy.non_refundable,
+        'tiers': [
+            {'min_days': tier.min_days, 'max_days': tier.max_days, 'charge_type': tier.charge_type, 'value': tier.value}
+            for tier in sorted(policy.cancellationpolicytier_set.all(), key=lambda tier: tier.min_days)
+        ],
+    }
+
+
+def _discount_body(discount: Discount) -> Dict[str, Any]:
+    return {
+        'id': discount.id,
+        'name': discount.name,
+        'kind': discount.kind,
+        'value': discount.value,
+        'channel': discount.channel,
+        'min_margin_b2b': discount.min_margin_b2b,
+        'min_margin_b2c': discount.min_margin_b2c,
+        'starts_at': discount.starts_at,
+        'ends_at': discount.ends_at,
+    }
+
+
+def build_booking_snapshot(sailing_id: uuid.UUID, cabin_id: uuid.UUID, occupancy: Occupancy,
+                           fx_mode: FXMode = FXMode.MANUAL, currency: Optional[str] = None,
+                           policy_id: Optional[uuid.UUID] = None) -> Dict[str, Any]:
+    """
+    Prices a cabin of a sailing once (see price_cell) and captures the breakdown: the resolved cost and where it comes
+    from, the custom costs, the season margins, the FX rates used, the discounts applying to the cabin and the
+    cancellation policy. Stores the shared parts, so it must run in the transaction creating the booking (they are only
+    cached in process once it commits).
+
+    :param sailing_id: The sailing ID
+    :param cabin_id: The cabin ID
+    :param occupancy: The occupancy priced
+    :param fx_mode: Whether to convert using manual or live rates (stale live rates are handled like pricing requests)
+    :param currency: Optional currency of the totals, the currency of the cabin cost if omitted
+    :param policy_id: Optional cancellation policy accepted with the booking
+    :return: The snapshot, to be stored in Booking.snapshot (see expand_snapshot to read it)
+    """
+    fx_mode = resolve_pricing_fx_mode(fx_mode)
+
+    sailing = get_object_or_404(Sailing.objects.select_related('season'), id=sailing_id)
+    cabin = get_object_or_404(Cabin, id=cabin_id, ship_id=sailing.ship_id)
+    season = sailing.season
+
+    index = get_cost_index(season.id, sailing.ship_id)
+    override = (
+        CabinCostOverride.objects.filter(sailing_id=sailing_id, cabin_id=cabin_id)
+        .values_list('base_per_pax', 'currency', 'single_multiplier')
+        .first()
+    )
+    cost = resolve_cost(index, cabin.category_id, cabin.deck, override)
+
+    customs = list(
+        CabinCostCustom.objects.filter(sailing_id=sailing_id, cabin_id=cabin_id, custom_cost__is_active=True,
+                                       custom_cost__ships=sailing.ship_id)
+        .order_by('custom_cost__key')
+        .values_list('value', 'percent', 'currency', 'custom_cost__mode', 'custom_cost__applies_to',
+                     'custom_cost__key', 'custom_cost__label')
+    )
+
+    priced = None
+    if cost is not None:
+        currency = currency or cost[1]
+        rates = load_fx_rates(fx_mode, {cost[1], currency} | {custom[2] for custom in customs})
+        priced = price_cell(cost, [custom[:5] for custom in customs], occupancy, season.default_margin_b2b,
+                            season.default_margin_b2c, rates, currency)
+    if priced is None:
+        raise APIBaseError(
+            title='Cabin not priced',
+            detail='The cabin has no cost on this sailing, or its cost cannot be converted to the booking currency',
+            status=status.HTTP_409_CONFLICT,
+        )
+    cos, b2b, b2c, currency = priced
+
+    # Only the pairs the price was converted with are kept
+    pairs = {cost[1]} | {custom[2] for custom in customs if custom[3] == CustomCostMode.FIXED}
+    used_rates = sorted([base, currency, fx_rate(rates, base, currency)] for base in pairs if base != currency)
+
+    now = timezone.now()
+    discounts = (
+        Discount.objects.filter(starts_at__lte=now, ends_at__gt=now)
+        .exclude(status__in=[DiscountStatus.ENDED, DiscountStatus.CANCELLED])
+        .filter(Q(discounttarget__sailing_id=sailing_id) | Q(discounttarget__category_id=cabin.category_id) |
+                Q(discounttarget__cabin_id=cabin_id))
+        .distinct()
+        .order_by('id')
+    )
+
+    policy = None
+    if policy_id is not None:
+        policy = get_object_or_404(CancellationPolicy.objects.prefetch_related('cancellationpolicytier_set'),
+                                   id=policy_id)
+
+    parts = {}
+    snapshot = {
+        'v': SNAPSHOT_VERSION,
+        'priced_at': now,
+        'sailing': {'id': sailing.id, 'season': season.id, 'departure_date': sailing.departure_date,
+                    'nights': sailing.nights},
+        'cabin': {'id': cabin.id, 'number': cabin.number, 'category': cabin.category_id, 'deck': cabin.deck},
+        'occupancy': Occupancy(occupancy).value,
+        'pax': OCCUPANCY_PAX[Occupancy(occupancy)],
+        'cost': {
+            'source': (EffectiveSource.OVERRIDE if override else EffectiveSource.DEFAULT).value,
+            'base_per_pax': cost[0],
+            'currency': cost[1],
+            'single_multiplier': cost[2],
+        },
+        'customs': [
+            {'key': key, 'label': label, 'mode': mode, 'applies_to': applies_to, 'value': value, 'percent': percent,
+             'currency': custom_currency}
+            for value, percent, custom_currency, mode, applies_to, key, label in customs
+        ],
+        'margins': {'b2b': season.default_margin_b2b, 'b2c': season.default_margin_b2c},
+        'fx': _part(parts, SNAPSHOT_PART_FX, {'mode': FXMode(fx_mode).value, 'rates': used_rates})
+              if used_rates else None,
+        'discounts': [_part(parts, SNAPSHOT_PART_DISCOUNT, _discount_body(discount)) for discount in discounts],
+        'policy': _part(parts, SNAPSHOT_PART_POLICY, _policy_body(policy)) if policy is not None else None,
+        'totals': {'cos': cos, 'b2b': b2b, 'b2c': b2c, 'currency': currency},
+    }
+
+    BookingSnapshotPart.objects.bulk_create(
+        [BookingSnapshotPart(hash=digest, kind=kind, body=body) for digest, (kind, body) in parts.items()],
+        ignore_conflicts=True,
+    )
+    bodies = {digest: body for digest, (_, body) in parts.items()}
+    transaction.on_commit(lambda: _cache_parts(bodies))
+
+    return json.loads(canonical_json(snapshot))
+
+
+def _cache_parts(parts: Dict[str, Dict[str, Any]]):
+    """
+    Adds stored shared parts to the in-process cache, emptying it first if it would exceed SNAPSHOT_PARTS_CACHE_SIZE
+    (parts more numerous than the cache size are not cached).
+    """
+    if len(_parts.keys() | parts.keys()) > SNAPSHOT_PARTS_CACHE_SIZE:
+        _parts.clear()
+    if len(parts) <= SNAPSHOT_PARTS_CACHE_SIZE:
+        _parts.update(parts)
+
+
+def _load_parts(digests: set) -> Dict[str, Dict[str, Any]]:
+    """
+    Gets shared parts from the in-process cache, loading the missing ones in a single query.
+    """
+    found = {digest: _parts[digest] for digest in digests & _parts.keys()}
+    missing = digests - found.keys()
+    if missing:
+        loaded = dict(BookingSnapshotPart.objects.filter(hash__in=missing).values_list('hash', 'body'))
+        _cache_parts(loaded)
+        found.update(loaded)
+
+    return {digest: found.get(digest) for digest in digests}
+
+
+def expand_snapshots(snapshots: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Replaces the references to shared parts of booking snapshots with the parts, loading the parts of every snapshot
+    at once (e.g. for a report).
+
+    :param snapshots: The stored snapshots (see build_booking_snapshot)
+    :return: The expanded snapshots, 'fx', 'discounts' and 'policy' holding the parts
+    """
+    digests = set()
+    for snapshot in snapshots:
+        digests.update(digest for digest in [snapshot.get('fx'), snapshot.get('policy'), *snapshot.get('discounts', [])]
+                       if digest)
+    parts = _load_parts(digests)
+
+    return [
+        {
+            **snapshot,
+            'fx': parts.get(snapshot['fx']) if snapshot.get('fx') else None,
+            'discounts': [parts.get(digest) for digest in snapshot.get('discounts', [])],
+            'policy': parts.get(snapshot['policy']) if snapshot.get('policy') else None,
+        }
+        for snapshot in snapshots
+    ]
+
+
+def expand_snapshot(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Replaces the references to shared parts of a booking snapshot with the parts.
+
+    :param snapshot: The stored snapshot (see build_booking_snapshot)
+    :return: The expanded snapshot
+    """
+    return expand_snapshots([snapshot])[0]
@@ -0,0 +1,257 @@
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Optional, List, Dict, Iterable, Tuple
+
+from django.core.mail import send_mail
+from django.db import transaction
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+from common.enums import HoldStatus
+from selling.models import Hold
+from selling.services.availability import apply_availability, hold_freed
+
+logger = logging.getLogger(__name__)
+
+# Timer wheel of the active holds: a sorted set of the reminder and expiry deadlines of every hold, scored by their
+# timestamp, so the due timers are claimed in O(log n) without polling the holds table. Members are
+# '{hold_id}:expire' and '{hold_id}:remind:{minutes}', rescheduling a hold (e.g. on extension) re-scores its members in
+# place. The holds table stays the source of truth: a claimed timer is checked against its hold before firing, and the
+# wheel is rebuilt from the active holds when Redis lost it (see ensure_hold_timers).
+# Due timers are claimed with a lease: moved to a second sorted set scored by the lease deadline, and only removed
+# once fired. A timer failing to fire goes back to the wheel after HOLD_TIMER_RETRY_DELAY, one whose worker was lost
+# is claimed again once its lease runs out.
+HOLD_TIMERS_KEY = 'holds:timers'
+HOLD_TIMERS_LEASED_KEY = 'holds:timers:leased'
+HOLD_TIMERS_BUILT_KEY = 'holds:timers:built'  # set once the wheel was rebuilt from the database
+HOLD_TIMERS_BATCH = 500  # timers claimed at once, holds scheduled per pipeline on rebuild
+HOLD_TIMER_LEASE = 900  # seconds, longer than firing a whole batch
+HOLD_TIMER_RETRY_DELAY = 60  # seconds
+TIMER_EXPIRE = 'expire'
+TIMER_REMIND = 'remind'
+
+# Claims the due timers atomically, so concurrent workers never fire the same timer while its lease runs: the timers
+# whose lease ran out first, then the due timers of the wheel
+CLAIM_DUE_TIMERS_LUA = """
+    local due = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+    local wanted = tonumber(ARGV[2]) - #due
+    if wanted > 0 then
+        local fresh = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, wanted)
+        if #fresh > 0 then
+            redis.call('ZREM', KEYS[1], unpack(fresh))
+            for _, member in ipairs(fresh) do
+                table.insert(due, member)
+            end
+        end
+    end
+    for _, member in ipairs(due) do
+        redis.call('ZADD', KEYS[2], ARGV[3], member)
+    end
+    return due
+"""
+
+
+def _redis():
+    return get_redis_connection('default')
+
+
+def hold_timers(hold_id: uuid.UUID, expires_at: datetime, reminder_minutes: Iterable[int]) -> Dict[str, float]:
+    """
+    Computes the timers of a hold: its expiry and a reminder the given minutes before it (reminders already due are
+    left out).
+
+    :param hold_id: The hold ID
+    :param expires_at: The hold expiry
+    :param reminder_minutes: Minutes before the expiry to remind the holder at (see ReserveSetting)
+    :return: Mapping of member -> deadline timestamp
+    """
+    now = timezone.now()
+    timers = {f'{hold_id}:{TIMER_EXPIRE}': expires_at.timestamp()}
+
+    for minutes in reminder_minutes:
+        remind_at = expires_at - timedelta(minutes=minutes)
+        if remind_at > now:
+            timers[f'{hold_id}:{TIMER_REMIND}:{minutes}'] = remind_at.timestamp()
+
+    return timers
+
+
+def schedule_hold_timers(hold: Hold, reminder_minutes: Iterable[int]):
+    """
+    Schedules (or reschedules in place) the timers of a hold once the current transaction commits.
+
+    :param hold: The active hold
+    :param reminder_minutes: Minutes before the expiry to remind the holder at
+    """
+    schedule_holds_timers([(hold.id, hold.expires_at)], reminder_minutes)
+
+
+def schedule_holds_timers(holds: Iterable[Tuple[uuid.UUID, datetime]], reminder_minutes: Iterable[int]):
+    """
+    Schedules the timers of several holds at once (a single ZADD) once the current transaction commits.
+
+    :param holds: The (hold_id, expires_at) of the active holds
+    :param reminder_minutes: Minutes before the expiry to remind the holders at
+    """
+    reminder_minutes = list(reminder_minutes)
+    timers = {}
+    for hold_id, expires_at in holds:
+        timers.update(hold_timers(hold_id, expires_at, reminder_minutes))
+
+    if timers:
+        transaction.on_commit(lambda: _redis().zadd(HOLD_TIMERS_KEY, timers))
+
+
+def cancel_hold_timers(hold_id: uuid.UUID, reminder_minutes: Iterable[int]):
+    """
+    Removes the timers of a hold no longer active once the current transaction commits. Timers scheduled with other
+    reminder minutes are left in the wheel and dropped when claimed.
+
+    :param hold_id: The hold ID
+    :param reminder_minutes: Minutes before the expiry the holder was to be reminded at
+    """
+    members = [f'{hold_id}:{TIMER_EXPIRE}'] + [f'{hold_id}:{TIMER_REMIND}:{minutes}' for minutes in reminder_minutes]
+    transaction.on_commit(lambda: _redis().zrem(HOLD_TIMERS_KEY, *members))
+
+
+def rebuild_hold_timers(reminder_minutes: Iterable[int]) -> int:
+    """
+    Schedules the timers of every active hold from the database. Timers already in the wheel are re-scored in place.
+
+    :param reminder_minutes: Minutes before the expiry to remind the holders at
+    :return: The number of holds scheduled
+    """
+    reminder_minutes = list(reminder_minutes)
+    client = _redis()
+    holds = 0
+
+    pipe = client.pipeline(transaction=False)
+    rows = Hold.objects.filter(status=HoldStatus.ACTIVE).values_list('id', 'expires_at')
+    for holds, (hold_id, expires_at) in enumerate(rows.iterator(chunk_size=HOLD_TIMERS_BATCH), start=1):
+        pipe.zadd(HOLD_TIMERS_KEY, hold_timers(hold_id, expires_at, reminder_minutes))
+        if holds % HOLD_TIMERS_BATCH == 0:
+            pipe.execute()
+    pipe.execute()
+
+    return holds
+
+
+def ensure_hold_timers(reminder_minutes: Iterable[int]) -> Optional[int]:
+    """
+    Rebuilds the wheel from the database unless it was already rebuilt since Redis last lost its data. A single
+    worker rebuilds it.
+
+    :param reminder_minutes: Minutes before the expiry to remind the holders at
+    :return: The number of holds scheduled, or None if the wheel was already built
+    """
+    client = _redis()
+    if not client.set(HOLD_TIMERS_BUILT_KEY, timezone.now().isoformat(), nx=True):
+        return None
+
+    try:
+        return rebuild_hold_timers(reminder_minutes)
+    except Exception:
+        client.delete(HOLD_TIMERS_BUILT_KEY)
+        raise
+
+
+def claim_due_timers(limit: int = HOLD_TIMERS_BATCH) -> List[str]:
+    """
+    Claims the timers due now for HOLD_TIMER_LEASE seconds, earliest first. Claimed timers must be released with
+    release_timer once fired.
+
+    :param limit: The maximum number of timers claimed
+    :return: List of members
+    """
+    now = timezone.now().timestamp()
+    due = _redis().eval(CLAIM_DUE_TIMERS_LUA, 2, HOLD_TIMERS_KEY, HOLD_TIMERS_LEASED_KEY, now, limit,
+                        now + HOLD_TIMER_LEASE)
+    return [member.decode() if isinstance(member, bytes) else member for member in due]
+
+
+def release_timer(member: str, retry: bool = False):
+    """
+    Releases a claimed timer once fired, or puts it back in the wheel to fire again after HOLD_TIMER_RETRY_DELAY
+    (unless it was rescheduled meanwhile).
+
+    :param member: The claimed member
+    :param retry: Whether firing the timer failed
+    """
+    pipe = _redis().pipeline(transaction=True)
+    if retry:
+        pipe.zadd(HOLD_TIMERS_KEY, {member: timezone.now().timestamp() + HOLD_TIMER_RETRY_DELAY}, nx=True)
+    pipe.zrem(HOLD_TIMERS_LEASED_KEY, member)
+    pipe.execute()
+
+
+def get_next_timer_at() -> Optional[datetime]:
+    """
+    Gets the deadline of the earliest timer in the wheel.
+
+    :return: The deadline, or None if the wheel is empty
+    """
+    first = _redis().zrange(HOLD_TIMERS_KEY, 0, 0, withscores=True)
+    return datetime.fromtimestamp(first[0][1], tz=dt_timezone.utc) if first else None
+
+
+def fire_timer(member: str) -> Optional[str]:
+    """
+    Fires a claimed timer if it still matches its hold: expires the hold, or reminds its holder. A timer whose hold
+    was extended meanwhile is rescheduled, one whose hold is no longer active is dropped.
+
+    :param member: The claimed member
+    :return: What was done: 'expired', 'reminded', 'rescheduled' or None
+    """
+    hold_id, kind, *minutes = member.split(':')
+    hold = Hold.objects.select_related('user').filter(id=hold_id, status=HoldStatus.ACTIVE).first()
+    if hold is None:
+        return None
+
+    now = timezone.now()
+    deadline = hold.expires_at - timedelta(minutes=int(minutes[0])) if minutes else hold.expires_at
+    if deadline > now:
+        _redis().zadd(HOLD_TIMERS_KEY, {member: deadline.timestamp()})
+        return 'rescheduled'
+
+    if kind == TIMER_EXPIRE:
+        # Conditional update, the hold may be converted, released or extended concurrently
+        expired = Hold.objects.filter(id=hold.id, status=HoldStatus.ACTIVE, expires_at__lte=now).update(
+            status=HoldStatus.EXPIRED
+        )
+        if not expired:
+            return None
+        apply_availability([hold_freed(hold.id, hold.sailing_id, hold.cabin_id)])
+        return 'expired'
+
+    send_mail(
+        subject=f'Your cabin hold {hold.uc_ref} expires soon',
+        message=f'Your hold {hold.uc_ref} expires on {hold.expires_at:%Y-%m-%d %H:%M %Z}. Convert it into a booking '
+                f'or extend it before then to keep the cabin.',
+        from_email='no-reply@example.com',
+        recipient_list=[hold.user.email],
+    )
+    return 'reminded'
+
+
+def run_due_timers(limit: int = HOLD_TIMERS_BATCH) -> Dict[str, int]:
+    """
+    Claims and fires the due timers. Timers failing to fire are retried (see release_timer).
+
+    :param limit: The maximum number of timers fired
+    :return: Counts of what was done (see fire_timer), 'failed' counting the timers retried
+    """
+    counts = {'expired': 0, 'reminded': 0, 'rescheduled': 0, 'dropped': 0, 'failed': 0}
+
+    for member in claim_due_timers(limit):
+        try:
+            outcome = fire_timer(member)
+        except Exception:
+            logger.exception('Hold timer %s failed, retrying in %ss', member, HOLD_TIMER_RETRY_DELAY)
+            release_timer(member, retry=True)
+            counts['failed'] += 1
+            continue
+        release_timer(member)
+        counts[outcome or 'dropped'] += 1
+
+    return counts
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-17 03:07
+
+import pgtrigger.compiler
+import pgtrigger.migrations
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ships_cabins', '0001_initial'),
+    ]
+
+    operations = [
+        pgtrigger.migrations.AddTrigger(
+            model_name='cabin',
+            trigger=pgtrigger.compiler.Trigger(name='trg_cabins_effective_prices', sql=pgtrigger.compiler.UpsertTriggerSql(condition='WHEN (OLD."category_id" IS DISTINCT FROM (NEW."category_id") OR OLD."deck" IS DISTINCT FROM (NEW."deck") OR OLD."ship_id" IS DISTINCT FROM (NEW."ship_id"))', func='\n            BEGIN\n                DELETE FROM effective_prices WHERE cabin_id = NEW.id;\n                PERFORM refresh_effective_prices(array_agg(s.id), array_agg(NEW.id))\n                FROM sailings s\n                WHERE s.ship_id = NEW.ship_id;\n                RETURN NULL;\n            END;\n            ', hash='14fff104a0f0d85ba152d1c90503285b7b58e52f', operation='UPDATE', pgid='pgtrigger_trg_cabins_effective_prices_e0494', table='cabins', when='AFTER')),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='cabin',
+            trigger=pgtrigger.compiler.Trigger(name='trg_cabins_effective_prices_ins', sql=pgtrigger.compiler.UpsertTriggerSql(func='\n            BEGIN\n                PERFORM refresh_effective_prices(array_agg(s.id), array_agg(changed.id))\n                FROM (SELECT * FROM new_values) AS changed\n                JOIN sailings s ON s.ship_id = changed.ship_id;\n                RETURN NULL;\n            END;\n            ', hash='c0022714c12dd747c12ff52baeabc91331c20941', level='STATEMENT', operation='INSERT', pgid='pgtrigger_trg_cabins_effective_prices_ins_31020', referencing='REFERENCING NEW TABLE AS new_values ', table='cabins', when='AFTER')),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='cabin',
+            trigger=pgtrigger.compiler.Trigger(name='trg_cabins_effective_prices_del', sql=pgtrigger.compiler.UpsertTriggerSql(func='\n            BEGIN\n                DELETE FROM effective_prices ep USING (SELECT * FROM old_values) AS changed WHERE ep.cabin_id = changed.id;\n                RETURN NULL;\n            END;\n            ', hash='7789f1cc31301370282ecf3b4fff262548566f14', level='STATEMENT', operation='DELETE', pgid='pgtrigger_trg_cabins_effective_prices_del_50ce6', referencing='REFERENCING OLD TABLE AS old_values ', table='cabins', when='AFTER')),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-17 03:57
+
+import pgtrigger.compiler
+import pgtrigger.migrations
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pricing', '0005_sailingcoverage_and_more'),
+        ('ships_cabins', '0002_cabin_trg_cabins_effective_prices_and_more'),
+    ]
+
+    operations = [
+        pgtrigger.migrations.AddTrigger(
+            model_name='cabin',
+            trigger=pgtrigger.compiler.Trigger(name='trg_cabins_coverage', sql=pgtrigger.compiler.UpsertTriggerSql(condition='WHEN (OLD."is_archived" IS DISTINCT FROM (NEW."is_archived"))', func='\n            BEGIN\n                PERFORM refresh_sailing_coverage(array_agg(s.id))\n                FROM sailings s\n                WHERE s.ship_id = NEW.ship_id;\n                RETURN NULL;\n            END;\n            ', hash='d942858c97583b8033a71252808b732a962a30a7', operation='UPDATE', pgid='pgtrigger_trg_cabins_coverage_85191', table='cabins', when='AFTER')),
+        ),
+    ]
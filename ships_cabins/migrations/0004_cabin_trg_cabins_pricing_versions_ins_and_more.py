@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-17 04:00
+
+import pgtrigger.compiler
+import pgtrigger.migrations
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pricing', '0006_pricingversion_and_more'),
+        ('ships_cabins', '0003_cabin_trg_cabins_coverage'),
+    ]
+
+    operations = [
+        pgtrigger.migrations.AddTrigger(
+            model_name='cabin',
+            trigger=pgtrigger.compiler.Trigger(name='trg_cabins_pricing_versions_ins', sql=pgtrigger.compiler.UpsertTriggerSql(func="\n            BEGIN\n                INSERT INTO pricing_versions (key, stamp, updated_at)\n                SELECT changed_keys.key, gen_random_uuid(), NOW()\n                FROM (SELECT DISTINCT k.key FROM (SELECT 'ship:' || changed.ship_id AS key FROM (SELECT * FROM new_values) AS changed) AS k) AS changed_keys\n                ORDER BY changed_keys.key\n                ON CONFLICT (key) DO UPDATE SET stamp = EXCLUDED.stamp, updated_at = EXCLUDED.updated_at;\n                RETURN NULL;\n            END;\n            ", hash='e4ebf69d8ed71e1ff5234126a30410fdc816c3c6', level='STATEMENT', operation='INSERT', pgid='pgtrigger_trg_cabins_pricing_versions_ins_656b1', referencing='REFERENCING NEW TABLE AS new_values ', table='cabins', when='AFTER')),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='cabin',
+            trigger=pgtrigger.compiler.Trigger(name='trg_cabins_pricing_versions_upd', sql=pgtrigger.compiler.UpsertTriggerSql(func="\n            BEGIN\n                INSERT INTO pricing_versions (key, stamp, updated_at)\n                SELECT changed_keys.key, gen_random_uuid(), NOW()\n                FROM (SELECT DISTINCT k.key FROM (SELECT 'ship:' || changed.ship_id AS key FROM (SELECT * FROM new_values UNION ALL SELECT * FROM old_values) AS changed) AS k) AS changed_keys\n                ORDER BY changed_keys.key\n                ON CONFLICT (key) DO UPDATE SET stamp = EXCLUDED.stamp, updated_at = EXCLUDED.updated_at;\n                RETURN NULL;\n            END;\n            ", hash='e6221b8b02ce6306ab3d8afd4695c52109c2aeb9', level='STATEMENT', operation='UPDATE', pgid='pgtrigger_trg_cabins_pricing_versions_upd_be3b3', referencing='REFERENCING OLD TABLE AS old_values  NEW TABLE AS new_values ', table='cabins', when='AFTER')),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name='cabin',
+            trigger=pgtrigger.compiler.Trigger(name='trg_cabins_pricing_versions_del', sql=pgtrigger.compiler.UpsertTriggerSql(func="\n            BEGIN\n                INSERT INTO pricing_versions (key, stamp, updated_at)\n                SELECT changed_keys.key, gen_random_uuid(), NOW()\n                FROM (SELECT DISTINCT k.key FROM (SELECT 'ship:' || changed.ship_id AS key FROM (SELECT * FROM old_values) AS changed) AS k) AS changed_keys\n                ORDER BY changed_keys.key\n                ON CONFLICT (key) DO UPDATE SET stamp = EXCLUDED.stamp, updated_at = EXCLUDED.updated_at;\n                RETURN NULL;\n            END;\n            ", hash='81678843f3cab28dc81692cd7382930615e66ac1', level='STATEMENT', operation='DELETE', pgid='pgtrigger_trg_cabins_pricing_versions_del_5fef8', referencing='REFERENCING OLD TABLE AS old_values ', table='cabins', when='AFTER')),
+        ),
+    ]
@@ -1,10 +1,13 @@
+import pgtrigger
 from django.db import models
 from django.contrib.postgres.functions import RandomUUID
 
 from common.enums import MapStatus
 from common.fields import PostgresEnumField
 from common.functions import TxNow
-from common.triggers import set_updated_at_trg
+from common.triggers import set_updated_at_trg, transition_trgs
+from pricing.triggers import (REFRESH_NEW_CABINS_SQL, DELETE_CABIN_CELLS_SQL, BUMP_SHIP_VERSIONS_SQL, cabin_moved_trg,
+                              cabin_archived_trg)
 
 class Ship(models.Model):
     id = models.UUIDField(primary_key=True, db_default=RandomUUID())
@@ -77,6 +80,11 @@ class Cabin(models.Model):
         ]
         triggers = [
             set_updated_at_trg('trg_cabins_updated'),
+            cabin_moved_trg('trg_cabins_effective_prices'),
+            *transition_trgs('trg_cabins_effective_prices', REFRESH_NEW_CABINS_SQL, operations=(pgtrigger.Insert,)),
+            *transition_trgs('trg_cabins_effective_prices', DELETE_CABIN_CELLS_SQL, operations=(pgtrigger.Delete,)),
+            cabin_archived_trg('trg_cabins_coverage'),
+            *transition_trgs('trg_cabins_pricing_versions', BUMP_SHIP_VERSIONS_SQL),
         ]
 
 class CabinMap(models.Model):